@@ -56,6 +56,7 @@ setup(
     packages=['MockSZ'],
     ext_modules=[CMakeExtension(os.path.join("MockSZ", "libs"))],
     cmdclass={'build_ext': build_ext},
+    entry_points={"console_scripts": ["mocksz = MockSZ.Runner:main"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "Programming Language :: C",
@@ -0,0 +1,96 @@
+"""!
+@file
+Adaptive sampling of smooth spectra on dense frequency grids.
+The expensive function is evaluated on a subset of the requested grid, which is refined where the interpolation error is large.
+The remaining points are filled in with cubic spline interpolation.
+"""
+
+# STL
+from typing import Callable, Optional, Sequence, Tuple
+
+# External packages
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+def sampleAdaptive(func     : Callable,
+                   x_arr    : Sequence[float],
+                   rtol     : Optional[float] = 1e-6,
+                   n_init   : Optional[int]   = 65,
+                   max_iter : Optional[int]   = 64) -> Tuple[Sequence[float], float, int]:
+    """!
+    Evaluate a smooth function on a dense grid by adaptive refinement of a subset of grid points.
+
+    The function is first evaluated on n_init points spread evenly over the grid.
+    Every interval between sampled points is then checked at its midpoint, comparing the function value to the cubic spline interpolant of the current samples.
+    Intervals for which the difference exceeds rtol times the maximum absolute sampled value are split, and checked again in the next iteration.
+    All midpoints of one iteration are evaluated in a single call of func.
+
+    The returned error is the largest midpoint difference of the converged intervals, relative to the maximum absolute value.
+    Since the checked midpoints are added to the samples afterwards, it is a conservative estimate of the interpolation error.
+
+    @param func Function taking an array of grid values and returning an array of function values of the same size.
+    @param x_arr Array with grid values. Does not need to be sorted.
+    @param rtol Required maximum interpolation error, relative to the maximum absolute function value.
+    @param n_init Number of initial samples.
+    @param max_iter Maximum number of refinement iterations.
+
+    @returns res Array of the same shape as x_arr with function values, exact at sampled points and interpolated elsewhere.
+    @returns err Estimated maximum relative interpolation error.
+    @returns n_eval Number of grid points at which func was evaluated.
+    """
+
+    x_arr = np.asarray(x_arr, dtype=np.float64)
+    x_uniq, inverse = np.unique(x_arr.ravel(), return_inverse=True)
+    n_x = x_uniq.size
+
+    if n_x <= n_init:
+        res = np.asarray(func(x_uniq), dtype=np.float64)
+        return res[inverse].reshape(x_arr.shape), 0., n_x
+
+    f = np.zeros(n_x)
+    known = np.zeros(n_x, dtype=bool)
+
+    idx = np.unique(np.linspace(0, n_x - 1, n_init).round().astype(int))
+    f[idx] = func(x_uniq[idx])
+    known[idx] = True
+
+    active = [(a, b) for a, b in zip(idx[:-1], idx[1:]) if b - a > 1]
+    err = 0.
+
+    for _ in range(max_iter):
+        if not active:
+            break
+
+        bounds = np.array(active)
+        mids = (bounds[:,0] + bounds[:,1]) // 2
+
+        interp = CubicSpline(x_uniq[known], f[known])(x_uniq[mids])
+        f[mids] = func(x_uniq[mids])
+        known[mids] = True
+
+        tol = rtol * np.max(np.absolute(f[known]))
+        diff = np.absolute(f[mids] - interp)
+
+        converged = diff <= tol
+        if np.any(converged):
+            err = max(err, np.max(diff[converged]))
+
+        active = []
+        for (a, b), m in zip(bounds[~converged], mids[~converged]):
+            active.extend([(lo, hi) for lo, hi in [(a, m), (m, b)] if hi - lo > 1])
+
+    # Intervals still active after max_iter are not converged: report their error instead
+    if active:
+        bounds = np.array(active)
+        mids = (bounds[:,0] + bounds[:,1]) // 2
+        f_mids = CubicSpline(x_uniq[known], f[known])(x_uniq[mids])
+        f[mids] = func(x_uniq[mids])
+        known[mids] = True
+        err = max(err, np.max(np.absolute(f[mids] - f_mids)))
+
+    scale = np.max(np.absolute(f[known]))
+
+    f[~known] = CubicSpline(x_uniq[known], f[known])(x_uniq[~known])
+    err = err / scale if scale > 0 else 0.
+
+    return f[inverse].reshape(x_arr.shape), err, int(np.sum(known))
@@ -7,7 +7,7 @@ Bindings for the ctypes interface for MockSZ.
 import ctypes
 import os
 import pathlib
-from typing import Callable, Optional, Sequence
+from typing import Callable, Optional, Sequence, Tuple
 
 # External packages
 import numpy as np
@@ -15,6 +15,46 @@ import numpy as np
 # MockSZ-specifics
 import MockSZ.Threadmgr as TManager
 
+# Component flags and output units of fused signal, mirroring Constants.h
+SIG_CMB = 1
+SIG_TSZ = 2
+SIG_KSZ = 4
+SIG_CORR = 8
+
+UNITS = {"SI" : 0, "JySr" : 1, "RJ" : 2, "dTCMB" : 3}
+
+# Scattering kernels and maximum number of convolution nodes, mirroring Constants.h
+KERNELS = {"MJ" : 0, "PL" : 1}
+MAX_NODES = 2**19 + 1
+
+# Number of chunks for chunked dispatch, if no chunksize is given
+NCHUNKS = 20
+
+def getPointer(arr : np.ndarray) -> ctypes.POINTER(ctypes.c_double):
+    """!
+    Get a ctypes pointer to the data of a contiguous double precision numpy array.
+    The array itself is not copied, so the caller should keep a reference to it for as long as the pointer is in use.
+
+    @param arr Numpy array of doubles, C-contiguous.
+
+    @returns ptr Pointer to first element of arr.
+    """
+
+    return arr.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+
+def getNumThreads(nThreads : Optional[int] = None) -> int:
+    """!
+    Resolve the number of threads to use in the C++ backend.
+
+    @param nThreads Requested number of threads. If None, the number of available CPUs is used.
+
+    @returns Number of threads.
+    """
+
+    if nThreads is None:
+        nThreads = os.cpu_count() or 1
+    return max(int(nThreads), 1)
+
 def loadMockSZlib() -> ctypes.CDLL:
     """!
     Load the MockSZ shared library. Will detect the operating system and link the library accordingly.
@@ -39,12 +79,12 @@ def loadMockSZlib() -> ctypes.CDLL:
     lib.MockSZ_getMaxwellJuttner.argtypes = [ctypes.POINTER(ctypes.c_double), 
                                              ctypes.c_int, ctypes.c_double, 
                                              ctypes.POINTER(ctypes.c_double), 
-                                             ctypes.c_double]
+                                             ctypes.c_double, ctypes.c_int]
     
     lib.MockSZ_getPowerlaw.argtypes = [ctypes.POINTER(ctypes.c_double), 
                                        ctypes.c_int, ctypes.c_double, 
                                        ctypes.POINTER(ctypes.c_double), 
-                                       ctypes.c_double]
+                                       ctypes.c_double, ctypes.c_int]
     
     lib.MockSZ_getMultiScatteringMJ.argtypes = [ctypes.POINTER(ctypes.c_double), 
                                                 ctypes.c_int, ctypes.c_double, 
@@ -56,6 +96,13 @@ def loadMockSZlib() -> ctypes.CDLL:
                                                 ctypes.POINTER(ctypes.c_double), 
                                                 ctypes.c_double]
     
+    for func in [lib.MockSZ_getThomsonScatterGrid, lib.MockSZ_getMultiScatteringMJGrid, lib.MockSZ_getMultiScatteringPLGrid]:
+        func.argtypes = [ctypes.POINTER(ctypes.c_double), ctypes.c_int, 
+                         ctypes.POINTER(ctypes.c_double), ctypes.c_int, 
+                         ctypes.POINTER(ctypes.c_double), 
+                         ctypes.c_double, ctypes.c_int]
+        func.restype = None
+    
     lib.MockSZ_getSignal_tSZ.argtypes = [ctypes.POINTER(ctypes.c_double), 
                                          ctypes.c_int, ctypes.c_double, ctypes.c_double, 
                                          ctypes.POINTER(ctypes.c_double), 
@@ -71,20 +118,68 @@ def loadMockSZlib() -> ctypes.CDLL:
                                          ctypes.POINTER(ctypes.c_double), 
                                          ctypes.c_double] 
     
+    lib.MockSZ_getSignal_kSZ_batch.argtypes = [ctypes.POINTER(ctypes.c_double), ctypes.c_int, 
+                                               ctypes.POINTER(ctypes.c_double), 
+                                               ctypes.POINTER(ctypes.c_double), ctypes.c_int,
+                                               ctypes.POINTER(ctypes.c_double), 
+                                               ctypes.c_int, ctypes.c_int] 
+    
+    lib.MockSZ_getSignal_tkSZ.argtypes = [ctypes.POINTER(ctypes.c_double), ctypes.c_int, 
+                                          ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double,
+                                          ctypes.c_int, ctypes.c_int,
+                                          ctypes.POINTER(ctypes.c_double), 
+                                          ctypes.c_double, ctypes.c_int] 
+    
+    lib.MockSZ_getSignal_tkSZ_pre.argtypes = [ctypes.POINTER(ctypes.c_double), ctypes.c_int, 
+                                              ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double,
+                                              ctypes.c_int, ctypes.c_int,
+                                              ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double), ctypes.c_int,
+                                              ctypes.POINTER(ctypes.c_double), 
+                                              ctypes.c_double, ctypes.c_int] 
+    
+    lib.MockSZ_getKernelWeights.argtypes = [ctypes.c_double, ctypes.c_int, ctypes.c_double,
+                                            ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double)]
+    
+    lib.MockSZ_getSignal_conv.argtypes = [ctypes.POINTER(ctypes.c_double), ctypes.c_int, ctypes.c_double,
+                                          ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double), ctypes.c_int,
+                                          ctypes.POINTER(ctypes.c_double)]
+    
     lib.MockSZ_getSignal_corrections.argtypes = [ctypes.POINTER(ctypes.c_double), 
                                          ctypes.c_int, ctypes.c_double, ctypes.c_double, 
                                          ctypes.POINTER(ctypes.c_double), 
-                                         ctypes.c_double]
+                                         ctypes.c_double, ctypes.c_int]
     
     lib.MockSZ_getIsoBeta.argtypes = [ctypes.POINTER(ctypes.c_double), 
                                       ctypes.POINTER(ctypes.c_double), 
                                       ctypes.c_int, ctypes.c_int,
                                       ctypes.c_double, ctypes.c_double,
                                       ctypes.c_double, ctypes.c_double,
-                                      ctypes.POINTER(ctypes.c_double), ctypes.c_bool] 
+                                      ctypes.POINTER(ctypes.c_double), ctypes.c_bool,
+                                      ctypes.c_int] 
+   
+    lib.MockSZ_getIsoBetaCube.argtypes = [ctypes.POINTER(ctypes.c_double), 
+                                          ctypes.POINTER(ctypes.c_double), 
+                                          ctypes.c_int, ctypes.c_int,
+                                          ctypes.c_double, ctypes.c_double,
+                                          ctypes.c_double, ctypes.c_double,
+                                          ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double),
+                                          ctypes.c_int, ctypes.POINTER(ctypes.c_double), 
+                                          ctypes.c_bool, ctypes.c_int] 
+   
+    lib.MockSZ_paintIsoBeta.argtypes = [ctypes.POINTER(ctypes.c_double), 
+                                        ctypes.POINTER(ctypes.c_double), 
+                                        ctypes.c_int, ctypes.c_int,
+                                        ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double),
+                                        ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double),
+                                        ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double),
+                                        ctypes.POINTER(ctypes.c_double), 
+                                        ctypes.POINTER(ctypes.c_int), ctypes.c_int,
+                                        ctypes.POINTER(ctypes.c_double), ctypes.c_int,
+                                        ctypes.POINTER(ctypes.c_double), ctypes.c_int] 
    
     lib.MockSZ_getCMB.argtypes = [ctypes.POINTER(ctypes.c_double), 
-                                  ctypes.c_int, ctypes.POINTER(ctypes.c_double)]
+                                  ctypes.c_int, ctypes.POINTER(ctypes.c_double),
+                                  ctypes.c_int]
 
     lib.MockSZ_getThomsonScatter.restype = None
     lib.MockSZ_getMaxwellJuttner.restype = None
@@ -94,16 +189,27 @@ def loadMockSZlib() -> ctypes.CDLL:
     lib.MockSZ_getSignal_tSZ.restype = None
     lib.MockSZ_getSignal_ntSZ.restype = None
     lib.MockSZ_getSignal_kSZ.restype = None
+    lib.MockSZ_getSignal_kSZ_batch.restype = None
+    lib.MockSZ_getSignal_tkSZ.restype = None
+    lib.MockSZ_getSignal_tkSZ_pre.restype = None
+    lib.MockSZ_getKernelWeights.restype = ctypes.c_int
+    lib.MockSZ_getSignal_conv.restype = None
     lib.MockSZ_getSignal_corrections.restype = None
     lib.MockSZ_getIsoBeta.restype = None
+    lib.MockSZ_getIsoBetaCube.restype = None
+    lib.MockSZ_paintIsoBeta.restype = None
     lib.MockSZ_getCMB.restype = None
 
     return lib
 
-def getDistributionSingleParam(x_arr : Sequence[float], 
-                               param : float, 
-                               acc   : float, 
-                               func  : Callable) -> Sequence[float]:
+def getDistributionSingleParam(x_arr     : Sequence[float], 
+                               param     : float, 
+                               acc       : float, 
+                               func      : Callable,
+                               nThreads  : Optional[int] = None,
+                               callback  : Optional[Callable] = None,
+                               budget    : Optional[float] = None,
+                               chunksize : Optional[int] = None) -> Sequence[float]:
     """!
     Binding for evaluating various single-parameter distributions used in MockSZ.
 
@@ -112,71 +218,234 @@ def getDistributionSingleParam(x_arr : Sequence[float],
     @param acc Accuracy of evaluation of distribution. 
         Note: if the distribution does not involve integration, acc is ignored.
     @param func Function from library.
+    @param nThreads Number of threads, for functions that take a number of threads as last argument, 
+        such as MockSZ_getMaxwellJuttner and MockSZ_getPowerlaw. If None, use all available CPUs.
+    @param callback Progress callback, see _dispatch. Defaults to None.
+    @param budget Wall-clock budget in seconds, see _dispatch. Defaults to None.
+    @param chunksize Number of elements of x_arr per chunk, see _dispatch. Defaults to None.
 
     @returns output Array containing distribution.
     """
     
-    mgr = TManager.Manager()
-    
-    cx_arr = (ctypes.c_double * x_arr.size)(*(x_arr.ravel().tolist()))
-    cnum_x = ctypes.c_int(x_arr.size)
+    x_arr = np.ascontiguousarray(x_arr, dtype=np.float64)
     cparam = ctypes.c_double(param)
 
-    coutput = (ctypes.c_double * x_arr.size)(*(np.zeros(x_arr.size).tolist()))
+    output = np.zeros(x_arr.shape)
     
     cacc = ctypes.c_double(acc)
-    
-    args = [cx_arr, cnum_x, cparam, coutput, cacc]
+    args_suf = [ctypes.c_int(getNumThreads(nThreads))] if len(func.argtypes) > 5 else []
 
-    mgr.new_thread(target=func, args=args)
+    x_flat = x_arr.reshape(-1)
+    out_flat = output.reshape(-1)
+    
+    def _getArgs(start, stop):
+        return [getPointer(x_flat[start:stop]), ctypes.c_int(stop - start), cparam, getPointer(out_flat[start:stop]), cacc, *args_suf]
+
+    return _dispatch(func, _getArgs, x_arr.size, output, callback, budget, chunksize)
+
+def getDistributionGrid(x_arr     : Sequence[float], 
+                        param_arr : Sequence[float], 
+                        acc       : float, 
+                        func      : Callable,
+                        nThreads  : Optional[int] = None,
+                        callback  : Optional[Callable] = None,
+                        budget    : Optional[float] = None,
+                        chunksize : Optional[int] = None) -> Sequence[float]:
+    """!
+    Binding for evaluating single-parameter distributions on a grid of independent variables and parameters, in one backend call.
 
-    output = np.ctypeslib.as_array(coutput, shape=x_arr.shape).astype(np.float64)
+    @param x_arr Array of independent variables.
+    @param param_arr Array of parameters defining distributions.
+    @param acc Accuracy of evaluation of distribution. 
+    @param func Grid function from library.
+    @param nThreads Number of threads. If None, use all available CPUs.
+    @param callback Progress callback, see _dispatch. Defaults to None.
+    @param budget Wall-clock budget in seconds, see _dispatch. Defaults to None.
+    @param chunksize Number of parameters per chunk, see _dispatch. Defaults to None.
 
-    return output
+    @returns output Array of shape (param_arr.size, x_arr.size) containing distributions.
+    """
+    
+    x_arr = np.ascontiguousarray(x_arr, dtype=np.float64).ravel()
+    param_arr = np.ascontiguousarray(param_arr, dtype=np.float64).ravel()
 
-def getDistributionTwoParam(x_arr  : Sequence[float], 
-                            param1 : float, 
-                            param2 : float, 
-                            acc    : float, 
-                            func   : Callable) -> Sequence[float]:
+    output = np.zeros((param_arr.size, x_arr.size))
+    
+    def _getArgs(start, stop):
+        return [getPointer(x_arr), ctypes.c_int(x_arr.size), getPointer(param_arr[start:stop]), ctypes.c_int(stop - start), 
+                getPointer(output[start:stop]), ctypes.c_double(acc), ctypes.c_int(getNumThreads(nThreads))]
+
+    return _dispatch(func, _getArgs, param_arr.size, output, callback, budget, chunksize)
+
+def getDistributionTwoParam(x_arr     : Sequence[float], 
+                            param1    : float, 
+                            param2    : float, 
+                            acc       : float, 
+                            func      : Callable,
+                            callback  : Optional[Callable] = None,
+                            budget    : Optional[float] = None,
+                            chunksize : Optional[int] = None) -> Sequence[float]:
     """!
     Binding for evaluating various two-parameter distributions used in MockSZ.
     These include the actual tSZ, ntSZ and kSZ signal.
 
+    When chunked, the scattering kernel of the tSZ and ntSZ signals is tabulated once and shared by all chunks.
+
     @param x_arr Array of independent variables.
     @param param1 Parameter 1 defining distribution.
     @param param2 Parameter 2 defining distribution.
     @param acc Accuracy of evaluation of distribution. 
     @param func Function from library.
+    @param callback Progress callback, see _dispatch. Defaults to None.
+    @param budget Wall-clock budget in seconds, see _dispatch. Defaults to None.
+    @param chunksize Number of elements of x_arr per chunk, see _dispatch. Defaults to None.
 
     @returns output Array containing distribution.
     """
     
-    mgr = TManager.Manager()
-    
-    cx_arr = (ctypes.c_double * x_arr.size)(*(x_arr.ravel().tolist()))
-    cnum_x = ctypes.c_int(x_arr.size)
+    x_arr = np.ascontiguousarray(x_arr, dtype=np.float64)
     cparam1 = ctypes.c_double(param1)
     cparam2 = ctypes.c_double(param2)
     cacc = ctypes.c_double(acc)
 
-    coutput = (ctypes.c_double * x_arr.size)(*(np.zeros(x_arr.size).tolist()))
+    output = np.zeros(x_arr.shape)
+
+    x_flat = x_arr.reshape(-1)
+    out_flat = output.reshape(-1)
     
-    args = [cx_arr, cnum_x, cparam1, cparam2, coutput, cacc]
+    kernels = {"MockSZ_getSignal_tSZ" : "MJ", "MockSZ_getSignal_ntSZ" : "PL"}
+    chunked = callback is not None or budget is not None or chunksize is not None
+
+    if chunked and getattr(func, "__name__", None) in kernels:
+        wk, es = getKernelWeights(param1, kernels[func.__name__], acc)
+        func = loadMockSZlib().MockSZ_getSignal_conv
+
+        def _getArgs(start, stop):
+            return [getPointer(x_flat[start:stop]), ctypes.c_int(stop - start), cparam2, 
+                    getPointer(wk), getPointer(es), ctypes.c_int(wk.size), getPointer(out_flat[start:stop])]
     
-    mgr.new_thread(target=func, args=args)
+    else:
+        def _getArgs(start, stop):
+            return [getPointer(x_flat[start:stop]), ctypes.c_int(stop - start), cparam1, cparam2, getPointer(out_flat[start:stop]), cacc]
 
-    output = np.ctypeslib.as_array(coutput, shape=x_arr.shape).astype(np.float64)
+    return _dispatch(func, _getArgs, x_arr.size, output, callback, budget, chunksize)
 
-    return output
+def getKernelWeights(param : float,
+                     dist  : str,
+                     acc   : float) -> Tuple[Sequence[float], Sequence[float]]:
+    """!
+    Binding for tabulating the convolution weights of a multi-electron scattering kernel,
+    so that the tSZ or ntSZ signal can be evaluated in several calls without recomputing the kernel.
+
+    @param param Electron temperature in keV for "MJ", or powerlaw slope for "PL".
+    @param dist Electron distribution, one of the keys of KERNELS: "MJ" (Maxwell-Juttner) or "PL" (powerlaw).
+    @param acc Accuracy of evaluation of kernel.
+
+    @returns wk Array with combined weights.
+    @returns es Array with exp(-s) at the nodes.
+    """
+
+    if dist not in KERNELS:
+        raise ValueError(f"Unknown distribution {dist}. Choose from {list(KERNELS.keys())}.")
+
+    lib = loadMockSZlib()
+    mgr = TManager.Manager()
+
+    wk = np.zeros(MAX_NODES)
+    es = np.zeros(MAX_NODES)
+    n_nodes = np.zeros(1, dtype=int)
+
+    def _getWeights():
+        n_nodes[0] = lib.MockSZ_getKernelWeights(ctypes.c_double(param), ctypes.c_int(KERNELS[dist]), ctypes.c_double(acc),
+                                                 getPointer(wk), getPointer(es))
+
+    mgr.new_thread(target=_getWeights, args=[])
+
+    return wk[:n_nodes[0]].copy(), es[:n_nodes[0]].copy()
+
+def getSignal_tkSZ(nu_arr     : Sequence[float], 
+                   Te         : float, 
+                   tau_e      : float, 
+                   beta_pec   : float, 
+                   cosu       : float, 
+                   components : int, 
+                   unit       : str, 
+                   acc        : float, 
+                   nThreads   : Optional[int] = None,
+                   callback   : Optional[Callable] = None,
+                   budget     : Optional[float] = None,
+                   chunksize  : Optional[int] = None,
+                   kernel     : Optional[Tuple[Sequence[float], Sequence[float]]] = None) -> Sequence[float]:
+    """!
+    Binding for the fused single-pointing signal, which adds CMB, tSZ, kSZ and correction terms in one backend call.
+    When chunked, the tSZ scattering kernel is tabulated once and shared by all chunks.
+    The kernel can also be tabulated beforehand with getKernelWeights, and shared between signals with the same Te and acc.
+
+    @param nu_arr Numpy array of frequencies, in Hz.
+    @param Te Electron temperature in keV.
+    @param tau_e Optical depth along sightline.
+    @param beta_pec Dimensionless peculiar velocity of cluster.
+    @param cosu Direction cosine between peculiar velocity and sightline.
+    @param components Bitwise OR of SIG_CMB, SIG_TSZ, SIG_KSZ and SIG_CORR.
+    @param unit Output unit, one of the keys of UNITS: "SI", "JySr", "RJ" (Rayleigh-Jeans temperature) or "dTCMB" (CMB temperature fluctuation).
+    @param acc Accuracy of evaluation of tSZ integral, and relative accuracy of the Gauss-Legendre quadrature of the kSZ integral.
+    @param nThreads Number of threads. If None, use all available CPUs.
+    @param callback Progress callback, see _dispatch. Defaults to None.
+    @param budget Wall-clock budget in seconds, see _dispatch. Defaults to None.
+    @param chunksize Number of frequencies per chunk, see _dispatch. Defaults to None.
+    @param kernel Tuple (wk, es) returned by getKernelWeights(Te, "MJ", acc). 
+        Defaults to None, in which case the kernel is tabulated in this call.
+
+    @returns output Array containing signal.
+    """
+
+    if unit not in UNITS:
+        raise ValueError(f"Unknown unit {unit}. Choose from {list(UNITS.keys())}.")
 
-def getIsoBeta(Az     : Sequence[float], 
-               El     : Sequence[float], 
-               ibeta  : float, 
-               ne0    : float, 
-               thetac : float, 
-               Da     : float, 
-               grid   : bool) -> Sequence[float]:
+    lib = loadMockSZlib()
+
+    nu_arr = np.ascontiguousarray(nu_arr, dtype=np.float64)
+    output = np.zeros(nu_arr.shape)
+
+    nu_flat = nu_arr.reshape(-1)
+    out_flat = output.reshape(-1)
+
+    args_sig = [ctypes.c_double(Te), ctypes.c_double(tau_e), ctypes.c_double(beta_pec), ctypes.c_double(cosu),
+                ctypes.c_int(components), ctypes.c_int(UNITS[unit])]
+
+    cnum_threads = ctypes.c_int(getNumThreads(nThreads))
+
+    if kernel is None and callback is None and budget is None and chunksize is None:
+        func = lib.MockSZ_getSignal_tkSZ
+
+        def _getArgs(start, stop):
+            return ([getPointer(nu_flat[start:stop]), ctypes.c_int(stop - start)] + args_sig + 
+                    [getPointer(out_flat[start:stop]), ctypes.c_double(acc), cnum_threads])
+
+    else:
+        func = lib.MockSZ_getSignal_tkSZ_pre
+        if kernel is not None:
+            wk, es = (np.ascontiguousarray(arr, dtype=np.float64) for arr in kernel)
+        elif components & SIG_TSZ:
+            wk, es = getKernelWeights(Te, "MJ", acc)
+        else:
+            wk, es = np.zeros(1), np.zeros(1)
+
+        def _getArgs(start, stop):
+            return ([getPointer(nu_flat[start:stop]), ctypes.c_int(stop - start)] + args_sig + 
+                    [getPointer(wk), getPointer(es), ctypes.c_int(wk.size), getPointer(out_flat[start:stop]), 
+                     ctypes.c_double(acc), cnum_threads])
+
+    return _dispatch(func, _getArgs, nu_arr.size, output, callback, budget, chunksize)
+
+def getIsoBeta(Az       : Sequence[float], 
+               El       : Sequence[float], 
+               ibeta    : float, 
+               ne0      : float, 
+               thetac   : float, 
+               Da       : float, 
+               grid     : bool,
+               nThreads : Optional[int] = None) -> Sequence[float]:
     """!
     Binding for calculating an isothermal-beta optical depth screen. 
 
@@ -189,6 +458,7 @@ def getIsoBeta(Az     : Sequence[float],
     @param grid Whether or not to evaluate the model on a 2D grid spanned by Az and El, or on a 1D trace.
         If grid=True, the screen will be of size Az.size * El.size.
         If grid=False (default), it is required that Az.size ==  El.size, and the screen will be of size Az.size = El.size.
+    @param nThreads Number of threads. If None, use all available CPUs.
 
     @returns output The optical depth screen.
     """
@@ -196,8 +466,8 @@ def getIsoBeta(Az     : Sequence[float],
     lib = loadMockSZlib()
     mgr = TManager.Manager()
     
-    cAz = (ctypes.c_double * Az.size)(*(Az.ravel().tolist()))
-    cEl = (ctypes.c_double * El.size)(*(El.ravel().tolist()))
+    Az = np.ascontiguousarray(Az, dtype=np.float64)
+    El = np.ascontiguousarray(El, dtype=np.float64)
     cnum_Az = ctypes.c_int(Az.size)
     cnum_El = ctypes.c_int(El.size)
     cibeta = ctypes.c_double(ibeta)
@@ -207,27 +477,87 @@ def getIsoBeta(Az     : Sequence[float],
     cgrid = ctypes.c_bool(grid)
 
     if grid:
-        n_out = Az.size * El.size
         out_shape = (Az.size, El.size)
     else:
-        n_out = Az.size 
         out_shape = (Az.size,)
 
-    coutput = (ctypes.c_double * n_out)(*(np.zeros(n_out).tolist()))
+    output = np.zeros(out_shape)
     
-    args = [cAz, cEl, cnum_Az, cnum_El, cibeta, cne0, cthetac, cDa, coutput, cgrid]
+    args = [getPointer(Az), getPointer(El), cnum_Az, cnum_El, cibeta, cne0, cthetac, cDa, getPointer(output), cgrid,
+            ctypes.c_int(getNumThreads(nThreads))]
 
     mgr.new_thread(target=lib.MockSZ_getIsoBeta, args=args)
-    output = np.ctypeslib.as_array(coutput, shape=n_out).astype(np.float64)
-    output = output.reshape(out_shape)
 
     return output
 
-def getCMB(nu_arr : Sequence[float]) -> Sequence[float]:
+def getIsoBetaCube(Az       : Sequence[float], 
+                   El       : Sequence[float], 
+                   ibeta    : float, 
+                   ne0      : float, 
+                   thetac   : float, 
+                   Da       : float, 
+                   spectrum : Sequence[float],
+                   offset   : Optional[Sequence[float]] = None,
+                   grid     : Optional[bool] = False,
+                   nThreads : Optional[int] = None,
+                   output   : Optional[np.ndarray] = None) -> np.ndarray:
+    """!
+    Binding for calculating an isothermal-beta cube in a single pass: the optical depth screen times a spectrum, plus an offset.
+
+    @param Az Numpy array containing the range of Azimuth co-ordinates, in arcseconds.
+    @param El Numpy array containing the range of Elevation co-ordinates, in arcseconds.
+    @param ibeta Beta parameter for isothermal model.
+    @param ne0 Central electron number density, in number / cm**3.
+    @param thetac Angular cluster core radius, in arcseconds.
+    @param Da Angular diameter distance to cluster, in Megaparsec.
+    @param spectrum Numpy array containing the signal per unit optical depth.
+    @param offset Numpy array of the same size as spectrum, added to every pixel. If None, nothing is added.
+    @param grid Whether or not to evaluate the model on a 2D grid spanned by Az and El, or on a 1D trace.
+    @param nThreads Number of threads. If None, use all available CPUs.
+    @param output C-contiguous numpy array of doubles for storing the cube, for example a memmap.
+        If None, a new array is allocated.
+
+    @returns output Cube of shape (Az.size, El.size, spectrum.size) if grid, else (Az.size, spectrum.size).
+    """
+
+    lib = loadMockSZlib()
+    mgr = TManager.Manager()
+    
+    Az = np.ascontiguousarray(Az, dtype=np.float64)
+    El = np.ascontiguousarray(El, dtype=np.float64)
+    spectrum = np.ascontiguousarray(spectrum, dtype=np.float64).ravel()
+
+    if offset is not None:
+        offset = np.ascontiguousarray(offset, dtype=np.float64).ravel()
+
+    if grid:
+        out_shape = (Az.size, El.size, spectrum.size)
+    else:
+        out_shape = (Az.size, spectrum.size)
+
+    if output is None:
+        output = np.empty(out_shape)
+
+    elif output.shape != out_shape or output.dtype != np.float64 or not output.flags["C_CONTIGUOUS"]:
+        raise ValueError(f"Output array should be a C-contiguous array of doubles with shape {out_shape}.")
+    
+    args = [getPointer(Az), getPointer(El), ctypes.c_int(Az.size), ctypes.c_int(El.size), 
+            ctypes.c_double(ibeta), ctypes.c_double(ne0), ctypes.c_double(thetac), ctypes.c_double(Da), 
+            getPointer(spectrum), None if offset is None else getPointer(offset), 
+            ctypes.c_int(spectrum.size), getPointer(output), ctypes.c_bool(grid), 
+            ctypes.c_int(getNumThreads(nThreads))]
+
+    mgr.new_thread(target=lib.MockSZ_getIsoBetaCube, args=args)
+
+    return output
+
+def getCMB(nu_arr   : Sequence[float],
+           nThreads : Optional[int] = None) -> Sequence[float]:
     """!
     Binding for calculating CMB blackbody.
 
     @param nu_arr Numpy array of frequencies for CMB, in Hz.
+    @param nThreads Number of threads. If None, use all available CPUs.
 
     @returns output Array containing CMB.
     """
@@ -235,14 +565,209 @@ def getCMB(nu_arr : Sequence[float]) -> Sequence[float]:
     lib = loadMockSZlib()
     mgr = TManager.Manager()
     
-    cnu_arr = (ctypes.c_double * nu_arr.size)(*(nu_arr.ravel().tolist()))
+    nu_arr = np.ascontiguousarray(nu_arr, dtype=np.float64)
     cnum_nu = ctypes.c_int(nu_arr.size)
 
-    coutput = (ctypes.c_double * nu_arr.size)(*(np.zeros(nu_arr.size).tolist()))
+    output = np.zeros(nu_arr.shape)
     
-    args = [cnu_arr, cnum_nu, coutput]
+    args = [getPointer(nu_arr), cnum_nu, getPointer(output), ctypes.c_int(getNumThreads(nThreads))]
 
     mgr.new_thread(target=lib.MockSZ_getCMB, args=args)
-    output = np.ctypeslib.as_array(coutput, shape=nu_arr.shape).astype(np.float64)
+
+    return output
+
+def getMaxwellJuttner(beta_arr : Sequence[float], 
+                      Te       : float, 
+                      nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Binding for calculating a Maxwell-Juttner distribution.
+
+    @param beta_arr Numpy array of dimensionless electron velocities.
+    @param Te Electron temperature in keV.
+    @param nThreads Number of threads. If None, use all available CPUs.
+
+    @returns output Array containing Maxwell-Juttner distribution.
+    """
+
+    return _getPointwise(loadMockSZlib().MockSZ_getMaxwellJuttner, beta_arr, 
+                         [ctypes.c_double(Te)], [ctypes.c_double(0)], nThreads)
+
+def getPowerlaw(beta_arr : Sequence[float], 
+                alpha    : float, 
+                nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Binding for calculating a relativistic powerlaw distribution.
+
+    @param beta_arr Numpy array of dimensionless electron velocities.
+    @param alpha Slope of powerlaw.
+    @param nThreads Number of threads. If None, use all available CPUs.
+
+    @returns output Array containing powerlaw distribution.
+    """
+
+    return _getPointwise(loadMockSZlib().MockSZ_getPowerlaw, beta_arr, 
+                         [ctypes.c_double(alpha)], [ctypes.c_double(0)], nThreads)
+
+def getSignal_corrections(nu_arr   : Sequence[float], 
+                          Te       : float, 
+                          beta_pec : float, 
+                          cosu     : float, 
+                          nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Binding for calculating the correction (cross) terms up to second order in bulk velocity and electron temperature.
+
+    @param nu_arr Numpy array of frequencies, in Hz.
+    @param Te Electron temperature in keV.
+    @param beta_pec Dimensionless peculiar velocity of cluster.
+    @param cosu Direction cosine between peculiar velocity and sightline.
+    @param nThreads Number of threads. If None, use all available CPUs.
+
+    @returns output Array containing corrections.
+    """
+
+    return _getPointwise(loadMockSZlib().MockSZ_getSignal_corrections, nu_arr, 
+                         [ctypes.c_double(Te), ctypes.c_double(beta_pec)], [ctypes.c_double(cosu)], nThreads)
+
+def getSignal_kSZ_batch(nu_arr     : Sequence[float], 
+                        beta_pec_z : Sequence[float], 
+                        tau_e      : Sequence[float], 
+                        n_mu       : int, 
+                        nThreads   : Optional[int] = None) -> Sequence[float]:
+    """!
+    Binding for calculating the kSZ signal for a batch of clusters.
+    Inputs and outputs are passed to the backend without copying through Python lists.
+
+    @param nu_arr Numpy array of frequencies, in Hz.
+    @param beta_pec_z Numpy array of dimensionless peculiar velocities along the sightline, one per cluster.
+    @param tau_e Numpy array of optical depths, one per cluster.
+    @param n_mu Number of Gauss-Legendre nodes for the integral over mu.
+    @param nThreads Number of threads. If None, use all available CPUs.
+
+    @returns output Array of shape (beta_pec_z.size, nu_arr.size) containing the kSZ signals.
+    """
+
+    lib = loadMockSZlib()
+    mgr = TManager.Manager()
+
+    nu_arr = np.ascontiguousarray(nu_arr, dtype=np.float64).ravel()
+    beta_pec_z = np.ascontiguousarray(beta_pec_z, dtype=np.float64).ravel()
+    tau_e = np.ascontiguousarray(np.broadcast_to(tau_e, beta_pec_z.shape), dtype=np.float64)
+
+    output = np.zeros((beta_pec_z.size, nu_arr.size))
+
+    args = [getPointer(nu_arr), ctypes.c_int(nu_arr.size), 
+            getPointer(beta_pec_z), getPointer(tau_e), ctypes.c_int(beta_pec_z.size),
+            getPointer(output), ctypes.c_int(n_mu), ctypes.c_int(getNumThreads(nThreads))]
+
+    mgr.new_thread(target=lib.MockSZ_getSignal_kSZ_batch, args=args)
+
+    return output
+
+def paintIsoBeta(Az       : Sequence[float], 
+                 El       : Sequence[float], 
+                 cat      : dict, 
+                 spectra  : Sequence[float], 
+                 spec_idx : Sequence[int], 
+                 output   : np.ndarray, 
+                 nThreads : Optional[int] = None) -> None:
+    """!
+    Binding for painting a catalogue of truncated isothermal-beta clusters into a map or cube.
+    The clusters are added to output in-place.
+
+    @param Az Numpy array containing the azimuth co-ordinates of the map, in arcseconds, sorted ascending.
+    @param El Numpy array containing the elevation co-ordinates of the map, in arcseconds, sorted ascending.
+    @param cat Dictionary with arrays "Az", "El", "ibeta", "ne0", "thetac", "Da" and "r_trunc".
+    @param spectra Numpy array of shape (number of spectra, number of channels), containing signals per unit optical depth.
+    @param spec_idx Numpy array containing, for each cluster, the row in spectra to use.
+    @param output C-contiguous numpy array of doubles with shape (Az.size, El.size, number of channels).
+    @param nThreads Number of threads. If None, use all available CPUs.
+    """
+
+    lib = loadMockSZlib()
+    mgr = TManager.Manager()
+
+    Az = np.ascontiguousarray(Az, dtype=np.float64)
+    El = np.ascontiguousarray(El, dtype=np.float64)
+    cat = {key : np.ascontiguousarray(cat[key], dtype=np.float64) for key in 
+           ["Az", "El", "ibeta", "ne0", "thetac", "Da", "r_trunc"]}
+    spectra = np.ascontiguousarray(spectra, dtype=np.float64)
+    spec_idx = np.ascontiguousarray(spec_idx, dtype=np.int32)
+
+    args = [getPointer(Az), getPointer(El), ctypes.c_int(Az.size), ctypes.c_int(El.size),
+            getPointer(cat["Az"]), getPointer(cat["El"]), getPointer(cat["ibeta"]), 
+            getPointer(cat["ne0"]), getPointer(cat["thetac"]), getPointer(cat["Da"]),
+            getPointer(cat["r_trunc"]), 
+            spec_idx.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), ctypes.c_int(spec_idx.size),
+            getPointer(spectra), ctypes.c_int(spectra.shape[-1]),
+            getPointer(output), ctypes.c_int(getNumThreads(nThreads))]
+
+    mgr.new_thread(target=lib.MockSZ_paintIsoBeta, args=args)
+
+def _getPointwise(func     : Callable,
+                  x_arr    : Sequence[float],
+                  args_pre : list,
+                  args_suf : list,
+                  nThreads : Optional[int]) -> np.ndarray:
+    """!
+    Evaluate a pointwise backend function, with signature func(x, n_x, *args_pre, output, *args_suf, n_threads).
+
+    @param func Function from library.
+    @param x_arr Array of independent variables.
+    @param args_pre Arguments passed between the number of elements and the output.
+    @param args_suf Arguments passed between the output and the number of threads.
+    @param nThreads Number of threads. If None, use all available CPUs.
+
+    @returns output Array of the same shape as x_arr.
+    """
+
+    mgr = TManager.Manager()
+
+    x_arr = np.ascontiguousarray(x_arr, dtype=np.float64)
+    output = np.zeros(x_arr.shape)
+
+    args = [getPointer(x_arr), ctypes.c_int(x_arr.size), *args_pre, getPointer(output), *args_suf, 
+            ctypes.c_int(getNumThreads(nThreads))]
+
+    mgr.new_thread(target=func, args=args)
+
+    return output
+
+def _dispatch(func      : Callable,
+              get_args  : Callable,
+              n_items   : int,
+              output    : np.ndarray,
+              callback  : Optional[Callable],
+              budget    : Optional[float],
+              chunksize : Optional[int]) -> np.ndarray:
+    """!
+    Run a backend function through a threadmanager, either in a single call or in chunks.
+
+    The calculation is chunked if any of callback, budget or chunksize is given.
+    Before a chunked calculation, output is filled with NaN, so that unfinished items remain NaN.
+    After every chunk, callback(output, n_done, n_total) is called with the partially filled output.
+    If the calculation takes longer than budget seconds, no further chunks are started and the partial output is returned.
+
+    @param func Function from library.
+    @param get_args Function taking the start and stop index of a chunk, and returning the arguments to be passed to func.
+    @param n_items Total number of items, along the first axis of output or the flattened output.
+    @param output Array that is filled by func.
+    @param callback Function called after every chunk. If None, progress is not reported.
+    @param budget Wall-clock budget in seconds. If None, all chunks are run.
+    @param chunksize Number of items per chunk. If None, the items are split into NCHUNKS chunks.
+
+    @returns output The filled array.
+    """
+
+    mgr = TManager.Manager(callback, budget)
+
+    if callback is None and budget is None and chunksize is None:
+        mgr.new_thread(target=func, args=get_args(0, n_items))
+        return output
+
+    if chunksize is None:
+        chunksize = -(-n_items // NCHUNKS)
+
+    output.fill(np.nan)
+    mgr.new_thread_chunked(func, get_args, n_items, max(int(chunksize), 1), output)
 
     return output
@@ -0,0 +1,314 @@
+"""!
+@file
+Persistent, content-addressed cache for MockSZ results on disk.
+Results are stored as .npy files, which are memory-mapped when read back.
+The cache can be shared between processes on the same node.
+"""
+
+# STL
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Sequence
+
+# External packages
+import numpy as np
+
+# MockSZ-specifics
+from MockSZ import __version__
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class ResultCache(object):
+    """!
+    Class representing a cache directory on disk.
+
+    Each result is keyed by a hash of the inputs that produced it and the MockSZ version.
+    Results are written to a temporary file first and then atomically renamed, so readers never see partial files.
+    When the total size exceeds the limit, the least recently used results are removed.
+    Modifications of the cache directory are serialised across processes with a lock file.
+
+    Attributes:
+        path Directory containing the cached results.
+        max_size Maximum total size of cached results, in bytes.
+    """
+
+    def __init__(self, path     : str,
+                       max_size : Optional[int] = 2**30) -> None:
+        """!
+        Initialise a result cache.
+
+        @param path Directory in which to store the results. Is created if it does not exist.
+        @param max_size Maximum total size of cached results in bytes.
+            Defaults to 1 GiB.
+        """
+
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def getKey(self, *inputs : Any) -> str:
+        """!
+        Calculate key of a result from the inputs that produced it.
+
+        @param inputs Inputs of calculation. Can be (nested lists, tuples or dictionaries of) scalars, strings, None and numpy arrays.
+
+        @returns key Hexadecimal hash of inputs and MockSZ version.
+        """
+
+        return hashInputs(*inputs)
+
+    def load(self, key : str) -> Optional[np.ndarray]:
+        """!
+        Load a result from the cache.
+        On a hit, the result is marked as most recently used.
+
+        @param key Key of result.
+
+        @returns res Read-only memory-mapped array, or None if the key is not in the cache.
+        """
+
+        path_npy = self._getPath(key, ".npy")
+
+        try:
+            res = np.load(path_npy, mmap_mode="r")
+            os.utime(path_npy)
+        except (OSError, ValueError):
+            return None
+
+        return res
+
+    def loadMeta(self, key : str) -> Optional[dict]:
+        """!
+        Load the metadata stored next to a result.
+
+        @param key Key of result.
+
+        @returns meta Dictionary with metadata, or None if the key is not in the cache.
+        """
+
+        try:
+            with open(self._getPath(key, ".json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key    : str,
+                    result : np.ndarray,
+                    meta   : Optional[dict] = None) -> None:
+        """!
+        Store a result in the cache, and evict old results if the cache grew too large.
+
+        @param key Key of result.
+        @param result Numpy array to store.
+        @param meta Dictionary with extra metadata to store next to the result. Should be JSON serialisable.
+        """
+
+        result = np.asarray(result)
+
+        metadata = {
+                "version"   : __version__,
+                "created"   : time.time(),
+                "shape"     : list(result.shape),
+                "dtype"     : str(result.dtype),
+                }
+
+        if meta is not None:
+            metadata.update(meta)
+
+        with self._lock():
+            self._writeAtomic(self._getPath(key, ".json"),
+                              lambda f: f.write(json.dumps(metadata).encode()))
+            self._writeAtomic(self._getPath(key, ".npy"),
+                              lambda f: np.save(f, result))
+            self._evict()
+
+    def getSize(self) -> int:
+        """!
+        Get total size of results in the cache.
+
+        @returns Size in bytes.
+        """
+
+        return sum(size for _, _, size in self._getEntries())
+
+    def clear(self) -> None:
+        """!
+        Remove all results from the cache.
+        """
+
+        with self._lock():
+            for path_npy, _, _ in self._getEntries():
+                self._remove(path_npy)
+
+    def _getPath(self, key : str, ext : str) -> str:
+        return os.path.join(self.path, key + ext)
+
+    def _getEntries(self) -> list:
+        entries = []
+        for path_npy in glob.glob(os.path.join(self.path, "*.npy")):
+            try:
+                stat = os.stat(path_npy)
+            except OSError:
+                continue
+            entries.append((path_npy, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        if self.max_size is None:
+            return
+
+        entries = sorted(self._getEntries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+
+        for path_npy, _, size in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path_npy)
+            total -= size
+
+    def _remove(self, path_npy : str) -> None:
+        for path in [path_npy, os.path.splitext(path_npy)[0] + ".json"]:
+            try:
+                os.remove(path)
+            except OSError:
+                # Already removed by another process, or still mapped on platforms that forbid removal
+                pass
+
+    def _writeAtomic(self, path : str, write : Callable) -> None:
+        fd, path_tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(path_tmp, path)
+        except BaseException:
+            if os.path.exists(path_tmp):
+                os.remove(path_tmp)
+            raise
+
+    @contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(self.path, ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def hashInputs(*inputs : Any) -> str:
+    """!
+    Calculate a hash of inputs and the MockSZ version.
+
+    @param inputs Inputs to hash. Can be (nested lists, tuples or dictionaries of) scalars, strings, None and numpy arrays.
+
+    @returns Hexadecimal hash.
+    """
+
+    h = hashlib.blake2b(digest_size=20)
+    h.update(__version__.encode())
+    _hashInput(h, inputs)
+
+    return h.hexdigest()
+
+def _hashInput(h, obj : Any) -> None:
+    """!
+    Recursively add an input to a hash object.
+    Type information is hashed along with values, so that e.g. 1 and 1.0 or [1] and (1,) give different keys.
+
+    @param h Hash object.
+    @param obj Input to add.
+    """
+
+    if isinstance(obj, np.ndarray):
+        obj = np.ascontiguousarray(obj)
+        h.update(f"ndarray{obj.dtype.str}{obj.shape}".encode())
+        h.update(obj.tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _hashInput(h, item)
+    elif isinstance(obj, dict):
+        h.update(f"dict{len(obj)}".encode())
+        for key in sorted(obj):
+            _hashInput(h, key)
+            _hashInput(h, obj[key])
+    elif obj is None or isinstance(obj, (bool, int, float, str, np.generic)):
+        h.update(f"{type(obj).__name__}{obj!r}".encode())
+    else:
+        raise TypeError(f"Cannot hash input of type {type(obj).__name__}.")
+
+def cached(func    : Optional[Callable] = None,
+           state   : Optional[Sequence[str]] = (),
+           restore : Optional[Sequence[str]] = ()) -> Callable:
+    """!
+    Decorator for caching results of model methods on disk.
+    Can be used bare, as @cached, or with arguments, as @cached(state=(...), restore=(...)).
+    The cache is used only if the instance has a ResultCache stored in its cache attribute.
+    The key consists of the class name, method name, the instance attributes in state and method arguments, with defaults filled in.
+    The timer, nThreads and kernel arguments do not change the result, so they are not part of the key.
+    Results that are not numpy arrays, such as lazy cubes, are returned without storing them.
+
+    @param func Method to be cached.
+    @param state Names of instance attributes that the method reads, and therefore are part of the key.
+        Defaults to none, for methods that only depend on their arguments.
+    @param restore Names of instance attributes that the method sets next to its result.
+        These are stored in the metadata of the result and set again on a cache hit.
+
+    @returns Method to be cached, wrapped in cache lookup.
+    """
+
+    if func is None:
+        return functools.partial(cached, state=state, restore=restore)
+
+    sig = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrap_func(self, *args, **kwargs):
+        cache = getattr(self, "cache", None)
+        if cache is None:
+            return func(self, *args, **kwargs)
+
+        bound = sig.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = {name : value for name, value in bound.arguments.items()
+                     if name not in ("self", "timer", "nThreads", "kernel")}
+        params = {name : getattr(self, name) for name in state}
+
+        try:
+            key = cache.getKey(type(self).__name__, func.__name__, params, arguments)
+        except TypeError:
+            return func(self, *args, **kwargs)
+
+        res = cache.load(key)
+        if res is not None and restore:
+            meta = cache.loadMeta(key)
+            if meta is None or not all(name in meta.get("restore", {}) for name in restore):
+                res = None
+            else:
+                for name in restore:
+                    setattr(self, name, meta["restore"][name])
+
+        if res is None:
+            res = func(self, *args, **kwargs)
+            if isinstance(res, np.ndarray):
+                meta = {"name" : f"{type(self).__name__}.{func.__name__}"}
+                if restore:
+                    meta["restore"] = {name : getattr(self, name) for name in restore}
+                cache.store(key, res, meta=meta)
+
+        return res
+    return wrap_func
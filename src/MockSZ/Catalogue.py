@@ -0,0 +1,248 @@
+"""!
+@file
+Catalogue model for painting many isothermal-beta clusters into a single SZ map or cube.
+"""
+
+# STL
+from typing import Optional, Sequence, Tuple
+
+# External packages
+import numpy as np
+import scipy.constants as const
+
+# MockSZ-specifics
+import MockSZ.Bindings as MBind
+import MockSZ.Dispatch as MDisp
+from MockSZ.Models import timer_func
+
+def binValues(values : Sequence[float],
+              width  : float) -> Sequence[float]:
+    """!
+    Snap values to the centres of bins of a given width.
+
+    @param values Array of values to bin.
+    @param width Width of bins. If zero or negative, values are returned unchanged.
+
+    @returns Binned values.
+    """
+
+    if width is None or width <= 0:
+        return values
+    return np.round(values / width) * width
+
+class ClusterCatalogue(object):
+    """!
+    Class representing a catalogue of isothermal-beta clusters, for example obtained from a halo catalogue.
+    The clusters can be painted into a single optical depth map or SZ cube.
+
+    Every cluster is truncated at a radius r_trunc, so that it only touches nearby pixels.
+    Spectra are shared between clusters with similar electron temperature and velocity.
+    Painting is done in tiles spread over several threads.
+    Therefore, the cost scales with the number of clusters and touched pixels, not with the full map size per cluster.
+
+    Attributes:
+        cat Dictionary containing the cluster parameters, one array entry per cluster.
+
+    @ingroup clustermodels
+    """
+
+    def __init__(self, Az      : Sequence[float],
+                       El      : Sequence[float],
+                       ibeta   : Sequence[float],
+                       ne0     : Sequence[float],
+                       thetac  : Sequence[float],
+                       Da      : Sequence[float],
+                       Te      : Optional[Sequence[float]] = None,
+                       v_pec   : Optional[Sequence[float]] = None,
+                       phi_cl  : Optional[Sequence[float]] = 0,
+                       r_trunc : Optional[Sequence[float]] = 10) -> None:
+        """!
+        Initialise a catalogue of clusters.
+        Apart from Az, all parameters can be scalars, in which case they are shared by all clusters.
+
+        @param Az Array containing azimuths of cluster centres, in arcseconds.
+        @param El Array containing elevations of cluster centres, in arcseconds.
+        @param ibeta Beta parameter(s) for isothermal model.
+        @param ne0 Central electron number density (densities), in number / cm**3.
+        @param thetac Angular cluster core radius (radii), in arcseconds.
+        @param Da Angular diameter distance(s) to clusters, in Megaparsec.
+        @param Te Electron temperature(s) in keV.
+            Defaults to None, which leaves out the tSZ effect.
+        @param v_pec Absolute peculiar velocity (velocities) of clusters, in km / s.
+            Defaults to None, which puts the clusters at rest w.r.t. the CMB frame.
+        @param phi_cl Angle(s) between line-of-sight (pointing away from observer) and cluster velocity, in degrees.
+            Defaults to 0 degrees.
+        @param r_trunc Truncation radius (radii), in units of the core radius.
+            Defaults to 10 core radii.
+        """
+
+        Az = np.asarray(Az, dtype=np.float64).ravel()
+
+        def _broadcast(value):
+            return np.broadcast_to(np.asarray(value, dtype=np.float64), Az.shape).copy()
+
+        self.cat = {
+                "Az"        : Az.copy(),
+                "El"        : _broadcast(El),
+                "ibeta"     : _broadcast(ibeta),
+                "ne0"       : _broadcast(ne0),
+                "thetac"    : _broadcast(thetac),
+                "Da"        : _broadcast(Da),
+                "Te"        : None if Te is None else _broadcast(Te),
+                "v_pec"     : None if v_pec is None else _broadcast(v_pec),
+                "phi_cl"    : _broadcast(phi_cl),
+                }
+
+        self.cat["r_trunc"] = _broadcast(r_trunc) * self.cat["thetac"]
+
+    def getSpectra(self, nu_arr : Sequence[float],
+                         Te_bin : Optional[float] = 0.1,
+                         v_bin  : Optional[float] = 10.,
+                         acc    : Optional[float] = 1e-6) -> Tuple[Sequence[float], Sequence[int]]:
+        """!
+        Calculate SZ spectra per unit optical depth, shared between clusters with similar parameters.
+
+        Clusters are grouped on electron temperature, line-of-sight velocity and absolute velocity, after binning these.
+        The tSZ kernel is computed once per temperature bin and the kSZ signals for all groups in a single batched call.
+
+        @param nu_arr Array of frequencies, in Hz.
+        @param Te_bin Width of temperature bins in keV. If 0, exact temperatures are used.
+        @param v_bin Width of velocity bins in km / s. If 0, exact velocities are used.
+        @param acc Required relative accuracy of integration for tSZ.
+
+        @returns spectra 2D array of shape (number of groups, nu_arr.size).
+        @returns spec_idx Array containing for each cluster the row of spectra belonging to it.
+        """
+
+        clib = MBind.loadMockSZlib()
+        nu_arr = np.asarray(nu_arr, dtype=np.float64).ravel()
+        n_cl = self.cat["Az"].size
+
+        Te = np.zeros(n_cl) if self.cat["Te"] is None else binValues(self.cat["Te"], Te_bin)
+
+        if self.cat["v_pec"] is None:
+            v_los = np.zeros(n_cl)
+            v_abs = np.zeros(n_cl)
+        else:
+            v_los = binValues(self.cat["v_pec"] * np.cos(np.radians(self.cat["phi_cl"])), v_bin)
+            v_abs = binValues(np.absolute(self.cat["v_pec"]), v_bin)
+
+        keys, spec_idx = np.unique(np.stack([Te, v_los, v_abs], axis=1), axis=0, return_inverse=True)
+        spectra = np.zeros((keys.shape[0], nu_arr.size))
+
+        if self.cat["Te"] is not None:
+            Te_unique, Te_idx = np.unique(keys[:,0], return_inverse=True)
+            for i, Te_u in enumerate(Te_unique):
+                tSZ = MBind.getDistributionTwoParam(nu_arr, Te_u, 1., acc,
+                                                    func=clib.MockSZ_getSignal_tSZ)
+                spectra[Te_idx == i] += tSZ
+
+        if self.cat["v_pec"] is not None:
+            beta_los = keys[:,1] * 1e3 / const.c
+            beta_abs = keys[:,2] * 1e3 / const.c
+            spectra += MBind.getSignal_kSZ_batch(nu_arr, beta_los, 1., 8)
+
+            if self.cat["Te"] is not None:
+                for i in range(keys.shape[0]):
+                    cosu = beta_los[i] / beta_abs[i] if beta_abs[i] > 0 else 0.
+                    spectra[i] += MDisp.getSignal_corrections(nu_arr, keys[i,0], beta_abs[i], cosu)
+
+        return spectra, spec_idx.ravel()
+
+    @timer_func
+    def paintMap(self, Az       : Sequence[float],
+                       El       : Sequence[float],
+                       timer    : Optional[bool] = False,
+                       nThreads : Optional[int] = None,
+                       out      : Optional[np.ndarray] = None) -> Sequence[float]:
+        """!
+        Paint the optical depth of all clusters into a single map.
+
+        @param Az Array containing the azimuth co-ordinates of the map, in arcseconds, sorted ascending.
+        @param El Array containing the elevation co-ordinates of the map, in arcseconds, sorted ascending.
+        @param timer Time function execution. Used in decorator.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+        @param out C-contiguous array of doubles with shape (Az.size, El.size) to add the clusters to.
+            Can be a numpy memmap for maps that do not fit in memory.
+            Defaults to None, in which case a new map is allocated.
+
+        @returns res 2D optical depth map of shape (Az.size, El.size).
+        """
+
+        res = self._getOutput(Az, El, None, out)
+        spectra = np.ones((1, 1))
+        spec_idx = np.zeros(self.cat["Az"].size, dtype=np.int32)
+
+        self._paint(Az, El, spectra, spec_idx, res, nThreads)
+
+        return res
+
+    @timer_func
+    def paintCube(self, Az       : Sequence[float],
+                        El       : Sequence[float],
+                        nu_arr   : Sequence[float],
+                        timer    : Optional[bool]  = False,
+                        Te_bin   : Optional[float] = 0.1,
+                        v_bin    : Optional[float] = 10.,
+                        acc      : Optional[float] = 1e-6,
+                        no_CMB   : Optional[bool]  = True,
+                        nThreads : Optional[int]   = None,
+                        out      : Optional[np.ndarray] = None) -> Sequence[float]:
+        """!
+        Paint the SZ signal of all clusters into a single cube.
+
+        @param Az Array containing the azimuth co-ordinates of the map, in arcseconds, sorted ascending.
+        @param El Array containing the elevation co-ordinates of the map, in arcseconds, sorted ascending.
+        @param nu_arr Array of frequencies, in Hz.
+        @param timer Time function execution. Used in decorator.
+        @param Te_bin Width of temperature bins in keV, used for sharing spectra. If 0, exact temperatures are used.
+        @param v_bin Width of velocity bins in km / s, used for sharing spectra. If 0, exact velocities are used.
+        @param acc Required relative accuracy of integration for tSZ.
+        @param no_CMB Whether or not to add the CMB signal to the cube, after painting the clusters.
+            Defaults to True (CMB not added).
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+        @param out C-contiguous array of doubles with shape (Az.size, El.size, nu_arr.size) to add the clusters to.
+            Can be a numpy memmap for cubes that do not fit in memory.
+            Defaults to None, in which case a new cube is allocated.
+
+        @returns res 3D cube of shape (Az.size, El.size, nu_arr.size) containing the SZ signal.
+        """
+
+        nu_arr = np.asarray(nu_arr, dtype=np.float64).ravel()
+        res = self._getOutput(Az, El, nu_arr, out)
+        spectra, spec_idx = self.getSpectra(nu_arr, Te_bin, v_bin, acc)
+
+        self._paint(Az, El, spectra, spec_idx, res, nThreads)
+
+        if not no_CMB:
+            res += MDisp.getCMB(nu_arr, nThreads)
+
+        return res
+
+    def _getOutput(self, Az     : Sequence[float],
+                         El     : Sequence[float],
+                         nu_arr : Optional[Sequence[float]],
+                         out    : Optional[np.ndarray]) -> np.ndarray:
+        shape = (Az.size, El.size) if nu_arr is None else (Az.size, El.size, nu_arr.size)
+
+        if out is None:
+            return np.zeros(shape)
+
+        if out.shape != shape or out.dtype != np.float64 or not out.flags["C_CONTIGUOUS"]:
+            raise ValueError(f"Output array should be a C-contiguous array of doubles with shape {shape}.")
+        return out
+
+    def _paint(self, Az       : Sequence[float],
+                     El       : Sequence[float],
+                     spectra  : Sequence[float],
+                     spec_idx : Sequence[int],
+                     out      : np.ndarray,
+                     nThreads : Optional[int]) -> None:
+        if np.any(np.diff(Az) < 0) or np.any(np.diff(El) < 0):
+            raise ValueError("Az and El of the map should be sorted in ascending order.")
+
+        # Not required by the backend, but keeps the clusters of a tile close together in memory
+        order = np.argsort(self.cat["Az"], kind="stable")
+        cat_sorted = {key : self.cat[key][order] for key in ["Az", "El", "ibeta", "ne0", "thetac", "Da", "r_trunc"]}
+
+        MBind.paintIsoBeta(Az, El, cat_sorted, spectra, spec_idx[order], out, nThreads)
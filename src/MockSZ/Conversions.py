@@ -13,6 +13,18 @@ Numbers = Union[Union[float, Sequence], Union[int, Sequence[int]]]
 
 TCMB = 2.726 # K
 
+def TCMB_z(z : Numbers) -> Numbers:
+    """!
+    Get CMB temperature at a redshift, T_CMB(z) = TCMB * (1 + z).
+
+    @param z Redshift.
+
+    @returns T CMB temperature in Kelvin.
+    """
+
+    T = TCMB * (1 + np.asarray(z, dtype=np.float64))
+    return T
+
 def keV_theta(Te : Numbers) -> Numbers:
     """!
     Get dimensionless electron temperature.
@@ -66,29 +78,80 @@ def SI_Temp(I_nu   : Numbers,
     Tb = I_nu * const.c**2 / (2 * const.k * nu_arr**2)
     return Tb
 
-def freq_x(nu_arr : Numbers) -> Numbers:
+def SI_dTCMB(I_nu   : Numbers, 
+             nu_arr : Numbers,
+             z      : Numbers = 0) -> Numbers:
+    """!
+    Take specific intensity in SI units.
+    Convert to a CMB temperature fluctuation in Kelvin, by dividing by the derivative of the CMB blackbody to temperature.
+
+    @param I_nu Specific intensity in SI units.
+    @param nu_arr Numpy array with frequencies of I_nu in Hz.
+    @param z Redshift at which the CMB blackbody is evaluated. Defaults to 0.
+
+    @returns dT CMB temperature fluctuation.
+    """
+
+    x = freq_x(nu_arr, z)
+    em1 = np.expm1(x)
+    dB_dT = 2 * const.h * nu_arr**3 / const.c**2 * x * (em1 + 1) / em1**2 / TCMB_z(z)
+
+    dT = I_nu / dB_dT
+    return dT
+
+def SI_unit(I_nu   : Numbers, 
+            nu_arr : Numbers,
+            unit   : str,
+            z      : Numbers = 0) -> Numbers:
+    """!
+    Take specific intensity in SI units and convert to another unit.
+
+    @param I_nu Specific intensity in SI units.
+    @param nu_arr Numpy array with frequencies of I_nu in Hz.
+    @param unit Output unit: "SI", "JySr", "RJ" (Rayleigh-Jeans temperature) or "dTCMB" (CMB temperature fluctuation).
+    @param z Redshift at which the CMB blackbody is evaluated for "dTCMB". Defaults to 0.
+
+    @returns The specific intensity in the requested unit.
+    """
+
+    if unit == "SI":
+        return I_nu
+    elif unit == "JySr":
+        return SI_JySr(I_nu)
+    elif unit == "RJ":
+        return SI_Temp(I_nu, nu_arr)
+    elif unit == "dTCMB":
+        return SI_dTCMB(I_nu, nu_arr, z)
+    
+    raise ValueError(f"Unknown unit {unit}.")
+
+def freq_x(nu_arr : Numbers,
+           z      : Numbers = 0) -> Numbers:
     """!
     Convert frequency in Hertz to dimensionless frequency using CMB temperature.
 
     @param nu_arr Numpy array with frequencies of I_nu in Hz.
+    @param z Redshift at which the CMB temperature is evaluated. Defaults to 0.
     
     @returns x The dimensionless frequency.
     """
 
-    x = const.h * nu_arr / (const.k * TCMB)
+    x = const.h * nu_arr / (const.k * TCMB_z(z))
 
     return x
 
-def x_freq(x : Numbers) -> Numbers:
+def x_freq(x : Numbers,
+           z : Numbers = 0) -> Numbers:
     """!
     Convert dimensionless frequency to frequency in Hertz using CMB temperature.
 
     @param x Dimensionless frequency.
+    @param z Redshift at which the CMB temperature is evaluated. Defaults to 0.
     
     @param nu_arr Numpy array with frequencies of I_nu in Hz.
     """
 
-    nu_arr = x / const.h * const.k * TCMB
+    nu_arr = x / const.h * const.k * TCMB_z(z)
 
     return nu_arr
 
@@ -0,0 +1,109 @@
+"""!
+@file
+FFT-based evaluation of the (n)tSZ signal as a convolution in logarithmic frequency.
+
+The scattered CMB intensity at frequency nu is the integral over s of K(s) * I_CMB(nu * exp(-s)).
+In terms of u = ln(nu), this is a convolution of the kernel with the CMB, both sampled on a shared grid in u and s.
+The signal on all grid frequencies is therefore obtained with a single FFT convolution, after which it is interpolated onto the requested frequencies.
+"""
+
+# STL
+from typing import Optional, Sequence, Tuple
+
+# External packages
+import numpy as np
+from scipy.interpolate import CubicSpline
+from scipy.signal import fftconvolve
+
+# MockSZ-specifics
+import MockSZ.Bindings as MBind
+import MockSZ.Dispatch as MDisp
+
+# Limits on s of the scattering kernels, mirroring MockSZ_getSignal_tSZ and MockSZ_getSignal_ntSZ
+S_LIMS = {"MJ" : (-3., 3.), "PL" : (-9., 18.)}
+
+def getKernelGrid(param : float,
+                  dist  : Optional[str]   = "MJ",
+                  ds    : Optional[float] = 5e-3,
+                  acc   : Optional[float] = 1e-6) -> Tuple[Sequence[float], Sequence[float]]:
+    """!
+    Sample a multi-electron scattering kernel on a uniform grid in s.
+
+    @param param Electron temperature in keV for "MJ", or powerlaw slope for "PL".
+    @param dist Electron distribution: "MJ" (Maxwell-Juttner, tSZ) or "PL" (powerlaw, ntSZ).
+    @param ds Spacing of grid in s. Is adjusted slightly so that the grid ends exactly on the kernel limits with an even number of intervals.
+    @param acc Required relative accuracy of integration of the kernel.
+
+    @returns s_arr Uniform grid in s.
+    @returns kernel Scattering kernel evaluated on s_arr.
+    """
+
+    if dist not in S_LIMS:
+        raise ValueError(f"Unknown distribution {dist}. Choose from {list(S_LIMS.keys())}.")
+
+    s0, s1 = S_LIMS[dist]
+    n_s = 2 * int(np.ceil((s1 - s0) / (2 * ds))) + 1
+    s_arr = np.linspace(s0, s1, n_s)
+
+    clib = MBind.loadMockSZlib()
+    func = clib.MockSZ_getMultiScatteringMJ if dist == "MJ" else clib.MockSZ_getMultiScatteringPL
+    kernel = MBind.getDistributionSingleParam(s_arr, param, acc, func=func)
+
+    return s_arr, kernel
+
+def getSignal_FFT(nu_arr : Sequence[float],
+                  param  : float,
+                  tau_e  : float,
+                  dist   : Optional[str]   = "MJ",
+                  ds     : Optional[float] = 5e-3,
+                  acc    : Optional[float] = 1e-6) -> Sequence[float]:
+    """!
+    Calculate the tSZ or ntSZ signal with a single FFT convolution in logarithmic frequency.
+
+    The kernel is sampled on a uniform grid in s with spacing ds, and the CMB on a grid in ln(nu) with the same spacing.
+    The convolution uses composite Simpson weights.
+    The kernel has a kink at s = 0, which lies on a grid node, so that the error still decreases quickly with ds.
+    The cost is O(N log N) in the number of grid points, independent of the number of requested frequencies.
+    The signal on the requested frequencies is obtained with cubic spline interpolation in ln(nu).
+
+    @param nu_arr Array of frequencies, in Hz. All frequencies should be positive.
+    @param param Electron temperature in keV for "MJ", or powerlaw slope for "PL".
+    @param tau_e Optical depth along sightline.
+    @param dist Electron distribution: "MJ" (Maxwell-Juttner, tSZ) or "PL" (powerlaw, ntSZ).
+    @param ds Spacing of grid in s and ln(nu).
+    @param acc Required relative accuracy of integration of the kernel.
+
+    @returns res Array of the same shape as nu_arr, containing the signal.
+    """
+
+    nu_arr = np.asarray(nu_arr, dtype=np.float64)
+    if np.any(nu_arr <= 0):
+        raise ValueError("Frequencies in nu_arr should be positive, since the convolution is done in ln(nu).")
+
+    s_arr, kernel = getKernelGrid(param, dist, ds, acc)
+    ds = s_arr[1] - s_arr[0]
+
+    weights = np.full(s_arr.size, 2 * ds / 3)
+    weights[1::2] *= 2
+    weights[[0, -1]] = ds / 3
+
+    # Grid in u = ln(nu) for CMB, covering all u - s needed for the requested frequencies
+    u_min = np.log(np.min(nu_arr))
+    u_max = np.log(np.max(nu_arr))
+    n_u = int(np.ceil((u_max - u_min) / ds)) + 1
+    u_CMB = u_min - s_arr[-1] + ds * np.arange(n_u + s_arr.size - 1)
+    # Far in the Wien tail, exp overflows and the CMB correctly evaluates to zero
+    with np.errstate(over="ignore"):
+        I_CMB = MDisp.getCMB(np.exp(u_CMB))
+        I_CMB_out = MDisp.getCMB(np.exp(u_min + ds * np.arange(n_u)))
+
+    # Valid part of convolution is defined on u_min + ds * n, n = 0, ..., n_u - 1
+    I_scat = fftconvolve(I_CMB, kernel * weights, mode="valid")
+    u_out = u_min + ds * np.arange(I_scat.size)
+
+    res_grid = tau_e * (I_scat - I_CMB_out)
+
+    if u_out.size < 2:
+        return np.full(nu_arr.shape, res_grid[0])
+
+    return CubicSpline(u_out, res_grid)(np.log(nu_arr))
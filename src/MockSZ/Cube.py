@@ -0,0 +1,235 @@
+"""!
+@file
+Lazy representation of separable SZ cubes.
+An isothermal cluster cube is the outer product of an optical depth screen and a single spectrum, plus a spectral offset such as the CMB.
+Only these factors are stored, and the cube is materialised only where it is needed.
+"""
+
+# STL
+from typing import Any, Optional, Sequence, Tuple, Union
+
+# External packages
+import numpy as np
+
+class SeparableCube(object):
+    """!
+    Class representing a cube of the form screen[..., None] * spectrum + offset, without storing the full cube.
+
+    The object behaves like a read-only numpy array of shape screen.shape + (spectrum.size,).
+    Indexing follows numpy semantics: the last index acts on the spectral axis, all others on the screen.
+    Slices that keep the spectral axis and at least one spatial axis are returned as a SeparableCube again, other selections as numpy arrays.
+    Calling numpy.asarray on the object materialises the full cube.
+
+    Attributes:
+        screen Optical depth screen, of arbitrary dimension.
+        spectrum 1D array containing the signal per unit optical depth.
+        offset 1D array of the same size as spectrum, added to every pixel. Can be None.
+
+    @ingroup clustermodels
+    """
+
+    def __init__(self, screen   : Sequence[float],
+                       spectrum : Sequence[float],
+                       offset   : Optional[Sequence[float]] = None) -> None:
+        """!
+        Initialise a separable cube.
+
+        @param screen Optical depth screen.
+        @param spectrum Signal per unit optical depth.
+        @param offset Signal added to every pixel, for example the CMB.
+            Defaults to None, which adds nothing.
+        """
+
+        self.screen = np.asarray(screen, dtype=np.float64)
+        self.spectrum = np.asarray(spectrum, dtype=np.float64).ravel()
+        self.offset = None if offset is None else np.asarray(offset, dtype=np.float64).ravel()
+
+        if self.offset is not None and self.offset.size != self.spectrum.size:
+            raise ValueError("Offset should have the same size as spectrum.")
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.screen.shape + self.spectrum.shape
+
+    @property
+    def ndim(self) -> int:
+        return self.screen.ndim + 1
+
+    @property
+    def size(self) -> int:
+        return self.screen.size * self.spectrum.size
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.spectrum.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __repr__(self) -> str:
+        return f"SeparableCube(shape={self.shape}, offset={self.offset is not None})"
+
+    def __array__(self, dtype : Optional[Any] = None, copy : Optional[bool] = None) -> np.ndarray:
+        res = self.toArray()
+        return res if dtype is None else res.astype(dtype, copy=False)
+
+    def __getitem__(self, key : Any) -> Union["SeparableCube", np.ndarray, float]:
+        key_spatial, key_spectral = self._splitKey(key)
+
+        screen = self.screen[key_spatial]
+        spectrum = self.spectrum[key_spectral]
+        offset = None if self.offset is None else self.offset[key_spectral]
+
+        if np.ndim(screen) > 0 and np.ndim(spectrum) > 0:
+            return SeparableCube(screen, spectrum, offset)
+
+        res = np.multiply.outer(screen, spectrum)
+        if offset is not None:
+            res = res + offset
+        return res
+
+    def getChannel(self, idx : int) -> np.ndarray:
+        """!
+        Get the map of a single spectral channel.
+
+        @param idx Index of channel.
+
+        @returns Map of shape screen.shape.
+        """
+
+        return self[..., idx]
+
+    def getSpectrum(self, *idx : int) -> np.ndarray:
+        """!
+        Get the spectrum of a single pixel.
+
+        @param idx Indices of pixel in the screen.
+
+        @returns Spectrum of shape spectrum.shape.
+        """
+
+        return self[idx]
+
+    def sum(self, axis : Optional[Union[int, Tuple[int, ...]]] = None) -> Union["SeparableCube", np.ndarray, float]:
+        """!
+        Sum the cube over one or more axes, without materialising it.
+
+        @param axis Axis or tuple of axes to sum over. Defaults to None, which sums over all axes.
+
+        @returns Sum, as a SeparableCube if the spectral axis and at least one spatial axis remain, else a numpy array or float.
+        """
+
+        axes_spatial, spectral = self._splitAxis(axis)
+
+        if axes_spatial:
+            count = np.prod([self.screen.shape[ax] for ax in axes_spatial])
+            screen = self.screen.sum(axis=axes_spatial)
+            offset = None if self.offset is None else count * self.offset
+
+            if screen.ndim == 0 and not spectral:
+                res = screen * self.spectrum
+                return res if offset is None else res + offset
+
+            cube = SeparableCube(screen, self.spectrum, offset)
+        else:
+            cube = self
+
+        if not spectral:
+            return cube
+
+        res = cube.screen * np.sum(cube.spectrum)
+        if cube.offset is not None:
+            res = res + np.sum(cube.offset)
+        return res
+
+    def mean(self, axis : Optional[Union[int, Tuple[int, ...]]] = None) -> Union["SeparableCube", np.ndarray, float]:
+        """!
+        Average the cube over one or more axes, without materialising it.
+
+        @param axis Axis or tuple of axes to average over. Defaults to None, which averages over all axes.
+
+        @returns Average, of the same type as returned by sum.
+        """
+
+        axes_spatial, spectral = self._splitAxis(axis)
+        count = np.prod([self.screen.shape[ax] for ax in axes_spatial]) * (self.spectrum.size if spectral else 1)
+
+        res = self.sum(axis)
+        if isinstance(res, SeparableCube):
+            return SeparableCube(res.screen / count, res.spectrum, None if res.offset is None else res.offset / count)
+        return res / count
+
+    def toArray(self, out       : Optional[np.ndarray] = None,
+                      chunksize : Optional[int] = 64) -> np.ndarray:
+        """!
+        Materialise the full cube.
+
+        @param out Array of shape self.shape to write the cube into, for example a numpy memmap.
+            Defaults to None, in which case a new array is allocated.
+        @param chunksize Number of rows along the first axis written at once, limiting temporary memory when writing to out.
+
+        @returns The cube as numpy array.
+        """
+
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+
+        elif out.shape != self.shape:
+            raise ValueError(f"Output array should have shape {self.shape}.")
+
+        if self.screen.ndim == 0:
+            out[...] = self[()]
+            return out
+
+        for i0 in range(0, self.shape[0], chunksize):
+            out[i0:i0+chunksize] = np.multiply.outer(self.screen[i0:i0+chunksize], self.spectrum)
+            if self.offset is not None:
+                out[i0:i0+chunksize] += self.offset
+
+        return out
+
+    def _splitKey(self, key : Any) -> Tuple[tuple, Any]:
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if any(k is None for k in key):
+            raise IndexError("SeparableCube does not support inserting new axes.")
+
+        # Boolean masks index as many axes as they have dimensions
+        def _nDims(k):
+            return np.ndim(k) if isinstance(k, np.ndarray) and k.dtype == bool else 1
+
+        n_ellipsis = sum(k is Ellipsis for k in key)
+        n_dims = sum(_nDims(k) for k in key if k is not Ellipsis)
+
+        if n_ellipsis > 1:
+            raise IndexError("An index can only have a single ellipsis ('...').")
+
+        if n_dims > self.ndim:
+            raise IndexError(f"Too many indices for SeparableCube: cube is {self.ndim}-dimensional, but {n_dims} were indexed.")
+
+        if n_ellipsis == 1:
+            idx = next(i for i, k in enumerate(key) if k is Ellipsis)
+            key = key[:idx] + (slice(None),) * (self.ndim - n_dims) + key[idx+1:]
+        else:
+            key = key + (slice(None),) * (self.ndim - n_dims)
+
+        if _nDims(key[-1]) != 1:
+            raise IndexError("Boolean masks cannot span both spatial and spectral axes of a SeparableCube.")
+
+        # Numpy would broadcast integer arrays on spatial and spectral axes against each other, which does not factorise
+        if np.ndim(key[-1]) > 0 and any(np.ndim(k) > 0 for k in key[:-1]):
+            raise IndexError("SeparableCube does not support array indices on both spatial and spectral axes.")
+
+        return key[:-1], key[-1]
+
+    def _splitAxis(self, axis : Optional[Union[int, Tuple[int, ...]]]) -> Tuple[tuple, bool]:
+        if axis is None:
+            axis = tuple(range(self.ndim))
+        elif not isinstance(axis, tuple):
+            axis = (axis,)
+
+        axis = tuple(sorted(set(ax % self.ndim for ax in axis)))
+        spectral = self.ndim - 1 in axis
+
+        return tuple(ax for ax in axis if ax != self.ndim - 1), spectral
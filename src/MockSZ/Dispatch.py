@@ -0,0 +1,400 @@
+"""!
+@file
+Size-based dispatch between vectorised NumPy implementations and the C++ backend.
+This is only done for functions that are simple closed-form expressions, for which the overhead of calling the backend dominates for small arrays.
+
+Below a threshold size, a NumPy implementation is used, and above it the C++ backend.
+The thresholds can be set directly, or measured on the current machine with calibrate().
+Measured thresholds are stored in a JSON file, by default ~/.mocksz/dispatch.json, or the path in the MOCKSZ_DISPATCH_CONFIG environment variable.
+After installing, the thresholds can be measured by running:
+
+    python -m MockSZ.Dispatch --calibrate
+"""
+
+# STL
+import argparse
+import json
+import os
+import time
+from typing import Callable, Optional, Sequence
+
+# External packages
+import numpy as np
+from scipy.special import gamma, kn
+
+# MockSZ-specifics
+import MockSZ.Bindings as MBind
+
+# Constants mirroring Constants.h, so that both paths agree to rounding error
+CH = 6.62607015E-34
+KB = 1.380649E-23
+CL = 2.99792458E8
+ME = 9.1093837E-31
+EV = 1.602176634E-19
+ST = 6.65245E-29
+DBL_EPSILON = 2.220446E-16
+TCMB = 2.726
+PI = 3.14159265359
+
+# Measured with calibrate() on a single thread. None means that the backend was not faster up to 2**22 elements.
+# With more threads the backend wins at smaller sizes, so calibrate() should be run on multi-core machines.
+DEFAULT_THRESHOLDS = {
+        "getCMB"                : 2**18,
+        "getSignal_corrections" : 2**16,
+        "getMaxwellJuttner"     : 2**22,
+        "getPowerlaw"           : None,
+        "getIsoBeta"            : None,
+        }
+
+_thresholds = None
+
+def getConfigPath() -> str:
+    """!
+    Get path to the file containing measured thresholds.
+
+    @returns Path to JSON file.
+    """
+
+    return os.environ.get("MOCKSZ_DISPATCH_CONFIG",
+                          os.path.join(os.path.expanduser("~"), ".mocksz", "dispatch.json"))
+
+def getThresholds() -> dict:
+    """!
+    Get the current crossover thresholds.
+    Defaults are overridden by the thresholds in the configuration file, if it exists.
+
+    @returns Dictionary with function names as keys and thresholds as values.
+        Arrays with fewer elements than the threshold are evaluated with NumPy.
+        A threshold of None means NumPy is always used.
+    """
+
+    global _thresholds
+
+    if _thresholds is None:
+        _thresholds = dict(DEFAULT_THRESHOLDS)
+        try:
+            with open(getConfigPath()) as f:
+                _thresholds.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    return _thresholds
+
+def setThreshold(name      : str,
+                 threshold : Optional[int]) -> None:
+    """!
+    Set the crossover threshold of a function for the current session.
+
+    @param name Name of function, e.g. "getCMB".
+    @param threshold Size from which the C++ backend is used.
+        0 always uses the backend, None always uses NumPy.
+    """
+
+    if name not in DEFAULT_THRESHOLDS:
+        raise KeyError(f"No dispatch available for {name}.")
+
+    getThresholds()[name] = threshold
+
+def useNumpy(name : str,
+             size : int) -> bool:
+    """!
+    Check whether an array of a certain size should be evaluated with NumPy.
+
+    @param name Name of function.
+    @param size Number of elements to evaluate.
+
+    @returns Whether to use NumPy.
+    """
+
+    threshold = getThresholds()[name]
+    return threshold is None or size < threshold
+
+def getCMB(nu_arr   : Sequence[float],
+           nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Calculate CMB blackbody.
+
+    @param nu_arr Numpy array of frequencies for CMB, in Hz.
+    @param nThreads Number of threads for the C++ backend. If None, use all available CPUs.
+
+    @returns output Array containing CMB.
+    """
+
+    if useNumpy("getCMB", np.size(nu_arr)):
+        return getCMB_np(nu_arr)
+    return MBind.getCMB(nu_arr, nThreads)
+
+def getSignal_corrections(nu_arr   : Sequence[float],
+                          Te       : float,
+                          beta_pec : float,
+                          cosu     : float,
+                          nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Calculate correction (cross) terms up to second order in bulk velocity and electron temperature.
+
+    @param nu_arr Numpy array of frequencies, in Hz.
+    @param Te Electron temperature in keV.
+    @param beta_pec Dimensionless peculiar velocity of cluster.
+    @param cosu Direction cosine between peculiar velocity and sightline.
+    @param nThreads Number of threads for the C++ backend. If None, use all available CPUs.
+
+    @returns output Array containing corrections.
+    """
+
+    if useNumpy("getSignal_corrections", np.size(nu_arr)):
+        return getSignal_corrections_np(nu_arr, Te, beta_pec, cosu)
+    return MBind.getSignal_corrections(nu_arr, Te, beta_pec, cosu, nThreads)
+
+def getMaxwellJuttner(beta_arr : Sequence[float],
+                      Te       : float,
+                      nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Calculate a Maxwell-Juttner distribution.
+
+    @param beta_arr Numpy array of dimensionless electron velocities.
+    @param Te Electron temperature in keV.
+    @param nThreads Number of threads for the C++ backend. If None, use all available CPUs.
+
+    @returns output Array containing Maxwell-Juttner distribution.
+    """
+
+    if useNumpy("getMaxwellJuttner", np.size(beta_arr)):
+        return getMaxwellJuttner_np(beta_arr, Te)
+    return MBind.getMaxwellJuttner(beta_arr, Te, nThreads)
+
+def getPowerlaw(beta_arr : Sequence[float],
+                alpha    : float,
+                nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Calculate a relativistic powerlaw distribution.
+
+    @param beta_arr Numpy array of dimensionless electron velocities.
+    @param alpha Slope of powerlaw.
+    @param nThreads Number of threads for the C++ backend. If None, use all available CPUs.
+
+    @returns output Array containing powerlaw distribution.
+    """
+
+    if useNumpy("getPowerlaw", np.size(beta_arr)):
+        return getPowerlaw_np(beta_arr, alpha)
+    return MBind.getPowerlaw(beta_arr, alpha, nThreads)
+
+def getIsoBeta(Az       : Sequence[float],
+               El       : Sequence[float],
+               ibeta    : float,
+               ne0      : float,
+               thetac   : float,
+               Da       : float,
+               grid     : bool,
+               nThreads : Optional[int] = None) -> Sequence[float]:
+    """!
+    Calculate an isothermal-beta optical depth screen.
+    See Bindings.getIsoBeta for a description of the parameters.
+
+    @returns output The optical depth screen.
+    """
+
+    size = np.size(Az) * np.size(El) if grid else np.size(Az)
+    if useNumpy("getIsoBeta", size):
+        return getIsoBeta_np(Az, El, ibeta, ne0, thetac, Da, grid)
+    return MBind.getIsoBeta(Az, El, ibeta, ne0, thetac, Da, grid, nThreads)
+
+def getCMB_np(nu_arr : Sequence[float]) -> Sequence[float]:
+    """!
+    NumPy implementation of get_CMB in Signal.cpp.
+    """
+
+    nu_arr = np.asarray(nu_arr, dtype=np.float64)
+    return 2 * CH * nu_arr**3 / (CL*CL) / np.expm1(CH * nu_arr / (KB * TCMB))
+
+def getSignal_corrections_np(nu_arr   : Sequence[float],
+                             Te       : float,
+                             beta_pec : float,
+                             cosu     : float) -> Sequence[float]:
+    """!
+    NumPy implementation of calcSignal_corrections in Signal.cpp.
+    """
+
+    nu_arr = np.asarray(nu_arr, dtype=np.float64)
+    X = CH * nu_arr / KB / TCMB
+    theta = KB * (Te * 1e3 / KB * EV) / (ME * CL * CL)
+    eX = np.exp(X)
+    Xt = X / np.tanh(X/2)
+    St = X / np.sinh(X/2)
+
+    prefac = 2*CH * nu_arr**3 / CL / CL * X * eX / (eX-1) / (eX-1)
+
+    Y0 = Xt - 4
+    Y1 = -10 + Xt*(47./2 - Xt*(42./5 - Xt*7./10)) + St*(-21./5 + Xt*7./5)
+    out = beta_pec*beta_pec * (Y0/3 + theta*(5.*Y0/6 + 2.*Y1/3))
+
+    C1 = 10 - Xt*(47./5 - Xt*7./5) + 7./10*St*St
+    C2 = (25 + Xt*(-111.7 + Xt*(84.7 + Xt*(-18.3 + 11./10*Xt))) +
+          St*St*(84.7/2 + Xt*(-183./5 + 12.1/2*Xt) + 11./10*St*St))
+    out -= beta_pec * cosu * theta*(C1 + theta*C2)
+
+    D0 = -2./3 + 11./30*Xt
+    D1 = -4 + Xt*(12 + Xt*(-6 + 19./30*Xt)) + St*St*(-3 + 19./15 * Xt)
+    out += beta_pec*beta_pec * 0.5 * (3*cosu*cosu - 1) * (D0 + theta * D1)
+
+    return prefac * out
+
+def getMaxwellJuttner_np(beta_arr : Sequence[float],
+                         Te       : float) -> Sequence[float]:
+    """!
+    NumPy implementation of getMaxwellJuttner in Stats.cpp.
+    """
+
+    beta_arr = np.asarray(beta_arr, dtype=np.float64)
+    theta = KB * (Te * 1e3 / KB * EV) / (ME * CL * CL)
+    gamma_e = 1 / np.sqrt(1 - beta_arr**2)
+
+    return gamma_e**5 * beta_arr**2 * np.exp(-gamma_e / theta) / (theta * kn(2, 1/theta))
+
+def getPowerlaw_np(beta_arr : Sequence[float],
+                   alpha    : float) -> Sequence[float]:
+    """!
+    NumPy implementation of MockSZ_getPowerlaw in InterfaceCPU.cpp, including the normalisation of getNormPL.
+    """
+
+    beta_arr = np.asarray(beta_arr, dtype=np.float64)
+    gamma2 = 1 / np.sqrt(1 - (1 - DBL_EPSILON)**2)
+    gamma1 = 1.
+
+    if alpha < 0:
+        A = np.log10(gamma2/gamma1)
+        alpha = 1.
+    else:
+        A = (1 - alpha) / (gamma2**(1-alpha) - gamma1**(1-alpha))
+
+    gamma_e = 1 / np.sqrt(1 - beta_arr**2)
+    return A * gamma_e**(-alpha) * beta_arr * (1 - beta_arr**2)**(-1.5)
+
+def getIsoBeta_np(Az     : Sequence[float],
+                  El     : Sequence[float],
+                  ibeta  : float,
+                  ne0    : float,
+                  thetac : float,
+                  Da     : float,
+                  grid   : bool) -> Sequence[float]:
+    """!
+    NumPy implementation of getIsoBeta in Stats.cpp.
+    """
+
+    Az = np.asarray(Az, dtype=np.float64).ravel()
+    El = np.asarray(El, dtype=np.float64).ravel()
+
+    Da_si = Da * 1e6 * 3.0857e16
+    rc = thetac / 3600 / 180 * PI * Da_si
+
+    te0 = ne0*1e6 * ST * rc * np.sqrt(PI) * gamma(1.5*ibeta - 0.5) / gamma(1.5*ibeta)
+
+    if grid:
+        theta2 = Az[:,None]**2 + El[None,:]**2
+    else:
+        theta2 = Az**2 + El**2
+
+    return te0 * (1 + theta2/(thetac*thetac))**(0.5-1.5*ibeta)
+
+def _getCases(size : int) -> dict:
+    """!
+    Generate representative inputs of a given size for each dispatched function.
+
+    @param size Number of elements.
+
+    @returns Dictionary with function names as keys and tuples (NumPy function, backend function, arguments) as values.
+    """
+
+    nu_arr = np.linspace(10e9, 1000e9, size)
+    beta_arr = np.linspace(0.01, 0.99, size)
+    n_side = max(int(np.sqrt(size)), 1)
+    Az = np.linspace(-100, 100, n_side)
+
+    return {
+            "getCMB"                : (getCMB_np, MBind.getCMB, (nu_arr,)),
+            "getSignal_corrections" : (getSignal_corrections_np, MBind.getSignal_corrections, 
+                                       (nu_arr, 10., 1e-3, 0.5)),
+            "getMaxwellJuttner"     : (getMaxwellJuttner_np, MBind.getMaxwellJuttner, (beta_arr, 10.)),
+            "getPowerlaw"           : (getPowerlaw_np, MBind.getPowerlaw, (beta_arr, 2.5)),
+            "getIsoBeta"            : (getIsoBeta_np, MBind.getIsoBeta,
+                                       (Az, Az, 0.7, 1e-2, 15., 1500., True)),
+            }
+
+def validate(size : Optional[int] = 1000) -> dict:
+    """!
+    Validate the NumPy implementations against the C++ backend.
+
+    @param size Number of elements to test with.
+
+    @returns Dictionary with function names as keys and maximum relative deviation between both paths as values.
+    """
+
+    deviations = {}
+    for name, (func_np, func_be, args) in _getCases(size).items():
+        res_np = func_np(*args)
+        res_be = func_be(*args)
+        deviations[name] = float(np.max(np.absolute(res_np - res_be)) / np.max(np.absolute(res_be)))
+
+    return deviations
+
+def calibrate(sizes   : Optional[Sequence[int]] = None,
+              repeats : Optional[int] = 5,
+              save    : Optional[bool] = True) -> dict:
+    """!
+    Measure the crossover thresholds on the current machine.
+    For each function, the threshold is the smallest tested size from which the backend is faster for all larger tested sizes.
+
+    @param sizes Array sizes to test. Defaults to powers of two from 2**4 up to 2**22.
+    @param repeats Number of repetitions per measurement. The fastest one is used.
+    @param save Whether to store the thresholds in the configuration file.
+
+    @returns Dictionary with measured thresholds.
+    """
+
+    if sizes is None:
+        sizes = [2**k for k in range(4, 23, 2)]
+
+    def _time(func : Callable, args : tuple) -> float:
+        best = np.inf
+        for _ in range(repeats):
+            t1 = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - t1)
+        return best
+
+    backend_faster = {name : [] for name in DEFAULT_THRESHOLDS}
+    for size in sizes:
+        for name, (func_np, func_be, args) in _getCases(size).items():
+            backend_faster[name].append(_time(func_be, args) < _time(func_np, args))
+
+    thresholds = {}
+    for name, faster in backend_faster.items():
+        thresholds[name] = None
+        for i in range(len(sizes)-1, -1, -1):
+            if not faster[i]:
+                break
+            thresholds[name] = sizes[i]
+
+    getThresholds().update(thresholds)
+
+    if save:
+        path = getConfigPath()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(thresholds, f, indent=4)
+
+    return thresholds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure and validate NumPy/backend dispatch thresholds of MockSZ.")
+    parser.add_argument("--calibrate", action="store_true", help="measure thresholds and store them")
+    parser.add_argument("--validate", action="store_true", help="compare NumPy and backend results")
+    args = parser.parse_args()
+
+    if args.validate:
+        for name, dev in validate().items():
+            print(f"{name:24s} max. relative deviation {dev:.3e}")
+
+    if args.calibrate:
+        for name, threshold in calibrate().items():
+            print(f"{name:24s} threshold {threshold}")
@@ -5,6 +5,7 @@ Additionally, this file contains a class that is useful for investigating scatte
 """
 
 # STL
+from collections import OrderedDict
 from time import time
 from typing import Callable, Optional, Sequence
 
@@ -13,8 +14,19 @@ import numpy as np
 import scipy.constants as const
 
 # MockSZ-specifics
+import MockSZ.Adaptive as MAdapt
 import MockSZ.Bindings as MBind
 import MockSZ.Conversions as MConv
+import MockSZ.Convolution as MConvol
+import MockSZ.Cube as MCube
+import MockSZ.Dispatch as MDisp
+from MockSZ.Cache import ResultCache, cached, hashInputs
+
+# Maximum number of memoised components per SinglePointing object
+MEMO_SIZE = 64
+
+# Cluster parameters read by the single-pointing signals, which are part of their cache key
+SIGNAL_STATE = ("param", "v_pec", "phi_cl", "tau_e", "no_CMB")
 
 def timer_func(func : Callable) -> Callable: 
     """!
@@ -41,8 +53,18 @@ class SinglePointing(object):
     """! 
     Class for generating a single pointing SZ signal. Can choose between tSZ, kSZ and ntSZ (powerlaw).
 
+    The cluster parameters param (or Te), v_pec, phi_cl and tau_e can be changed after construction.
+    With memoise=True, the tkSZ signal is assembled from memoised components per unit optical depth,
+    so that changing tau_e only rescales them, and changing v_pec or phi_cl only recomputes the kSZ and correction terms.
+
+    The distortions are universal functions of x = h nu / (k T_CMB(z)), with T_CMB(z) = TCMB * (1 + z).
+    Therefore, the signal at observed frequencies does not depend on the cluster redshift z, 
+    while the signal in the cluster rest frame is a rescaled copy of it, see getSingleSignal_z.
+
     Attributes:
         clib Library containing backend functions.
+        memoise Whether or not to memoise signal components.
+        adaptive_err Estimated maximum relative interpolation error of the last signal, or None if it was not sampled adaptively.
     
     @ingroup singlepointing
     """
@@ -51,7 +73,10 @@ class SinglePointing(object):
                        v_pec    : Optional[float] = None, 
                        phi_cl   : Optional[float] = 0, 
                        tau_e    : Optional[float] = 1, 
-                       no_CMB   : Optional[bool]  = False) -> None:
+                       no_CMB   : Optional[bool]  = False,
+                       cache    : Optional[ResultCache] = None,
+                       memoise  : Optional[bool]  = False,
+                       z        : Optional[float] = 0) -> None:
         """!
         Initialise a single-pointing model of a galaxy cluster.
 
@@ -68,87 +93,375 @@ class SinglePointing(object):
             Defaults to None, which puts the optical depth at 1.
         @param no_CMB Whether or not to add the CMB signal to the distortions.
             Defaults to False (CMB added on top).
+        @param cache ResultCache for storing results on disk.
+            Defaults to None, which disables caching.
+        @param memoise Whether or not to memoise the CMB, tSZ, kSZ and correction terms of getSingleSignal_tkSZ in memory.
+            Defaults to False.
+        @param z Redshift of cluster, used as default redshift by getSingleSignal_z.
+            Defaults to 0.
         """
 
         self.param = param
         self.v_pec = v_pec
+        self.phi_cl = phi_cl
         self.tau_e = tau_e
+        self.z = z
         self.no_CMB = no_CMB
 
-        if v_pec is not None:
-            self.beta_cl = self.v_pec * 1e3 / const.c
-            self.beta_cl_z = np.cos(np.radians(phi_cl))
-
-        else:
-            self.beta_cl = None
-            self.beta_cl_z = None
+        self.memoise = memoise
+        self._memo = OrderedDict()
+        self.adaptive_err = None
 
+        self.cache = cache
         self.clib = MBind.loadMockSZlib()
+
+    @property
+    def param(self) -> Optional[float]:
+        """!
+        Parameter (Te in keV, or alpha) governing cluster properties. None leaves out the tSZ/ntSZ effect.
+        """
+        return self._param
+
+    @param.setter
+    def param(self, value : Optional[float]) -> None:
+        self._param = value
+
+    @property
+    def Te(self) -> Optional[float]:
+        """!
+        Electron temperature in keV. Alias of param.
+        """
+        return self._param
+
+    @Te.setter
+    def Te(self, value : Optional[float]) -> None:
+        self._param = value
+
+    @property
+    def v_pec(self) -> Optional[float]:
+        """!
+        Absolute peculiar velocity of cluster, in km / s. None puts the cluster at rest w.r.t. the CMB frame.
+        """
+        return self._v_pec
+
+    @v_pec.setter
+    def v_pec(self, value : Optional[float]) -> None:
+        self._v_pec = value
+
+    @property
+    def phi_cl(self) -> float:
+        """!
+        Angle between line-of-sight (pointing away from observer) and cluster velocity, in degrees.
+        """
+        return self._phi_cl
+
+    @phi_cl.setter
+    def phi_cl(self, value : float) -> None:
+        self._phi_cl = value
+
+    @property
+    def tau_e(self) -> float:
+        """!
+        Electron optical depth of cluster.
+        """
+        return self._tau_e
+
+    @tau_e.setter
+    def tau_e(self, value : float) -> None:
+        self._tau_e = value
+
+    @property
+    def z(self) -> float:
+        """!
+        Redshift of cluster.
+        """
+        return self._z
+
+    @z.setter
+    def z(self, value : float) -> None:
+        self._z = value
+
+    @property
+    def beta_cl(self) -> Optional[float]:
+        """!
+        Dimensionless peculiar velocity of cluster, derived from v_pec.
+        """
+        return None if self._v_pec is None else self._v_pec * 1e3 / const.c
+
+    @property
+    def beta_cl_z(self) -> Optional[float]:
+        """!
+        Direction cosine between cluster velocity and line-of-sight, derived from phi_cl.
+        """
+        return None if self._v_pec is None else np.cos(np.radians(self._phi_cl))
+
+    def clearMemo(self) -> None:
+        """!
+        Remove all memoised signal components.
+        """
+
+        self._memo.clear()
     
     @timer_func
+    @cached(state=SIGNAL_STATE, restore=("adaptive_err",))
     def getSingleSignal_tkSZ(self, nu_arr   : Sequence[float], 
                                    timer    : Optional[bool]  = False, 
-                                   acc      : Optional[float] = 1e-6) -> Sequence[float]:
+                                   acc      : Optional[float] = 1e-6,
+                                   unit     : Optional[str]   = "SI",
+                                   mode     : Optional[str]   = "direct",
+                                   adaptive : Optional[bool]  = False,
+                                   rtol     : Optional[float] = 1e-6,
+                                   kernel   : Optional[tuple] = None) -> Sequence[float]:
         """!
         Generate a single pointing signal of the tSZ effect.
+        All components (CMB, tSZ, kSZ and correction terms) are calculated in a single backend call.
+
+        With adaptive=True, the tSZ, kSZ and correction terms are only evaluated on an adaptively refined subset of nu_arr,
+        and interpolated onto the other frequencies, see Adaptive.sampleAdaptive.
+        The CMB is added exactly afterwards, and the estimated maximum relative interpolation error is stored in self.adaptive_err.
 
         @param nu_arr Array of frequencies for tSZ effect, in Hz.
         @param timer Time function execution. Used in decorator.
-        @param acc Required relative accuracy of integration.
+        @param acc Required relative accuracy of integration. Sets the tSZ integration and the order of the Gauss-Legendre rule for the kSZ integral.
+        @param unit Unit of output: "SI" (default), "JySr", "RJ" (Rayleigh-Jeans temperature) or "dTCMB" (CMB temperature fluctuation).
+        @param mode Evaluation of tSZ: "direct" (default) integrates per frequency,
+            "fft" evaluates all frequencies with a single convolution in logarithmic frequency, see Convolution.getSignal_FFT.
+            The "fft" mode pays off for many frequencies.
+        @param adaptive Whether or not to sample the SZ terms adaptively. Pays off for dense frequency grids.
+            Defaults to False.
+        @param rtol Required interpolation error of adaptive sampling, relative to the maximum absolute SZ signal.
+        @param kernel Tuple (wk, es) of tSZ kernel weights from Bindings.getKernelWeights(param, "MJ", acc), 
+            shared between signals with the same temperature. Only used in "direct" mode without memoisation.
+            Defaults to None, which tabulates the kernel in every call.
         
         @returns res 1D array containing tSZ effect.
         """
 
-        res = np.zeros(nu_arr.size)
+        components = 0
         
         if not self.no_CMB:
-            res += self.getCMB(nu_arr)
+            components |= MBind.SIG_CMB
         
         if self.param is not None:
-            res += MBind.getDistributionTwoParam(nu_arr, self.param, self.tau_e, acc, 
-                                    func=self.clib.MockSZ_getSignal_tSZ)
+            components |= MBind.SIG_TSZ
 
         if self.v_pec is not None:
-                
-            res += MBind.getDistributionTwoParam(nu_arr, self.beta_cl * self.beta_cl_z, self.tau_e, acc, 
-                                        func=self.clib.MockSZ_getSignal_kSZ)
+            components |= MBind.SIG_KSZ
             if self.param is not None:
-                res += self.tau_e * MBind.getDistributionTwoParam(nu_arr, self.param, self.beta_cl, self.beta_cl_z, 
-                                            func=self.clib.MockSZ_getSignal_corrections)
-        
-        return res
+                components |= MBind.SIG_CORR
+
+        Te = self.param if self.param is not None else 0.
+        beta_pec = self.beta_cl if self.beta_cl is not None else 0.
+        cosu = self.beta_cl_z if self.beta_cl_z is not None else 0.
+
+        if mode not in ["direct", "fft"]:
+            raise ValueError(f"Unknown mode {mode}. Choose from ['direct', 'fft'].")
+
+        if not adaptive:
+            self.adaptive_err = None
+            return self._getSignal_tkSZ(nu_arr, Te, beta_pec, cosu, components, acc, unit, mode, kernel)
+
+        nu_arr = np.asarray(nu_arr, dtype=np.float64)
+        func = lambda nu: self._getSignal_tkSZ(nu, Te, beta_pec, cosu, components & ~MBind.SIG_CMB, acc, "SI", mode, kernel, False)
+        res, self.adaptive_err, _ = MAdapt.sampleAdaptive(func, nu_arr, rtol)
+
+        if components & MBind.SIG_CMB:
+            res += self.getCMB(nu_arr)
+
+        return MConv.SI_unit(res, nu_arr, unit)
     
     @timer_func
+    @cached(state=SIGNAL_STATE, restore=("adaptive_err",))
     def getSingleSignal_ntkSZ(self, nu_arr  : Sequence[float], 
                                     timer   : Optional[bool]  = False, 
-                                    acc     : Optional[float] = 1e-6) -> Sequence[float]:
+                                    acc      : Optional[float] = 1e-6,
+                                    mode     : Optional[str]   = "direct",
+                                    adaptive : Optional[bool]  = False,
+                                    rtol     : Optional[float] = 1e-6) -> Sequence[float]:
         """!
         Generate a single pointing signal of the ntSZ effect, according to a powerlaw.
+        With adaptive=True, the ntSZ and kSZ terms are sampled adaptively, as in getSingleSignal_tkSZ.
 
         @param nu_arr Numpy array of frequencies for ntSZ effect, in Hz.
         @param timer Time function execution. Used in decorator.
         @param acc Required relative accuracy of integration.
+        @param mode Evaluation of ntSZ: "direct" (default) integrates per frequency,
+            "fft" evaluates all frequencies with a single convolution in logarithmic frequency, see Convolution.getSignal_FFT.
+        @param adaptive Whether or not to sample the SZ terms adaptively. Pays off for dense frequency grids.
+            Defaults to False.
+        @param rtol Required interpolation error of adaptive sampling, relative to the maximum absolute SZ signal.
         
         @returns res 1D array containing ntSZ effect.
         """
         
-        res = np.zeros(nu_arr.size)
+        if mode not in ["direct", "fft"]:
+            raise ValueError(f"Unknown mode {mode}. Choose from ['direct', 'fft'].")
+
+        if adaptive:
+            nu_arr = np.asarray(nu_arr, dtype=np.float64)
+            res, self.adaptive_err, _ = MAdapt.sampleAdaptive(lambda nu: self._getSignal_ntkSZ(nu, acc, mode), nu_arr, rtol)
+        else:
+            self.adaptive_err = None
+            res = self._getSignal_ntkSZ(nu_arr, acc, mode)
         
         if not self.no_CMB:
             res += self.getCMB(nu_arr)
+
+        return res
+
+    def getSingleSignal_z(self, nu_arr : Sequence[float],
+                                z_arr  : Optional[Sequence[float]] = None,
+                                signal : Optional[str] = "tkSZ",
+                                frame  : Optional[str] = "rest",
+                                unit   : Optional[str] = "SI",
+                                **kwargs) -> Sequence[float]:
+        """!
+        Generate single pointing signals for many cluster redshifts at once.
+
+        Since the signal is a universal function of x = h nu / (k T_CMB(z)), the signal in the cluster rest frame at redshift z follows from the signal at z = 0:
+        I_z(nu) = (1 + z)**3 * I_0(nu / (1 + z)).
+        The signal at z = 0 is calculated with a single call of getSingleSignal_tkSZ or getSingleSignal_ntkSZ, 
+        on all distinct frequencies nu / (1 + z), so that the scattering kernel is computed only once for all redshifts.
+        In the observer frame, the signal does not depend on redshift and is calculated once and repeated for all redshifts.
+
+        @param nu_arr Array of frequencies, in Hz. In the frame given by frame.
+        @param z_arr Array of cluster redshifts. Defaults to None, which uses the redshift of this object.
+        @param signal Signal to generate: "tkSZ" (default) or "ntkSZ".
+        @param frame Frame of frequencies and intensities: "rest" (default, cluster rest frame) or "observer".
+        @param unit Unit of output: "SI" (default), "JySr", "RJ" (Rayleigh-Jeans temperature) or "dTCMB" (CMB temperature fluctuation).
+            In the rest frame, "dTCMB" is relative to the CMB blackbody at T_CMB(z).
+        @param kwargs Keyword arguments passed on to getSingleSignal_tkSZ or getSingleSignal_ntkSZ, for example acc, mode or adaptive.
+
+        @returns res 2D array of shape (z_arr.size, nu_arr.size).
+        """
+
+        if signal not in ["tkSZ", "ntkSZ"]:
+            raise ValueError(f"Unknown signal {signal}. Choose from ['tkSZ', 'ntkSZ'].")
+
+        if frame not in ["rest", "observer"]:
+            raise ValueError(f"Unknown frame {frame}. Choose from ['rest', 'observer'].")
+
+        nu_arr = np.asarray(nu_arr, dtype=np.float64).ravel()
+        z_arr = np.atleast_1d(np.asarray(self.z if z_arr is None else z_arr, dtype=np.float64)).ravel()
+        func = self.getSingleSignal_tkSZ if signal == "tkSZ" else self.getSingleSignal_ntkSZ
+
+        if frame == "observer":
+            res = func(nu_arr, **kwargs)
+            return np.repeat(MConv.SI_unit(res, nu_arr, unit)[None,:], z_arr.size, axis=0)
+
+        zp1 = 1 + z_arr[:,None]
+        nu_0, inverse = np.unique(nu_arr[None,:] / zp1, return_inverse=True)
+
+        res = zp1**3 * func(nu_0, **kwargs)[inverse].reshape(z_arr.size, nu_arr.size)
+        return MConv.SI_unit(res, nu_arr[None,:], unit, z_arr[:,None])
+
+    def getCMB(self, nu_arr : Sequence[float]) -> Sequence[float]:
+        return MDisp.getCMB(nu_arr)
+
+    def _getSignal_tkSZ(self, nu_arr     : Sequence[float],
+                              Te         : float,
+                              beta_pec   : float,
+                              cosu       : float,
+                              components : int,
+                              acc        : float,
+                              unit       : str,
+                              mode       : str,
+                              kernel     : Optional[tuple] = None,
+                              memoise    : Optional[bool] = True) -> Sequence[float]:
+        """!
+        Calculate the components of the tkSZ signal selected by the flags in components, without adaptive sampling.
+        The memo is only used if both memoise and self.memoise are True.
+        Adaptive sampling passes memoise=False, so that the frequency subsets of its refinement rounds do not evict memo entries.
+        """
+
+        if self.memoise and memoise:
+            return self._getMemoSignal_tkSZ(nu_arr, Te, beta_pec, cosu, components, acc, unit, mode)
+
+        if mode == "direct":
+            return MBind.getSignal_tkSZ(nu_arr, Te, self.tau_e, beta_pec, cosu, components, unit, acc, kernel=kernel)
+
+        nu_arr = np.asarray(nu_arr, dtype=np.float64)
+        res = MBind.getSignal_tkSZ(nu_arr, Te, self.tau_e, beta_pec, cosu, components & ~MBind.SIG_TSZ, "SI", acc)
+
+        if components & MBind.SIG_TSZ:
+            res += MConvol.getSignal_FFT(nu_arr, Te, self.tau_e, "MJ", acc=acc)
+
+        return MConv.SI_unit(res, nu_arr, unit)
+
+    def _getSignal_ntkSZ(self, nu_arr : Sequence[float],
+                               acc    : float,
+                               mode   : str) -> Sequence[float]:
+        """!
+        Calculate the ntSZ and kSZ terms of the ntkSZ signal, without CMB and adaptive sampling.
+        """
+
+        res = np.zeros(nu_arr.size)
         
-        if self.param is not None:
+        if self.param is not None and mode == "fft":
+            res += MConvol.getSignal_FFT(nu_arr, self.param, self.tau_e, "PL", acc=acc)
+
+        elif self.param is not None:
             res += MBind.getDistributionTwoParam(nu_arr, self.param, self.tau_e, acc, 
                                     func=self.clib.MockSZ_getSignal_ntSZ)
 
         if self.v_pec is not None:
-            res += MBind.getDistributionTwoParam(nu_arr, self.beta_cl_z, self.tau_e, acc, 
+            res += MBind.getDistributionTwoParam(nu_arr, self.beta_cl * self.beta_cl_z, self.tau_e, acc, 
                                         func=self.clib.MockSZ_getSignal_kSZ)
 
         return res
 
-    def getCMB(self, nu_arr : Sequence[float]) -> Sequence[float]:
-        return MBind.getCMB(nu_arr)
+    def _getMemoSignal_tkSZ(self, nu_arr     : Sequence[float],
+                                  Te         : float,
+                                  beta_pec   : float,
+                                  cosu       : float,
+                                  components : int,
+                                  acc        : float,
+                                  unit       : str,
+                                  mode       : str) -> Sequence[float]:
+        """!
+        Assemble the tkSZ signal from memoised components.
+        Components other than the CMB are stored per unit optical depth and keyed only by the parameters they depend on.
+        """
+
+        if unit not in MBind.UNITS:
+            raise ValueError(f"Unknown unit {unit}. Choose from {list(MBind.UNITS.keys())}.")
+
+        nu_arr = np.asarray(nu_arr, dtype=np.float64)
+        nu_key = hashInputs(nu_arr)
+
+        def _component(flag, key):
+            key = (nu_key,) + key
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+            if flag == MBind.SIG_TSZ and mode == "fft":
+                res = MConvol.getSignal_FFT(nu_arr, Te, 1., "MJ", acc=acc)
+            else:
+                res = MBind.getSignal_tkSZ(nu_arr, Te, 1., beta_pec, cosu, flag, "SI", acc)
+
+            self._memo[key] = res
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+            return res
+
+        res = np.zeros(nu_arr.shape)
+
+        if components & MBind.SIG_TSZ:
+            res += _component(MBind.SIG_TSZ, ("tSZ", Te, acc, mode))
+
+        if components & MBind.SIG_KSZ:
+            res += _component(MBind.SIG_KSZ, ("kSZ", beta_pec * cosu))
+
+        if components & MBind.SIG_CORR:
+            res += _component(MBind.SIG_CORR, ("corr", Te, beta_pec, cosu))
+
+        res *= self.tau_e
+
+        if components & MBind.SIG_CMB:
+            res += _component(MBind.SIG_CMB, ("CMB",))
+
+        return MConv.SI_unit(res, nu_arr, unit)
 
 class IsoBetaModel(SinglePointing):
     """!
@@ -164,7 +477,8 @@ class IsoBetaModel(SinglePointing):
     def __init__(self, param    : float, 
                        v_pec    : Optional[float] = None, 
                        phi_cl   : Optional[float] = 0, 
-                       no_CMB   : Optional[bool]  = False) -> None:
+                       no_CMB   : Optional[bool]  = False,
+                       cache    : Optional[ResultCache] = None) -> None:
         """!
         Initialise a single-pointing model of a galaxy cluster.
         Under the hood, calls the constructor of a single-pointing class.
@@ -177,11 +491,14 @@ class IsoBetaModel(SinglePointing):
             Defaults to 0 degrees, i.e., the cluster is receding from us.
         @param no_CMB Whether or not to add the CMB signal to the distortions.
             Defaults to False (CMB added on top).
+        @param cache ResultCache for storing results on disk.
+            Defaults to None, which disables caching.
         """
         
-        super().__init__(param, v_pec, phi_cl, 1, True)
+        super().__init__(param, v_pec, phi_cl, 1, True, cache)
         self.no_CMB_cl = no_CMB
     
+    @cached
     def getIsoBeta(self, Az     : Sequence[float], 
                          El     : Sequence[float], 
                          ibeta  : float, 
@@ -205,40 +522,136 @@ class IsoBetaModel(SinglePointing):
         @returns res The optical depth screen.
         """
 
-        res = MBind.getIsoBeta(Az, El, ibeta, ne0, thetac, Da, grid)
+        res = MDisp.getIsoBeta(Az, El, ibeta, ne0, thetac, Da, grid)
         return res
     
+    @cached(state=SIGNAL_STATE + ("no_CMB_cl",))
     def getIsoBetaCube(self, isobeta : Sequence[float], 
                              nu_arr  : Sequence[float], 
-                             acc     : Optional[float] = 1e-6) -> Sequence[float]:
+                             acc     : Optional[float] = 1e-6,
+                             lazy    : Optional[bool]  = False) -> Sequence[float]:
         """!
         Get an isothermal-beta model from an optical depth screen.
 
         @param isobeta An optical depth screen generated by self.getIsoBeta.
         @param nu_arr Array of frequencies for SZ effect, in Hz.
         @param acc Required relative accuracy of integration.
+        @param lazy Whether or not to return a Cube.SeparableCube, which only stores the screen, spectrum and CMB.
+            Useful for cubes that do not fit in memory. Lazy cubes are not stored in the result cache.
+            Defaults to False, which returns the full cube as a numpy array.
         
         @returns res 2D or 3D grid (depending on dimensions of isobeta) containing SZ signal attenuated by optical depth in isobeta.
         """
 
         res_SZ = self.getSingleSignal_tkSZ(nu_arr, acc=acc)
+        offset = None if self.no_CMB_cl else MDisp.getCMB(nu_arr)
 
-        if len(isobeta.shape) == 1:
-            shape = (isobeta.size, nu_arr.size)
-            res = np.ones(shape)
-            for i in range(nu_arr.size):
-                res[:,i] = isobeta
-        else:
-            shape = (isobeta.shape[0], isobeta.shape[1], nu_arr.size)
-            res = np.ones(shape)
-            for i in range(nu_arr.size):
-                res[:,:,i] = isobeta
+        if lazy:
+            return MCube.SeparableCube(isobeta, res_SZ, offset)
 
-        res *= res_SZ
+        isobeta = np.asarray(isobeta)
+        res = isobeta[..., None] * res_SZ
+        
+        if offset is not None:
+            res += offset
         
-        if not self.no_CMB_cl:
-            res += MBind.getCMB(nu_arr)
+        return res
+
+    @cached(state=SIGNAL_STATE + ("no_CMB_cl",))
+    def getIsoBetaCubeDirect(self, Az       : Sequence[float], 
+                                   El       : Sequence[float], 
+                                   ibeta    : float, 
+                                   ne0      : float, 
+                                   thetac   : float, 
+                                   Da       : float, 
+                                   nu_arr   : Sequence[float], 
+                                   grid     : Optional[bool]  = False,
+                                   acc      : Optional[float] = 1e-6,
+                                   nThreads : Optional[int]   = None) -> Sequence[float]:
+        """!
+        Get an isothermal-beta cube directly from the model parameters.
+        Equivalent to getIsoBetaCube(getIsoBeta(...), ...), but the screen, spectrum and CMB are combined in a single multi-threaded backend pass.
+        No intermediate screen or cube is allocated, so for large cubes the cost is about one write of the output.
+
+        @param Az Array containing the range of Azimuth co-ordinates, in arcseconds.
+        @param El Array containing the range of Elevation co-ordinates, in arcseconds.
+        @param ibeta Beta parameter for isothermal model.
+        @param ne0 Central electron number density, in number / cm**3.
+        @param thetac Angular cluster core radius, in arcseconds.
+        @param Da Angular diameter distance to cluster, in Megaparsec.
+        @param nu_arr Array of frequencies for SZ effect, in Hz.
+        @param grid Whether or not to evaluate the model on a 2D grid spanned by Az and El, or on a 1D trace.
+        @param acc Required relative accuracy of integration.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+        
+        @returns res 2D (trace) or 3D (grid) array containing SZ signal attenuated by the isothermal-beta optical depth.
+        """
+
+        nu_arr = np.asarray(nu_arr, dtype=np.float64)
+        res_SZ = self.getSingleSignal_tkSZ(nu_arr, acc=acc)
+        offset = None if self.no_CMB_cl else MDisp.getCMB(nu_arr, nThreads)
+
+        res = MBind.getIsoBetaCube(Az, El, ibeta, ne0, thetac, Da, res_SZ, offset, grid, nThreads)
+        return res
+
+class KinematicBatch(object):
+    """!
+    Class for generating kSZ signals for large batches of clusters at once, for example from a light-cone catalogue.
+    Each cluster has its own peculiar velocity and optical depth, but all share the same frequency grid.
+
+    Attributes:
+        beta_cl_z Dimensionless peculiar velocities along sightline, one per cluster.
+        tau_e Optical depths, one per cluster.
+
+    @ingroup singlepointing
+    """
+
+    def __init__(self, v_pec    : Sequence[float], 
+                       phi_cl   : Optional[Sequence[float]] = 0, 
+                       tau_e    : Optional[Sequence[float]] = 1, 
+                       no_CMB   : Optional[bool]  = False) -> None:
+        """!
+        Initialise a batch of kinematic cluster models.
+
+        @param v_pec Array of absolute peculiar velocities of clusters, in km / s.
+        @param phi_cl Angle(s) between line-of-sight (pointing away from observer) and cluster velocities, in degrees.
+            Either a scalar or an array of the same size as v_pec. Defaults to 0 degrees.
+        @param tau_e Electron optical depth(s) of clusters.
+            Either a scalar or an array of the same size as v_pec. Defaults to 1.
+        @param no_CMB Whether or not to add the CMB signal to the distortions.
+            Defaults to False (CMB added on top).
+        """
+
+        v_pec = np.asarray(v_pec, dtype=np.float64).ravel()
+
+        self.beta_cl_z = v_pec * 1e3 / const.c * np.cos(np.radians(np.broadcast_to(phi_cl, v_pec.shape)))
+        self.tau_e = np.broadcast_to(np.asarray(tau_e, dtype=np.float64), v_pec.shape).copy()
+        self.no_CMB = no_CMB
+
+    @timer_func
+    def getBatchSignal_kSZ(self, nu_arr   : Sequence[float], 
+                                 timer    : Optional[bool] = False, 
+                                 n_mu     : Optional[int]  = 8, 
+                                 nThreads : Optional[int]  = None) -> Sequence[float]:
+        """!
+        Generate kSZ signals for all clusters in the batch.
         
+        The integral over direction cosines is evaluated with a fixed-order Gauss-Legendre rule.
+        The integrand is smooth in mu, so the default of 8 nodes is accurate to well below 1e-10 relative to the distortion for cluster velocities.
+
+        @param nu_arr Array of frequencies for kSZ effect, in Hz.
+        @param timer Time function execution. Used in decorator.
+        @param n_mu Number of Gauss-Legendre nodes for integration over mu.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+
+        @returns res 2D array of shape (number of clusters, nu_arr.size) containing kSZ effect.
+        """
+
+        res = MBind.getSignal_kSZ_batch(nu_arr, self.beta_cl_z, self.tau_e, n_mu, nThreads)
+
+        if not self.no_CMB:
+            res += MDisp.getCMB(np.asarray(nu_arr, dtype=np.float64).ravel(), nThreads)
+
         return res
 
 class ScatteringKernels(object):
@@ -254,9 +667,18 @@ class ScatteringKernels(object):
     @ingroup scatteringkernels
     """
     
-    def __init__(self) -> None:
+    def __init__(self, cache : Optional[ResultCache] = None) -> None:
+        """!
+        Initialise an object for obtaining scattering kernels and distributions.
+
+        @param cache ResultCache for storing results on disk.
+            Defaults to None, which disables caching.
+        """
+
+        self.cache = cache
         self.clib = MBind.loadMockSZlib()
 
+    @cached
     def getSingleScattering(self, s_arr : Sequence[float], 
                                   beta  : float, 
                                   acc   : float = 1e-6) -> Sequence[float]:
@@ -275,6 +697,7 @@ class ScatteringKernels(object):
 
         return res
     
+    @cached
     def getMaxwellJuttner(self, beta_arr : Sequence[float], 
                                 Te       : float) -> Sequence[float]:
         """!
@@ -286,11 +709,11 @@ class ScatteringKernels(object):
         @returns res 1D array containing Maxwell-Juttner distribution.
         """
         
-        res = MBind.getDistributionSingleParam(beta_arr, Te, acc=1e-6, 
-                                               func=self.clib.MockSZ_getMaxwellJuttner)
+        res = MDisp.getMaxwellJuttner(beta_arr, Te)
 
         return res
     
+    @cached
     def getPowerlaw(self, beta_arr : Sequence[float], 
                           alpha    : float) -> Sequence[float]:
         """!
@@ -302,11 +725,11 @@ class ScatteringKernels(object):
         @returns res 1D array containing relativistic powerlaw distribution.
         """
         
-        res = MBind.getDistributionSingleParam(beta_arr, alpha, acc=1e-6, 
-                                               func=self.clib.MockSZ_getPowerlaw)
+        res = MDisp.getPowerlaw(beta_arr, alpha)
 
         return res
     
+    @cached
     def getMultiScatteringMJ(self, s_arr : Sequence[float], 
                                    Te    : float, 
                                    acc   : Optional[float] = 1e-6) -> Sequence[float]:
@@ -326,6 +749,7 @@ class ScatteringKernels(object):
 
         return res
     
+    @cached
     def getMultiScatteringPL(self, s_arr : Sequence[float], 
                                    alpha : float, 
                                    acc   : Optional[float] = 1e-6) -> Sequence[float]:
@@ -344,3 +768,65 @@ class ScatteringKernels(object):
                                                func=self.clib.MockSZ_getMultiScatteringPL)
 
         return res
+    
+    @cached
+    def getSingleScatteringGrid(self, s_arr    : Sequence[float], 
+                                      beta_arr : Sequence[float], 
+                                      acc      : Optional[float] = 1e-6,
+                                      nThreads : Optional[int]   = None) -> Sequence[float]:
+        """!
+        Obtain single-electron scattering kernels, for a range of s and a range of beta, in a single multi-threaded backend call.
+
+        @param s_arr Numpy array of logarithmic frequency shifts s.
+        @param beta_arr Numpy array of dimensionless electron velocities.
+        @param acc Required relative accuracy of integration.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+
+        @returns res 2D array of shape (beta_arr.size, s_arr.size) containing single-electron scattering probabilities.
+        """
+        
+        res = MBind.getDistributionGrid(s_arr, beta_arr, acc, self.clib.MockSZ_getThomsonScatterGrid, nThreads)
+
+        return res
+    
+    @cached
+    def getMultiScatteringMJGrid(self, s_arr    : Sequence[float], 
+                                       Te_arr   : Sequence[float], 
+                                       acc      : Optional[float] = 1e-6,
+                                       nThreads : Optional[int]   = None) -> Sequence[float]:
+        """!
+        Obtain multi-electron scattering kernels for a range of s and a range of electron temperatures, in a single multi-threaded backend call.
+        These kernels are calculated using Maxwell-Juttner distributions.
+
+        @param s_arr Numpy array of logarithmic frequency shifts s.
+        @param Te_arr Numpy array of electron temperatures in keV.
+        @param acc Required relative accuracy of integration.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+
+        @returns res 2D array of shape (Te_arr.size, s_arr.size) containing multi-electron scattering probabilities.
+        """
+        
+        res = MBind.getDistributionGrid(s_arr, Te_arr, acc, self.clib.MockSZ_getMultiScatteringMJGrid, nThreads)
+
+        return res
+    
+    @cached
+    def getMultiScatteringPLGrid(self, s_arr     : Sequence[float], 
+                                       alpha_arr : Sequence[float], 
+                                       acc       : Optional[float] = 1e-6,
+                                       nThreads  : Optional[int]   = None) -> Sequence[float]:
+        """!
+        Obtain multi-electron scattering kernels for a range of s and a range of powerlaw slopes, in a single multi-threaded backend call.
+        These kernels are calculated using relativistic powerlaw distributions.
+
+        @param s_arr Numpy array of logarithmic frequency shifts s.
+        @param alpha_arr Numpy array of powerlaw slopes.
+        @param acc Required relative accuracy of integration.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+
+        @returns res 2D array of shape (alpha_arr.size, s_arr.size) containing multi-electron scattering probabilities.
+        """
+        
+        res = MBind.getDistributionGrid(s_arr, alpha_arr, acc, self.clib.MockSZ_getMultiScatteringPLGrid, nThreads)
+
+        return res
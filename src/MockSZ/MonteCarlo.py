@@ -0,0 +1,346 @@
+"""!
+@file
+Monte Carlo simulation of photon scattering off hot electrons.
+
+Photons from an isotropic radiation field are scattered by electrons drawn from a Maxwell-Juttner or powerlaw distribution.
+Every scattering is Thomson scattering in the electron rest frame, so the results can be compared directly to the analytic kernels in ScatteringKernels.
+The number of scatterings per photon is Poisson distributed with mean tau_e, so that optical depths beyond the single-scattering regime can be modelled.
+
+All photons of a batch are processed in vectorised NumPy operations.
+Batches are spread over several threads, each with its own random generator spawned from a single seed,
+so that results only depend on the seed and the number of batches, not on the number of threads.
+The spread between batches provides the statistical error and convergence diagnostics.
+"""
+
+# STL
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence, Tuple, Union
+
+# External packages
+import numpy as np
+from scipy.stats import poisson
+
+# MockSZ-specifics
+import MockSZ.Bindings as MBind
+import MockSZ.Conversions as MConv
+import MockSZ.Dispatch as MDisp
+
+# Largest electron velocity tabulated for the powerlaw distribution
+BETA_MAX_PL = 1 - 1e-12
+
+class MonteCarlo(object):
+    """!
+    Class for Monte Carlo simulation of scattering kernels and SZ signals.
+
+    Electron velocities are drawn from a tabulated inverse cumulative distribution,
+    built on a grid in rapidity y = atanh(beta) from Dispatch.getMaxwellJuttner or Dispatch.getPowerlaw.
+    Incoming photon directions are weighted by the relative flux (1 - beta * mu),
+    and rest-frame scattering angles follow the Thomson phase function (1 + cos^2).
+
+    Multiple scatterings are treated as independent scatterings of an isotropic radiation field,
+    i.e. the kernel for k scatterings is the k-fold convolution of the single-scattering kernel.
+
+    Attributes:
+        dist Electron distribution: "MJ" (Maxwell-Juttner) or "PL" (powerlaw).
+        param Electron temperature in keV for "MJ", or powerlaw slope for "PL".
+        seed Seed of the random generators.
+        diagnostics Dictionary with convergence diagnostics of the last simulation.
+
+    @ingroup scatteringkernels
+    """
+
+    def __init__(self, param   : float,
+                       dist    : Optional[str] = "MJ",
+                       seed    : Optional[Union[int, np.random.SeedSequence]] = None,
+                       n_table : Optional[int] = 16384) -> None:
+        """!
+        Initialise a Monte Carlo simulation for an electron distribution.
+
+        @param param Electron temperature in keV for "MJ", or powerlaw slope for "PL".
+        @param dist Electron distribution: "MJ" (Maxwell-Juttner, default) or "PL" (powerlaw).
+        @param seed Seed for the random generators.
+            Defaults to None, which draws a fresh seed. The drawn seed is stored in self.seed, so that runs can be reproduced.
+            Every simulation spawns new child seeds, so successive simulations are independent,
+            while a new object with the same seed reproduces the same sequence of simulations.
+        @param n_table Number of grid points in the tabulated inverse cumulative distribution of electron velocities.
+        """
+
+        if dist not in ["MJ", "PL"]:
+            raise ValueError(f"Unknown distribution {dist}. Choose from ['MJ', 'PL'].")
+
+        self.dist = dist
+        self.param = param
+        self.seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.diagnostics = None
+
+        self._y_table, self._cdf_table = self._getTable(n_table)
+
+    def sampleBeta(self, n   : int,
+                         rng : np.random.Generator) -> Sequence[float]:
+        """!
+        Draw electron velocities from the electron distribution.
+
+        @param n Number of velocities.
+        @param rng Random generator.
+
+        @returns beta Array of dimensionless electron velocities.
+        """
+
+        return np.tanh(np.interp(rng.random(n), self._cdf_table, self._y_table))
+
+    @staticmethod
+    def sampleShift(beta : Sequence[float],
+                    rng  : np.random.Generator) -> Sequence[float]:
+        """!
+        Scatter one photon off every electron and return the logarithmic frequency shifts s = ln(nu_out / nu_in).
+
+        The incoming direction cosine mu (w.r.t. the electron velocity) is drawn with probability proportional to (1 - beta * mu).
+        In the electron rest frame, the photon is scattered over an angle drawn from the Thomson phase function and a uniform azimuth.
+        The frequency ratio then follows from the Doppler shifts: nu_out / nu_in = (1 - beta * mu) / (1 - beta * mu_out).
+
+        @param beta Array of dimensionless electron velocities.
+        @param rng Random generator.
+
+        @returns s Array of logarithmic frequency shifts.
+        """
+
+        n = beta.size
+
+        # Inverse CDF of (1 - beta * mu) / 2, written to be stable for small beta
+        u = 2 * rng.random(n) - 1
+        mu = (2 * u - beta) / (1 + np.sqrt(1 + beta * (beta - 2 * u)))
+
+        # Inverse CDF of 3 / 8 * (1 + c^2), solved with Cardano's formula
+        w = 4 * rng.random(n) - 2
+        A = np.cbrt(w + np.sqrt(w * w + 1))
+        cos_th = A - 1 / A
+
+        cos_phi = np.cos(2 * np.pi * rng.random(n))
+
+        mu_rest = (mu - beta) / (1 - beta * mu)
+        mu_rest_out = mu_rest * cos_th + np.sqrt((1 - mu_rest**2) * (1 - cos_th**2)) * cos_phi
+        mu_out = (mu_rest_out + beta) / (1 + beta * mu_rest_out)
+
+        return np.log1p(-beta * mu) - np.log1p(-beta * mu_out)
+
+    def getSingleScattering(self, s_bins     : Sequence[float],
+                                  beta       : float,
+                                  n_photons  : Optional[int] = 1000000,
+                                  n_batch    : Optional[int] = 16,
+                                  nThreads   : Optional[int] = None) -> Tuple[Sequence[float], Sequence[float]]:
+        """!
+        Simulate the single-electron scattering kernel, for comparison with ScatteringKernels.getSingleScattering.
+
+        @param s_bins Array with edges of bins in s, as in numpy.histogram.
+        @param beta Dimensionless electron velocity.
+        @param n_photons Number of simulated photons.
+        @param n_batch Number of batches, used for the statistical error.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+
+        @returns res Array of size s_bins.size - 1, containing the kernel averaged over the bins.
+        @returns err Array of the same size, containing the standard error of res.
+        """
+
+        s_bins = np.asarray(s_bins, dtype=np.float64)
+
+        def _sample(n, rng):
+            return self.sampleShift(np.full(n, float(beta)), rng)
+
+        return self._histogram(_sample, s_bins, n_photons, n_batch, nThreads)
+
+    def getMultiScattering(self, s_bins    : Sequence[float],
+                                 tau_e     : Optional[float] = None,
+                                 n_photons : Optional[int] = 1000000,
+                                 n_batch   : Optional[int] = 16,
+                                 nThreads  : Optional[int] = None) -> Tuple[Sequence[float], Sequence[float]]:
+        """!
+        Simulate the scattering kernel of the electron distribution.
+
+        With tau_e None, every photon is scattered exactly once, for comparison with ScatteringKernels.getMultiScatteringMJ and getMultiScatteringPL.
+        Otherwise, the kernel is that of the photons scattered at least once, for a Poisson distributed number of scatterings with mean tau_e.
+
+        @param s_bins Array with edges of bins in s, as in numpy.histogram.
+        @param tau_e Optical depth. Defaults to None, which simulates single scatterings.
+        @param n_photons Number of simulated photons.
+        @param n_batch Number of batches, used for the statistical error.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+
+        @returns res Array of size s_bins.size - 1, containing the kernel averaged over the bins.
+        @returns err Array of the same size, containing the standard error of res.
+        """
+
+        s_bins = np.asarray(s_bins, dtype=np.float64)
+
+        return self._histogram(self._getSampler(tau_e), s_bins, n_photons, n_batch, nThreads)
+
+    def getSignal(self, nu_arr    : Sequence[float],
+                        tau_e     : float,
+                        n_photons : Optional[int]   = 1000000,
+                        n_batch   : Optional[int]   = 16,
+                        ds        : Optional[float] = 5e-3,
+                        nThreads  : Optional[int]   = None) -> Tuple[Sequence[float], Sequence[float]]:
+        """!
+        Simulate the (n)tSZ signal for an optical depth, including multiple scatterings.
+
+        A fraction 1 - exp(-tau_e) of the CMB photons is scattered at least once.
+        The signal is this fraction times the scattered CMB minus the CMB,
+        where the scattered CMB is the CMB convolved with the simulated kernel of photons scattered at least once.
+        The simulated shifts are binned with spacing ds before the convolution.
+        For small tau_e, the result approaches the single-scattering signal of MockSZ_getSignal_tSZ and MockSZ_getSignal_ntSZ.
+
+        @param nu_arr Array of frequencies, in Hz.
+        @param tau_e Optical depth along sightline.
+        @param n_photons Number of simulated photons.
+        @param n_batch Number of batches, used for the statistical error.
+        @param ds Width of bins in s.
+        @param nThreads Number of threads to use. Defaults to all available CPUs.
+
+        @returns res Array of the same shape as nu_arr, containing the signal in SI units.
+        @returns err Array of the same shape, containing the standard error of res.
+        """
+
+        nu_arr = np.asarray(nu_arr, dtype=np.float64)
+        sample = self._getSampler(tau_e)
+
+        def _count(n, rng):
+            idx = np.rint(sample(n, rng) / ds).astype(np.int64)
+            return np.unique(idx, return_counts=True)
+
+        counts_batch = self._runBatches(_count, n_photons, n_batch, nThreads)
+
+        idx_all = np.unique(np.concatenate([idx for idx, _ in counts_batch]))
+        hist = np.zeros((len(counts_batch), idx_all.size))
+        for i, (idx, counts) in enumerate(counts_batch):
+            hist[i, np.searchsorted(idx_all, idx)] = counts
+
+        # Scattered CMB per unit kernel weight, on all occupied bins
+        with np.errstate(over="ignore"):
+            I_CMB = MDisp.getCMB(np.multiply.outer(nu_arr.ravel(), np.exp(-ds * idx_all)))
+            I_0 = MDisp.getCMB(nu_arr.ravel())
+
+        sizes = hist.sum(axis=1, keepdims=True)
+        signal_batch = -np.expm1(-tau_e) * ((hist / sizes) @ I_CMB.T - I_0)
+
+        res, err = self._getStatistics(signal_batch, sizes.ravel())
+
+        return res.reshape(nu_arr.shape), err.reshape(nu_arr.shape)
+
+    def _getTable(self, n_table : int) -> Tuple[Sequence[float], Sequence[float]]:
+        if self.dist == "MJ":
+            theta = MConv.keV_theta(self.param)
+            # Beyond gamma = 1 + 60 theta, the distribution is smaller than exp(-60)
+            y_max = np.arccosh(1 + 60 * theta)
+            func = MDisp.getMaxwellJuttner
+        else:
+            y_max = np.arctanh(BETA_MAX_PL)
+            func = MDisp.getPowerlaw
+
+        y_table = np.linspace(0, y_max, n_table)
+        beta = np.tanh(y_table)
+
+        # Distribution per unit rapidity: dbeta / dy = 1 - beta^2
+        pdf = func(beta, self.param) / np.cosh(y_table)**2
+
+        cdf = np.concatenate(([0.], np.cumsum(0.5 * (pdf[1:] + pdf[:-1]) * np.diff(y_table))))
+        return y_table, cdf / cdf[-1]
+
+    def _getSampler(self, tau_e : Optional[float]) -> Callable:
+        if tau_e is not None:
+            # CDF of number of scatterings, conditioned on at least one scattering
+            k_arr = np.arange(1, int(tau_e + 20 * np.sqrt(tau_e) + 20))
+            cdf = poisson.cdf(k_arr, tau_e) - poisson.pmf(0, tau_e)
+            cdf /= -np.expm1(-tau_e)
+
+        def _sample(n, rng):
+            if tau_e is None:
+                return self.sampleShift(self.sampleBeta(n, rng), rng)
+
+            n_scatter = k_arr[np.minimum(np.searchsorted(cdf, rng.random(n), side="right"), k_arr.size - 1)]
+
+            s = self.sampleShift(self.sampleBeta(np.sum(n_scatter), rng), rng)
+            return np.bincount(np.repeat(np.arange(n), n_scatter), weights=s, minlength=n)
+
+        return _sample
+
+    def _histogram(self, sample    : Callable,
+                         s_bins    : Sequence[float],
+                         n_photons : int,
+                         n_batch   : int,
+                         nThreads  : Optional[int]) -> Tuple[Sequence[float], Sequence[float]]:
+        def _count(n, rng):
+            return np.histogram(sample(n, rng), s_bins)[0]
+
+        counts_batch = self._runBatches(_count, n_photons, n_batch, nThreads)
+
+        hist = np.array(counts_batch, dtype=np.float64)
+        sizes = self._batchSizes(n_photons, n_batch).astype(np.float64)
+
+        res, err = self._getStatistics(hist / sizes[:,None] / np.diff(s_bins), sizes)
+        self.diagnostics["outside"] = 1 - np.sum(hist) / n_photons
+
+        return res, err
+
+    def _runBatches(self, func      : Callable,
+                          n_photons : int,
+                          n_batch   : int,
+                          nThreads  : Optional[int]) -> list:
+        n_batch = max(int(n_batch), 1)
+        sizes = self._batchSizes(n_photons, n_batch)
+        seeds = self.seed.spawn(n_batch)
+
+        def _run(i):
+            rng = np.random.default_rng(seeds[i])
+            chunks = [func(n, rng) for n in self._chunkSizes(sizes[i])]
+
+            if isinstance(chunks[0], tuple):
+                idx = np.concatenate([c[0] for c in chunks])
+                counts = np.concatenate([c[1] for c in chunks])
+                idx, inverse = np.unique(idx, return_inverse=True)
+                return idx, np.bincount(inverse.ravel(), weights=counts)
+            return np.sum(chunks, axis=0)
+
+        with ThreadPoolExecutor(max_workers=MBind.getNumThreads(nThreads)) as executor:
+            return list(executor.map(_run, range(n_batch)))
+
+    def _getStatistics(self, batch : Sequence[float],
+                             sizes : Sequence[float]) -> Tuple[Sequence[float], Sequence[float]]:
+        """!
+        Combine results per batch into a weighted mean and standard error, and store convergence diagnostics.
+        The history contains the maximum relative standard error after including 2, 3, ..., n_batch batches.
+        """
+
+        n_batch = batch.shape[0]
+        weights = sizes / np.sum(sizes)
+        res = np.tensordot(weights, batch, axes=1)
+
+        if n_batch < 2:
+            err = np.full(res.shape, np.nan)
+            history = np.array([])
+        else:
+            err = np.sqrt(np.tensordot(weights, (batch - res)**2, axes=1) / (n_batch - 1))
+
+            history = np.zeros(n_batch - 1)
+            for k in range(2, n_batch + 1):
+                w_k = weights[:k] / np.sum(weights[:k])
+                mean_k = np.tensordot(w_k, batch[:k], axes=1)
+                err_k = np.sqrt(np.tensordot(w_k, (batch[:k] - mean_k)**2, axes=1) / (k - 1))
+                history[k-2] = np.max(err_k) / np.max(np.absolute(mean_k))
+
+        self.diagnostics = {
+                "n_photons" : int(np.sum(sizes)),
+                "n_batch"   : n_batch,
+                "rel_err"   : history[-1] if history.size else np.nan,
+                "history"   : history,
+                }
+
+        return res, err
+
+    @staticmethod
+    def _batchSizes(n_photons : int,
+                    n_batch   : int) -> Sequence[int]:
+        return np.diff(np.linspace(0, int(n_photons), max(int(n_batch), 1) + 1).astype(np.int64))
+
+    @staticmethod
+    def _chunkSizes(n         : int,
+                    chunksize : Optional[int] = 1048576) -> Sequence[int]:
+        return [min(chunksize, n - i0) for i0 in range(0, n, chunksize)] or [0]
@@ -0,0 +1,512 @@
+"""!
+@file
+Batch runner for production runs with many MockSZ models.
+
+A job file (JSON, YAML or TOML) lists jobs of four types: single-pointing signals, optical depth screens, isothermal-beta cubes and kernel scans.
+Identical work is done only once, jobs are spread over a local process pool, outputs are written to .npy files and a manifest records per-job timings.
+The runner is available as the `mocksz` console command, or as `python -m MockSZ.Runner`.
+
+A minimal job file in JSON looks like:
+@code
+{
+    "grids"     : {"nu" : {"linspace" : [100e9, 500e9, 1000]}},
+    "defaults"  : {"signal" : {"tau_e" : 0.01, "no_CMB" : true}},
+    "jobs"      : [
+        {"name" : "hot", "type" : "signal", "param" : 15.33, "v_pec" : 300, "nu" : "nu"},
+        {"name" : "kernels", "type" : "kernel", "kernel" : "MultiScatteringMJ",
+         "x" : {"linspace" : [-1, 2, 500]}, "param" : [5, 10, 15]}
+    ]
+}
+@endcode
+Grids can be given as lists, as {"linspace", "logspace", "geomspace" or "arange" : [arguments]}, or as the name of an entry in "grids".
+"""
+
+# STL
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Optional, Sequence
+
+# External packages
+import numpy as np
+
+# MockSZ-specifics
+import MockSZ.Bindings as MBind
+import MockSZ.Conversions as MConv
+import MockSZ.Dispatch as MDisp
+import MockSZ.Models as MModels
+from MockSZ import __version__
+from MockSZ.Cache import ResultCache, hashInputs
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+_REQUIRED = object()
+
+# Fields of every job type, with defaults. Fields without default must be given in the job file.
+JOB_FIELDS = {
+        "signal"    : {"method" : "tkSZ", "param" : None, "v_pec" : None, "phi_cl" : 0, "tau_e" : 1, "no_CMB" : False,
+                       "nu" : _REQUIRED, "acc" : 1e-6, "unit" : "SI", "mode" : "direct"},
+        "screen"    : {"Az" : _REQUIRED, "El" : _REQUIRED, "ibeta" : _REQUIRED, "ne0" : _REQUIRED,
+                       "thetac" : _REQUIRED, "Da" : _REQUIRED, "grid" : True},
+        "cube"      : {"param" : None, "v_pec" : None, "phi_cl" : 0, "no_CMB" : False,
+                       "Az" : _REQUIRED, "El" : _REQUIRED, "ibeta" : _REQUIRED, "ne0" : _REQUIRED,
+                       "thetac" : _REQUIRED, "Da" : _REQUIRED, "grid" : True, "nu" : _REQUIRED, "acc" : 1e-6},
+        "kernel"    : {"kernel" : _REQUIRED, "x" : _REQUIRED, "param" : _REQUIRED, "acc" : 1e-6},
+        }
+
+# Fields that are parsed as grids
+GRID_FIELDS = ["nu", "Az", "El", "x"]
+
+# Kernel names, mapped to ScatteringKernels method, whether that method takes an accuracy, and grid method for scans (if any)
+KERNELS = {
+        "SingleScattering"  : ("getSingleScattering", True, "getSingleScatteringGrid"),
+        "MaxwellJuttner"    : ("getMaxwellJuttner", False, None),
+        "Powerlaw"          : ("getPowerlaw", False, None),
+        "MultiScatteringMJ" : ("getMultiScatteringMJ", True, "getMultiScatteringMJGrid"),
+        "MultiScatteringPL" : ("getMultiScatteringPL", True, "getMultiScatteringPLGrid"),
+        }
+
+def loadJobFile(path : str) -> dict:
+    """!
+    Load a job file.
+    The format is chosen from the extension: .json, .yaml/.yml or .toml.
+
+    @param path Path to job file.
+
+    @returns Dictionary with contents of job file.
+    """
+
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".json":
+        with open(path, "r") as f:
+            return json.load(f)
+
+    elif ext in [".yaml", ".yml"]:
+        if yaml is None:
+            raise ImportError("Reading YAML job files requires PyYAML.")
+        with open(path, "r") as f:
+            return yaml.safe_load(f)
+
+    elif ext == ".toml":
+        if tomllib is None:
+            raise ImportError("Reading TOML job files requires Python >= 3.11 or tomli.")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+
+    raise ValueError(f"Unknown job file format {ext}. Choose from ['.json', '.yaml', '.yml', '.toml'].")
+
+def parseGrid(spec  : Any,
+              grids : Optional[dict] = None) -> np.ndarray:
+    """!
+    Parse a grid specification from a job file.
+
+    @param spec List of values, dictionary {"linspace", "logspace", "geomspace" or "arange" : [arguments]},
+        or name of a grid in grids.
+    @param grids Dictionary with named, parsed grids.
+
+    @returns Grid as numpy array.
+    """
+
+    if isinstance(spec, str):
+        if grids is None or spec not in grids:
+            raise ValueError(f"Unknown grid {spec}.")
+        return grids[spec]
+
+    if isinstance(spec, dict):
+        if len(spec) != 1:
+            raise ValueError(f"Grid specification {spec} should contain exactly one entry.")
+
+        kind, args = next(iter(spec.items()))
+        if kind not in ["linspace", "logspace", "geomspace", "arange"]:
+            raise ValueError(f"Unknown grid type {kind}. Choose from ['linspace', 'logspace', 'geomspace', 'arange'].")
+
+        args = list(args)
+        if kind != "arange" and len(args) > 2:
+            args[2] = int(args[2])
+        return getattr(np, kind)(*args).astype(np.float64)
+
+    return np.atleast_1d(np.asarray(spec, dtype=np.float64))
+
+def planJobs(config : dict) -> list:
+    """!
+    Turn the contents of a job file into a list of fully specified jobs.
+    Every job gets a name, defaults filled in, grids parsed and a key identifying its result.
+
+    @param config Dictionary with contents of job file.
+
+    @returns List of job dictionaries, with entries "name", "spec" and "key".
+    """
+
+    grids = {name : parseGrid(spec) for name, spec in config.get("grids", {}).items()}
+    defaults = config.get("defaults", {})
+
+    jobs = []
+    names = set()
+
+    for i, job in enumerate(config.get("jobs", [])):
+        job = dict(job)
+        kind = job.pop("type", None)
+
+        if kind not in JOB_FIELDS:
+            raise ValueError(f"Job {i} has unknown type {kind}. Choose from {list(JOB_FIELDS.keys())}.")
+
+        name = str(job.pop("name", f"{kind}_{i:04d}"))
+        if name in names:
+            raise ValueError(f"Job name {name} is used more than once.")
+        names.add(name)
+
+        fields = {**defaults.get(kind, {}), **job}
+        unknown = set(fields) - set(JOB_FIELDS[kind])
+        if unknown:
+            raise ValueError(f"Job {name} has unknown fields {sorted(unknown)}.")
+
+        spec = {"type" : kind}
+        for field, default in JOB_FIELDS[kind].items():
+            value = fields.get(field, default)
+            if value is _REQUIRED:
+                raise ValueError(f"Job {name} misses required field {field}.")
+
+            spec[field] = parseGrid(value, grids) if field in GRID_FIELDS else value
+
+        if kind == "kernel" and spec["kernel"] not in KERNELS:
+            raise ValueError(f"Job {name} has unknown kernel {spec['kernel']}. Choose from {list(KERNELS.keys())}.")
+
+        if kind == "signal" and spec["method"] not in ["tkSZ", "ntkSZ"]:
+            raise ValueError(f"Job {name} has unknown method {spec['method']}. Choose from ['tkSZ', 'ntkSZ'].")
+
+        jobs.append({"name" : name, "spec" : spec, "key" : hashInputs(spec)})
+
+    return jobs
+
+def getCubeSpectrumSpec(spec : dict) -> dict:
+    """!
+    Get the signal specification of the spectrum per unit optical depth used by a cube job.
+    Cubes with the same model and frequencies, and signal jobs with the same specification, share this spectrum.
+
+    @param spec Specification of cube job.
+
+    @returns Specification of signal job.
+    """
+
+    return {"type" : "signal", "method" : "tkSZ", "param" : spec["param"], "v_pec" : spec["v_pec"],
+            "phi_cl" : spec["phi_cl"], "tau_e" : 1, "no_CMB" : True, "nu" : spec["nu"],
+            "acc" : spec["acc"], "unit" : "SI", "mode" : "direct"}
+
+def runJobs(config   : dict,
+            outdir   : str,
+            nWorkers : Optional[int] = None,
+            nThreads : Optional[int] = None,
+            cache    : Optional[str] = None,
+            resume   : Optional[bool] = True) -> dict:
+    """!
+    Run all jobs in a job file and write outputs and manifest to a directory.
+
+    Jobs with identical specifications are run once, and cubes share their spectra with each other and with identical signal jobs.
+    Thermal scattering kernels are tabulated once per temperature and accuracy, and shared by all signals and cube spectra using them.
+    Signals, screens and kernel scans run first, after which cubes are written directly to memory-mapped .npy files.
+
+    @param config Dictionary with contents of job file.
+    @param outdir Directory for outputs and manifest. Is created if it does not exist.
+    @param nWorkers Number of worker processes. Defaults to the number of available CPUs.
+        If 1, all jobs are run in the calling process.
+    @param nThreads Number of threads per worker for threaded backend calls.
+        Defaults to the number of available CPUs divided by nWorkers.
+    @param cache Directory of a ResultCache shared by all workers, so that results are reused between runs.
+        Defaults to None, which disables caching.
+    @param resume Whether or not to skip jobs whose output is listed in an existing manifest in outdir with the same key.
+
+    @returns manifest Dictionary with run information, also written to outdir/manifest.json.
+    """
+
+    t_start = time.time()
+    os.makedirs(outdir, exist_ok=True)
+
+    nWorkers = MBind.getNumThreads(nWorkers)
+    if nThreads is None:
+        nThreads = max(1, MBind.getNumThreads(None) // nWorkers)
+
+    jobs = planJobs(config)
+    previous = _loadPrevious(outdir) if resume else {}
+
+    entries = {}
+    computed = {}
+    tasks_first = {}
+    tasks_cube = {}
+
+    for job in jobs:
+        name, spec, key = job["name"], job["spec"], job["key"]
+        entry = {"name" : name, "type" : spec["type"], "key" : key}
+        entries[name] = entry
+
+        if key in computed:
+            entry.update({"status" : "duplicate", "duplicate_of" : computed[key]})
+            continue
+
+        computed[key] = name
+        entry["output"] = os.path.join(outdir, f"{name}.npy")
+
+        if key in previous and os.path.exists(previous[key]["output"]):
+            entry.update({k : previous[key][k] for k in ["output", "shape", "dtype", "time"]})
+            entry["status"] = "reused"
+            continue
+
+        task = {"key" : key, "spec" : spec, "path" : entry["output"], "nThreads" : nThreads, "cache" : cache}
+        (tasks_cube if spec["type"] == "cube" else tasks_first)[key] = task
+
+    # Spectra of cubes, shared with signal jobs where possible
+    spectra = {}
+    for task in tasks_cube.values():
+        spec_signal = getCubeSpectrumSpec(task["spec"])
+        key_signal = hashInputs(spec_signal)
+        task["spectrum_key"] = key_signal
+
+        if key_signal in tasks_first or key_signal in spectra:
+            continue
+
+        if key_signal in computed and entries[computed[key_signal]].get("status") == "reused":
+            spectra[key_signal] = np.load(entries[computed[key_signal]]["output"])
+            continue
+
+        tasks_first[key_signal] = {"key" : key_signal, "spec" : spec_signal, "path" : None,
+                                   "nThreads" : nThreads, "cache" : cache}
+
+    _shareKernels(list(tasks_first.values()), nWorkers)
+    results = _execute(list(tasks_first.values()), nWorkers)
+
+    for key, res in results.items():
+        if "result" in res:
+            spectra[key] = res.pop("result")
+
+    for task in tasks_cube.values():
+        task["spectrum"] = spectra.get(task["spectrum_key"])
+
+    failed = [task for task in tasks_cube.values() if task["spectrum"] is None]
+    for task in failed:
+        results[task["key"]] = {"status" : "failed", "error" : "Calculation of spectrum failed."}
+        tasks_cube.pop(task["key"])
+
+    results.update(_execute(list(tasks_cube.values()), nWorkers))
+
+    for entry in entries.values():
+        if entry["key"] in results and entry.get("status") is None:
+            entry.update(results[entry["key"]])
+            if entry["status"] == "failed":
+                entry.pop("output")
+
+    for entry in entries.values():
+        if entry["status"] == "duplicate":
+            original = entries[entry["duplicate_of"]]
+            entry.update({k : original[k] for k in ["output", "shape", "dtype", "error"] if k in original})
+            if original["status"] == "failed":
+                entry["status"] = "failed"
+
+    manifest = {
+            "version"   : __version__,
+            "created"   : t_start,
+            "wall_time" : time.time() - t_start,
+            "n_workers" : nWorkers,
+            "n_threads" : nThreads,
+            "cache"     : cache,
+            "jobs"      : [entries[job["name"]] for job in jobs],
+            }
+
+    with open(os.path.join(outdir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    return manifest
+
+def _loadPrevious(outdir : str) -> dict:
+    try:
+        with open(os.path.join(outdir, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if manifest.get("version") != __version__:
+        return {}
+
+    return {entry["key"] : entry for entry in manifest.get("jobs", [])
+            if entry.get("status") in ["done", "reused"]}
+
+def _shareKernels(tasks    : Sequence[dict],
+                  nWorkers : int) -> None:
+    # Group fused tkSZ signals by the parameters that determine their thermal kernel, Te and acc
+    groups = {}
+    for task in tasks:
+        spec = task["spec"]
+        if spec["type"] == "signal" and spec["method"] == "tkSZ" and spec["param"] is not None and spec["mode"] == "direct":
+            groups.setdefault((float(spec["param"]), float(spec["acc"])), []).append(task)
+
+    # Kernels used by a single signal are cheaper to tabulate inside its worker
+    shared = [key for key, group in groups.items() if len(group) > 1]
+    if not shared:
+        return
+
+    if nWorkers == 1 or len(shared) == 1:
+        kernels = [_getKernel(key) for key in shared]
+    else:
+        with ProcessPoolExecutor(max_workers=min(nWorkers, len(shared))) as pool:
+            kernels = list(pool.map(_getKernel, shared))
+
+    for key, kernel in zip(shared, kernels):
+        for task in groups[key]:
+            task["kernel"] = kernel
+
+def _getKernel(key : tuple) -> tuple:
+    Te, acc = key
+    return MBind.getKernelWeights(Te, "MJ", acc)
+
+def _execute(tasks    : Sequence[dict],
+             nWorkers : int) -> dict:
+    results = {}
+
+    if not tasks:
+        return results
+
+    if nWorkers == 1:
+        for task in tasks:
+            results[task["key"]] = _runSafe(task)
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(nWorkers, len(tasks))) as pool:
+        futures = {pool.submit(_runSafe, task) : task["key"] for task in tasks}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    return results
+
+def _runSafe(task : dict) -> dict:
+    try:
+        return _runTask(task)
+    except Exception as err:
+        return {"status" : "failed", "error" : f"{type(err).__name__}: {err}"}
+
+def _runTask(task : dict) -> dict:
+    t_start = time.time()
+
+    spec = task["spec"]
+    kind = spec["type"]
+    cache = None if task["cache"] is None else ResultCache(task["cache"])
+
+    res = None
+    info = {}
+
+    if kind == "signal":
+        res = _getSignal(spec, cache, task.get("kernel"))
+        info["result"] = res
+
+    elif kind == "screen":
+        isobObj = MModels.IsoBetaModel(None, cache=cache)
+        res = isobObj.getIsoBeta(spec["Az"], spec["El"], spec["ibeta"], spec["ne0"],
+                                 spec["thetac"], spec["Da"], grid=spec["grid"])
+
+    elif kind == "kernel":
+        kernelObj = MModels.ScatteringKernels(cache=cache)
+        name, has_acc, name_grid = KERNELS[spec["kernel"]]
+        method = getattr(kernelObj, name)
+
+        params = np.atleast_1d(spec["param"])
+        if name_grid is not None:
+            res = getattr(kernelObj, name_grid)(spec["x"], params, spec["acc"], nThreads=task["nThreads"])
+        else:
+            res = np.stack([method(spec["x"], p, spec["acc"]) if has_acc else method(spec["x"], p) for p in params])
+        
+        if np.ndim(spec["param"]) == 0:
+            res = res[0]
+
+    elif kind == "cube":
+        shape = ((spec["Az"].size, spec["El"].size) if spec["grid"] else (spec["Az"].size,)) + (spec["nu"].size,)
+        offset = None if spec["no_CMB"] else MDisp.getCMB(spec["nu"])
+
+        path_tmp = task["path"] + ".tmp.npy"
+        out = np.lib.format.open_memmap(path_tmp, mode="w+", dtype=np.float64, shape=shape)
+        MBind.getIsoBetaCube(spec["Az"], spec["El"], spec["ibeta"], spec["ne0"], spec["thetac"], spec["Da"],
+                             task["spectrum"], offset, spec["grid"], task["nThreads"], output=out)
+        out.flush()
+        del out
+        os.replace(path_tmp, task["path"])
+
+        info.update({"shape" : list(shape), "dtype" : "float64"})
+
+    if res is not None:
+        res = np.asarray(res)
+        info.update({"shape" : list(res.shape), "dtype" : str(res.dtype)})
+
+        if task["path"] is not None:
+            path_tmp = task["path"] + ".tmp.npy"
+            np.save(path_tmp, res)
+            os.replace(path_tmp, task["path"])
+
+    info.update({"status" : "done", "time" : time.time() - t_start, "pid" : os.getpid()})
+    return info
+
+def _getSignal(spec   : dict,
+               cache  : Optional[ResultCache],
+               kernel : Optional[tuple] = None) -> np.ndarray:
+    spObj = MModels.SinglePointing(spec["param"], spec["v_pec"], spec["phi_cl"], spec["tau_e"], spec["no_CMB"], cache)
+
+    if spec["method"] == "tkSZ":
+        return spObj.getSingleSignal_tkSZ(spec["nu"], acc=spec["acc"], unit=spec["unit"], mode=spec["mode"], kernel=kernel)
+
+    res = spObj.getSingleSignal_ntkSZ(spec["nu"], acc=spec["acc"], mode=spec["mode"])
+    return MConv.SI_unit(res, spec["nu"], spec["unit"])
+
+def main(argv : Optional[Sequence[str]] = None) -> int:
+    """!
+    Entry point of the mocksz command.
+
+    @param argv Command-line arguments. Defaults to None, which reads sys.argv.
+
+    @returns Exit status: 0 if all jobs succeeded, 1 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(prog="mocksz", description="Run a batch of MockSZ jobs from a JSON, YAML or TOML job file.")
+    parser.add_argument("jobfile", help="path to job file")
+    parser.add_argument("-o", "--output", default=None, help="output directory, defaults to 'output' entry of job file or the job file name")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes, defaults to number of CPUs")
+    parser.add_argument("-t", "--threads", type=int, default=None, help="number of threads per worker")
+    parser.add_argument("--cache", default=None, help="directory of result cache shared between runs")
+    parser.add_argument("--no-resume", action="store_true", help="recompute jobs listed in an existing manifest")
+    parser.add_argument("--dry-run", action="store_true", help="only list the jobs that would run")
+    args = parser.parse_args(argv)
+
+    config = loadJobFile(args.jobfile)
+    outdir = args.output or config.get("output") or os.path.splitext(args.jobfile)[0]
+    cache = args.cache or config.get("cache")
+
+    if args.dry_run:
+        jobs = planJobs(config)
+        n_unique = len(set(job["key"] for job in jobs))
+        for job in jobs:
+            print(f"{job['name']:32s} {job['spec']['type']:8s} {job['key'][:12]}")
+        print(f"{len(jobs)} jobs, {n_unique} unique")
+        return 0
+
+    manifest = runJobs(config, outdir, args.workers, args.threads, cache, not args.no_resume)
+
+    n_failed = 0
+    for entry in manifest["jobs"]:
+        if entry["status"] == "failed":
+            n_failed += 1
+            print(f"{entry['name']:32s} failed: {entry['error']}")
+
+    print(f"{len(manifest['jobs'])} jobs finished in {manifest['wall_time']:.2f} s, {n_failed} failed. Outputs in {outdir}.")
+
+    return 1 if n_failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,6 +6,7 @@ preventing the program from becoming unresponsive.
 """
 
 import threading
+import time
 
 class Manager(object):
     """!
@@ -13,10 +14,25 @@ class Manager(object):
     This manager can start daemon threads and signal when the thread is finished.
     This class is only used to spawn calls to the C++ backend inside a daemon thread so that Python keeps control over the process.
     This allows users to Ctrl-c a running calculation in C++ from Python.
+
+    Calculations can also be split into chunks, which are run one after the other.
+    After every chunk, the callback is called with the partially filled output, and the wall-clock budget is checked.
     """
 
-    def __init__(self, callback=None):
+    def __init__(self, callback=None, budget=None):
+        """!
+        Initialise a threadmanager.
+
+        @param callback Function called after every chunk as callback(output, n_done, n_total),
+            with output the array being filled, n_done the number of finished items and n_total the total number of items.
+            Defaults to None, which does not report progress.
+        @param budget Wall-clock budget in seconds for chunked calculations.
+            The budget is checked between chunks, so a calculation can overrun it by at most one chunk.
+            Defaults to None, which runs all chunks.
+        """
+
         self.callback = callback
+        self.budget = budget
     
     def new_thread(self, target, args):
         """!
@@ -32,3 +48,31 @@ class Manager(object):
     
         while t.is_alive(): # wait for the thread to exit
             t.join(.1)
+
+    def new_thread_chunked(self, target, get_args, n_items, chunksize, output):
+        """!
+        Spawn daemon threads for consecutive chunks of a calculation, one at a time.
+
+        @param target Function to run in thread.
+        @param get_args Function taking the start and stop index of a chunk, and returning the arguments to be passed to target.
+        @param n_items Total number of items.
+        @param chunksize Number of items per chunk.
+        @param output Array that is filled by target, passed on to the callback.
+
+        @returns n_done Number of finished items. Smaller than n_items if the budget ran out.
+        """
+
+        t_start = time.perf_counter()
+        n_done = 0
+
+        for start in range(0, n_items, chunksize):
+            n_done = min(start + chunksize, n_items)
+            self.new_thread(target=target, args=get_args(start, n_done))
+
+            if self.callback is not None:
+                self.callback(output, n_done, n_items)
+
+            if self.budget is not None and time.perf_counter() - t_start > self.budget:
+                break
+
+        return n_done
@@ -4,6 +4,42 @@
 
 #include "InterfaceCPU.h"
 
+/**
+ * Tabulate a multi-electron scattering kernel with Romberg integration, and fold it into convolution weights.
+ *
+ * @param kernel Scattering kernel, either getMultiScatteringMJ or getMultiScatteringPL.
+ * @param s0 Lower limit on s.
+ * @param s1 Upper limit on s.
+ * @param param Te or alpha.
+ * @param acc Accuracy of romberg integrator.
+ * @param wk Pointer that is set to a new array with combined weights. Should be freed by the caller.
+ * @param es Pointer that is set to a new array with e^{-s}. Should be freed by the caller.
+ *
+ * @returns Number of nodes.
+ */
+static int getKernelWeights(double (*kernel)(double, void*), double s0, double s1, double param, double acc, double *&wk, double *&es) {
+    double *func_evals = new double[MEVALS * MEVALS];
+    int n_eval = romberg_write(&get_n_eval, kernel, s0, s1, param, func_evals, MROWS + 1, acc); 
+    
+    // If not converged, romberg_write returns max_steps, but only wrote rows up to max_steps - 1
+    if(n_eval > MROWS) {n_eval = MROWS;}
+
+    int n_nodes = (1 << n_eval) + 1;
+    double *nodes = new double[n_nodes];
+    double *weights = new double[n_nodes];
+    romberg_weights(s0, s1, n_eval, nodes, weights);
+
+    wk = new double[n_nodes];
+    es = new double[n_nodes];
+    get_conv_weights(func_evals, nodes, weights, n_nodes, wk, es);
+
+    delete[] func_evals;
+    delete[] nodes;
+    delete[] weights;
+
+    return n_nodes;
+}
+
 MOCKSZ_DLL void MockSZ_getThomsonScatter(double *s_arr, int n_s, double beta, double *output, double acc) {
     gsl_integration_workspace *w = gsl_integration_workspace_alloc (NW_INT);
     gsl_function F;
@@ -24,22 +60,26 @@ MOCKSZ_DLL void MockSZ_getThomsonScatter(double *s_arr, int n_s, double beta, do
     gsl_integration_workspace_free (w);
 }
 
-MOCKSZ_DLL void MockSZ_getMaxwellJuttner(double *beta_arr, int n_beta, double Te, double *output, double acc) {
-    for(int i=0; i<n_beta; i++) {
-        output[i] = getMaxwellJuttner(beta_arr[i], Te);
-    }
+MOCKSZ_DLL void MockSZ_getMaxwellJuttner(double *beta_arr, int n_beta, double Te, double *output, double acc, int n_threads) {
+    parallel_for(n_beta, n_threads, [&](int start, int stop) {
+        for(int i=start; i<stop; i++) {
+            output[i] = getMaxwellJuttner(beta_arr[i], Te);
+        }
+    });
 } 
 
-MOCKSZ_DLL void MockSZ_getPowerlaw(double *beta_arr, int n_beta, double alpha, double *output, double acc) {
+MOCKSZ_DLL void MockSZ_getPowerlaw(double *beta_arr, int n_beta, double alpha, double *output, double acc, int n_threads) {
     double A;
     double gamma2 = beta_gamma(1 - DBL_EPSILON);
     double gamma1 = 1.;
     
     getNormPL(gamma1, gamma2, alpha, A);
     
-    for(int i=0; i<n_beta; i++) {
-        output[i] = getPowerlaw(beta_arr[i], alpha, A);
-    }
+    parallel_for(n_beta, n_threads, [&](int start, int stop) {
+        for(int i=start; i<stop; i++) {
+            output[i] = getPowerlaw(beta_arr[i], alpha, A);
+        }
+    });
 }
 
 MOCKSZ_DLL void MockSZ_getMultiScatteringMJ(double *s_arr, int n_s, double Te, double *output, double acc) {
@@ -76,37 +116,147 @@ MOCKSZ_DLL void MockSZ_getMultiScatteringPL(double *s_arr, int n_s, double alpha
     gsl_integration_workspace_free (w);
 }
 
+MOCKSZ_DLL void MockSZ_getThomsonScatterGrid(double *s_arr, int n_s, double *beta_arr, int n_beta, double *output, double acc, int n_threads) {
+    parallel_for(n_beta * n_s, n_threads, [&](int start, int stop) {
+        gsl_integration_workspace *w = gsl_integration_workspace_alloc (NW_INT);
+        gsl_function F;
+        F.function = &getThomsonScatter_pre;
+        
+        double mu1, mu2, err;
+        for(int idx=start; idx<stop; idx++) {
+            double beta = beta_arr[idx / n_s];
+            double s = s_arr[idx % n_s];
+            get_lims_mu(s, beta, mu1, mu2);
+
+            struct thom_params_pre params = { s, beta, exp(s), getThomsonPrefac(beta) };
+            
+            F.params = &params;
+            gsl_integration_qag(&F, mu1, mu2, acc, acc, NW_INT, GQMODE, w, &(output[idx]), &err);
+            if(output[idx] < 0) {output[idx] = 0;}
+        }
+        gsl_integration_workspace_free (w);
+    });
+}
+
+/**
+ * Fill a grid of multi-electron scattering kernels, with per-parameter invariants precomputed.
+ *
+ * @param integrand Either getMultiScatteringMJ_pre or getMultiScatteringPL_pre.
+ * @param s_arr Array of s-values.
+ * @param n_s Number of s-values.
+ * @param param Array of n_param parameters (theta or alpha) to store in MS_params_pre.
+ * @param norm Array of n_param normalisations to store in MS_params_pre.
+ * @param n_param Number of parameters.
+ * @param output Array of size n_param * n_s for storing results.
+ * @param acc Accuracy of integrator.
+ * @param n_threads Number of threads to use.
+ */
+static void getMultiScatteringGrid(double (*integrand)(double, void*), double *s_arr, int n_s, double *param, double *norm, int n_param, 
+        double *output, double acc, int n_threads) {
+    parallel_for(n_param * n_s, n_threads, [&](int start, int stop) {
+        gsl_integration_workspace *w = gsl_integration_workspace_alloc (NW_INT);
+        gsl_integration_workspace *w_mu = gsl_integration_workspace_alloc (NW_INT);
+        gsl_function F;
+        F.function = integrand;
+        
+        double beta0, err;
+        for(int idx=start; idx<stop; idx++) {
+            int p = idx / n_s;
+            double s = s_arr[idx % n_s];
+            beta0 = (exp(abs(s)) - 1) / (exp(abs(s)) + 1) + DBL_EPSILON;
+
+            struct MS_params_pre ms_params = { s, param[p], norm[p], w_mu };
+            
+            F.params = &ms_params;
+            gsl_integration_qag(&F, beta0, BETA1, acc, acc, NW_INT, GQMODE, w, &(output[idx]), &err);
+        }
+        gsl_integration_workspace_free (w);
+        gsl_integration_workspace_free (w_mu);
+    });
+}
+
+MOCKSZ_DLL void MockSZ_getMultiScatteringMJGrid(double *s_arr, int n_s, double *Te_arr, int n_Te, double *output, double acc, int n_threads) {
+    double *theta = new double[n_Te];
+    double *norm = new double[n_Te];
+
+    for(int p=0; p<n_Te; p++) {
+        theta[p] = Te_theta(keV_Temp(Te_arr[p]));
+        norm[p] = getMaxwellJuttnerNorm(theta[p]);
+    }
+
+    getMultiScatteringGrid(&getMultiScatteringMJ_pre, s_arr, n_s, theta, norm, n_Te, output, acc, n_threads);
+
+    delete[] theta;
+    delete[] norm;
+}
+
+MOCKSZ_DLL void MockSZ_getMultiScatteringPLGrid(double *s_arr, int n_s, double *alpha_arr, int n_alpha, double *output, double acc, int n_threads) {
+    double *alpha = new double[n_alpha];
+    double *norm = new double[n_alpha];
+    double gamma2 = beta_gamma(1 - DBL_EPSILON);
+    double gamma1 = 1.;
+
+    for(int p=0; p<n_alpha; p++) {
+        alpha[p] = alpha_arr[p];
+        getNormPL(gamma1, gamma2, alpha[p], norm[p]);
+    }
+
+    getMultiScatteringGrid(&getMultiScatteringPL_pre, s_arr, n_s, alpha, norm, n_alpha, output, acc, n_threads);
+
+    delete[] alpha;
+    delete[] norm;
+}
+
 MOCKSZ_DLL void MockSZ_getSignal_tSZ(double *nu, int n_nu, double Te, double tau_e, double *output, double acc) { 
     double s0 = -3;
     double s1 = 3;
     
-    double *func_evals = new double[MEVALS * MEVALS];
-    int n_eval = romberg_write(&get_n_eval, &getMultiScatteringMJ, s0, s1, Te, func_evals, MEVALS, acc); 
-    for(int i=0; i<n_nu; i++) {
-        output[i] = 0.;
-        double args[2] = {nu[i], tau_e};
-        
-        output[i] += romberg_read(&conv_CMB_scatt, s0, s1, args, func_evals, n_eval);
-        output[i] -= tau_e * get_CMB(nu[i]);
-    }
-    delete[] func_evals;
+    double *wk, *es;
+    int n_nodes = getKernelWeights(&getMultiScatteringMJ, s0, s1, Te, acc, wk, es);
+
+    MockSZ_getSignal_conv(nu, n_nu, tau_e, wk, es, n_nodes, output);
+    delete[] wk;
+    delete[] es;
 }
 
 MOCKSZ_DLL void MockSZ_getSignal_ntSZ(double *nu, int n_nu, double alpha, double tau_e, double *output, double acc) {
     double s0 = -9;
     double s1 = 18;
     
-    double *func_evals = new double[MEVALS * MEVALS];
-    int n_eval = romberg_write(&get_n_eval, &getMultiScatteringPL, s0, s1, alpha, func_evals, MEVALS, acc); 
+    double *wk, *es;
+    int n_nodes = getKernelWeights(&getMultiScatteringPL, s0, s1, alpha, acc, wk, es);
+
+    MockSZ_getSignal_conv(nu, n_nu, tau_e, wk, es, n_nodes, output);
+    delete[] wk;
+    delete[] es;
+}
+
+MOCKSZ_DLL int MockSZ_getKernelWeights(double param, int kernel, double acc, double *wk, double *es) {
+    double *wk_tmp, *es_tmp;
+    int n_nodes;
+
+    // Limits on s mirror those of MockSZ_getSignal_tSZ and MockSZ_getSignal_ntSZ
+    if(kernel == KERNEL_MJ) {
+        n_nodes = getKernelWeights(&getMultiScatteringMJ, -3, 3, param, acc, wk_tmp, es_tmp);
+    }
+    else {
+        n_nodes = getKernelWeights(&getMultiScatteringPL, -9, 18, param, acc, wk_tmp, es_tmp);
+    }
+
+    for(int i=0; i<n_nodes; i++) {
+        wk[i] = wk_tmp[i];
+        es[i] = es_tmp[i];
+    }
+    delete[] wk_tmp;
+    delete[] es_tmp;
+
+    return n_nodes;
+}
 
+MOCKSZ_DLL void MockSZ_getSignal_conv(double *nu, int n_nu, double tau_e, double *wk, double *es, int n_nodes, double *output) {
     for(int i=0; i<n_nu; i++) {
-        output[i] = 0.;
-        double args[2] = {nu[i], tau_e};
-        
-        output[i] += romberg_read(&conv_CMB_scatt, s0, s1, args, func_evals, n_eval);
-        output[i] -= tau_e * get_CMB(nu[i]);
+        output[i] = tau_e * (calc_conv_CMB(nu[i], wk, es, n_nodes) - get_CMB(nu[i]));
     }
-    delete[] func_evals;
 }
 
 MOCKSZ_DLL void MockSZ_getSignal_kSZ(double *nu, int n_nu, double beta_pec_z, double tau_e, double *output, double acc) {
@@ -126,19 +276,198 @@ MOCKSZ_DLL void MockSZ_getSignal_kSZ(double *nu, int n_nu, double beta_pec_z, do
     }
     gsl_integration_workspace_free (w);
 }
-    
-MOCKSZ_DLL void MockSZ_getSignal_corrections(double *nu, int n_nu, double Te, double beta_pec, double *output, double cosu) {
+
+MOCKSZ_DLL void MockSZ_getSignal_kSZ_batch(double *nu, int n_nu, double *beta_pec_z, double *tau_e, int n_cl, double *output, int n_mu, int n_threads) {
+    double *x1 = new double[n_nu];
+    double *I_CMB = new double[n_nu];
+    double *em1_x1 = new double[n_nu];
+
     for(int i=0; i<n_nu; i++) {
-        output[i] = calcSignal_corrections(nu[i], Te, beta_pec, cosu);
+        x1[i] = nu_x(nu[i]);
+        I_CMB[i] = get_CMB(nu[i]);
+        em1_x1[i] = expm1(x1[i]);
     }
+
+    double *mu = new double[n_mu];
+    double *c_mu = new double[n_mu];
+    get_nodes_GL(n_mu, mu, c_mu);
+    
+    for(int k=0; k<n_mu; k++) {
+        c_mu[k] *= 3./8. * (1 + mu[k]*mu[k]);
+    }
+
+    parallel_for(n_cl, n_threads, [&](int start, int stop) {
+        for(int j=start; j<stop; j++) {
+            double *out_j = &(output[j * n_nu]);
+            calcSignal_kSZ_GL(x1, I_CMB, em1_x1, n_nu, beta_pec_z[j], mu, c_mu, n_mu, out_j);
+            
+            for(int i=0; i<n_nu; i++) {
+                out_j[i] *= tau_e[j];
+            }
+        }
+    });
+
+    delete[] x1;
+    delete[] I_CMB;
+    delete[] em1_x1;
+    delete[] mu;
+    delete[] c_mu;
 }
 
-MOCKSZ_DLL void MockSZ_getIsoBeta(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, double *output, bool grid) {
-    getIsoBeta(Az, El, n_Az, n_El, ibeta, ne0, thetac, Da, output, grid);
+MOCKSZ_DLL void MockSZ_getSignal_tkSZ(double *nu, int n_nu, double Te, double tau_e, double beta_pec, double cosu, 
+        int components, int unit, double *output, double acc, int n_threads) {
+    double s0 = -3;
+    double s1 = 3;
+
+    double *wk = nullptr, *es = nullptr;
+    int n_nodes = 0;
+    
+    if(components & SIG_TSZ) {
+        n_nodes = getKernelWeights(&getMultiScatteringMJ, s0, s1, Te, acc, wk, es);
+    }
+
+    MockSZ_getSignal_tkSZ_pre(nu, n_nu, Te, tau_e, beta_pec, cosu, components, unit, wk, es, n_nodes, output, acc, n_threads);
+
+    delete[] wk;
+    delete[] es;
+}
+
+MOCKSZ_DLL void MockSZ_getSignal_tkSZ_pre(double *nu, int n_nu, double Te, double tau_e, double beta_pec, double cosu, 
+        int components, int unit, double *wk, double *es, int n_nodes, double *output, double acc, int n_threads) {
+    parallel_for(n_nu, n_threads, [&](int start, int stop) {
+        int n_chunk = stop - start;
+        double *x1 = new double[n_chunk];
+        double *I_CMB = new double[n_chunk];
+        double *em1_x1 = new double[n_chunk];
+        double *kSZ = new double[n_chunk];
+
+        for(int i=0; i<n_chunk; i++) {
+            x1[i] = nu_x(nu[start + i]);
+            I_CMB[i] = get_CMB(nu[start + i]);
+            em1_x1[i] = expm1(x1[i]);
+        }
+
+        if(components & SIG_KSZ) {
+            calcSignal_kSZ_GL_acc(x1, I_CMB, em1_x1, n_chunk, beta_pec * cosu, acc, kSZ);
+        }
+
+        for(int i=0; i<n_chunk; i++) {
+            double nu_i = nu[start + i];
+            double out = 0.;
+
+            if(components & SIG_CMB) {
+                out += I_CMB[i];
+            }
+
+            if(components & SIG_TSZ) {
+                out += tau_e * (calc_conv_CMB(nu_i, wk, es, n_nodes) - I_CMB[i]);
+            }
+
+            if(components & SIG_KSZ) {
+                out += tau_e * kSZ[i];
+            }
+
+            if(components & SIG_CORR) {
+                out += tau_e * calcSignal_corrections(nu_i, Te, beta_pec, cosu);
+            }
+
+            output[start + i] = out * SI_unit(nu_i, unit);
+        }
+
+        delete[] x1;
+        delete[] I_CMB;
+        delete[] em1_x1;
+        delete[] kSZ;
+    });
 }
     
-MOCKSZ_DLL void MockSZ_getCMB(double *nu, int n_nu, double *output) {
-    for(int i=0; i<n_nu; i++) {
-        output[i] = get_CMB(nu[i]);
+MOCKSZ_DLL void MockSZ_getSignal_corrections(double *nu, int n_nu, double Te, double beta_pec, double *output, double cosu, int n_threads) {
+    parallel_for(n_nu, n_threads, [&](int start, int stop) {
+        for(int i=start; i<stop; i++) {
+            output[i] = calcSignal_corrections(nu[i], Te, beta_pec, cosu);
+        }
+    });
+}
+
+MOCKSZ_DLL void MockSZ_getIsoBeta(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, double *output, 
+        bool grid, int n_threads) {
+    // Every thread evaluates a block of azimuth points, on the full elevation range (grid) or the matching elevation points (trace)
+    parallel_for(n_Az, n_threads, [&](int start, int stop) {
+        int n_blk = stop - start;
+        if(grid) {
+            getIsoBeta(&(Az[start]), El, n_blk, n_El, ibeta, ne0, thetac, Da, &(output[(size_t)start * n_El]), grid);
+        }
+        else {
+            getIsoBeta(&(Az[start]), &(El[start]), n_blk, n_blk, ibeta, ne0, thetac, Da, &(output[start]), grid);
+        }
+    });
+}
+
+MOCKSZ_DLL void MockSZ_getIsoBetaCube(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, 
+        double *spectrum, double *offset, int n_nu, double *output, bool grid, int n_threads) {
+    double te0 = getIsoBetaNorm(ibeta, ne0, thetac, Da);
+    int n_tiles = (n_Az + NTILE_AZ - 1) / NTILE_AZ;
+
+    parallel_for(n_tiles, n_threads, [&](int start, int stop) {
+        for(int t=start; t<stop; t++) {
+            int i0 = t * NTILE_AZ;
+            int i1 = std::min(i0 + NTILE_AZ, n_Az);
+            getIsoBetaCube(Az, El, i0, i1, n_El, ibeta, te0, thetac, spectrum, offset, n_nu, output, grid);
+        }
+    });
+}
+
+MOCKSZ_DLL void MockSZ_paintIsoBeta(double *Az, double *El, int n_Az, int n_El, 
+        double *az_cl, double *el_cl, double *ibeta, double *ne0, double *thetac, double *Da, double *r_trunc, 
+        int *spec_idx, int n_cl, double *spectra, int n_nu, double *output, int n_threads) {
+    double *te0 = new double[n_cl];
+    int n_tiles = (n_Az + NTILE_AZ - 1) / NTILE_AZ;
+
+    // Bin clusters into the tiles overlapped by their own [az - r_trunc, az + r_trunc], in compressed row format
+    std::vector<int> t_lo(n_cl), t_hi(n_cl);
+    std::vector<int> tile_start(n_tiles + 1, 0);
+
+    for(int c=0; c<n_cl; c++) {
+        te0[c] = getIsoBetaNorm(ibeta[c], ne0[c], thetac[c], Da[c]);
+
+        int ia = std::lower_bound(Az, Az + n_Az, az_cl[c] - r_trunc[c]) - Az;
+        int ib = std::upper_bound(Az, Az + n_Az, az_cl[c] + r_trunc[c]) - Az;
+
+        t_lo[c] = ia / NTILE_AZ;
+        t_hi[c] = ia < ib ? (ib - 1) / NTILE_AZ + 1 : t_lo[c];
+
+        for(int t=t_lo[c]; t<t_hi[c]; t++) {tile_start[t+1]++;}
+    }
+
+    for(int t=0; t<n_tiles; t++) {tile_start[t+1] += tile_start[t];}
+
+    std::vector<int> tile_cl(tile_start[n_tiles]);
+    std::vector<int> fill(tile_start.begin(), tile_start.end() - 1);
+
+    for(int c=0; c<n_cl; c++) {
+        for(int t=t_lo[c]; t<t_hi[c]; t++) {tile_cl[fill[t]++] = c;}
     }
+
+    parallel_for(n_tiles, n_threads, [&](int start, int stop) {
+        for(int t=start; t<stop; t++) {
+            int i0 = t * NTILE_AZ;
+            int i1 = std::min(i0 + NTILE_AZ, n_Az);
+
+            for(int k=tile_start[t]; k<tile_start[t+1]; k++) {
+                int c = tile_cl[k];
+                paintIsoBeta(Az, El, i0, i1, n_El, az_cl[c], el_cl[c], ibeta[c], te0[c], thetac[c], r_trunc[c], 
+                        &(spectra[spec_idx[c] * n_nu]), n_nu, output);
+            }
+        }
+    });
+
+    delete[] te0;
+}
+    
+MOCKSZ_DLL void MockSZ_getCMB(double *nu, int n_nu, double *output, int n_threads) {
+    parallel_for(n_nu, n_threads, [&](int start, int stop) {
+        for(int i=start; i<stop; i++) {
+            output[i] = get_CMB(nu[i]);
+        }
+    });
 }
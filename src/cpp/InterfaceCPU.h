@@ -5,6 +5,7 @@
 #include "Stats.h"
 #include "Signal.h"
 #include "Romberg.h"
+#include "Parallel.h"
 
 #ifdef _WIN32
 #   define MOCKSZ_DLL __declspec(dllexport)
@@ -39,8 +40,9 @@ extern "C"
      * @param output Array for storing output values.
      * @param acc Accuracy of integrator. 
      *      Note that this is only passed for homogenity in the bindings and ignored in the actual function
+     * @param n_threads Number of threads to use.
      */
-    MOCKSZ_DLL void MockSZ_getMaxwellJuttner(double *beta_arr, int n_beta, double Te, double *output, double acc); 
+    MOCKSZ_DLL void MockSZ_getMaxwellJuttner(double *beta_arr, int n_beta, double Te, double *output, double acc, int n_threads); 
     
     /**
      * Generate a powerlaw (relativistic nonthermal) distribution.
@@ -49,9 +51,11 @@ extern "C"
      * @param n_beta Number of beta values in array.
      * @param alpha Slope of powerlaw.
      * @param output Array for storing output values.
+     * @param acc Accuracy of integrator.
      *      Note that this is only passed for homogenity in the bindings and ignored in the actual function
+     * @param n_threads Number of threads to use.
      */
-    MOCKSZ_DLL void MockSZ_getPowerlaw(double *beta_arr, int n_beta, double alpha, double *output, double acc);
+    MOCKSZ_DLL void MockSZ_getPowerlaw(double *beta_arr, int n_beta, double alpha, double *output, double acc, int n_threads);
     
     /**
      * Generate a multi-electron scattering kernel using a Maxwell-Juttner distribution.
@@ -74,6 +78,54 @@ extern "C"
      * @param acc Accuracy of integrator.
      */
     MOCKSZ_DLL void MockSZ_getMultiScatteringPL(double *s_arr, int n_s, double alpha, double *output, double acc);
+
+    /**
+     * Generate single-electron scattering probabilities on a grid of s-values and electron velocities.
+     *
+     * The prefactor and exp(s) are computed once per grid point instead of per integrand evaluation.
+     * Grid points are distributed over threads, each with its own integration workspace.
+     *
+     * @param s_arr Array of s-values over which to calculate probability.
+     * @param n_s Number of s-values in array.
+     * @param beta_arr Array of electron velocities.
+     * @param n_beta Number of electron velocities.
+     * @param output Array of size n_beta * n_s for storing results, with s varying fastest.
+     * @param acc Accuracy of integrator.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getThomsonScatterGrid(double *s_arr, int n_s, double *beta_arr, int n_beta, double *output, double acc, int n_threads);
+
+    /**
+     * Generate multi-electron scattering kernels using Maxwell-Juttner distributions, on a grid of s-values and temperatures.
+     *
+     * The dimensionless temperature and the Bessel-function normalisation are computed once per temperature.
+     * Grid points are distributed over threads, each with its own integration workspaces.
+     *
+     * @param s_arr Array of s-values over which to calculate distribution.
+     * @param n_s Number of s values in array.
+     * @param Te_arr Array of electron temperatures in keV.
+     * @param n_Te Number of electron temperatures.
+     * @param output Array of size n_Te * n_s for storing results, with s varying fastest.
+     * @param acc Accuracy of integrator.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getMultiScatteringMJGrid(double *s_arr, int n_s, double *Te_arr, int n_Te, double *output, double acc, int n_threads);
+
+    /**
+     * Generate multi-electron scattering kernels using powerlaw distributions, on a grid of s-values and slopes.
+     *
+     * The powerlaw normalisation is computed once per slope.
+     * Grid points are distributed over threads, each with its own integration workspaces.
+     *
+     * @param s_arr Array of s-values over which to calculate distribution.
+     * @param n_s Number of s values in array.
+     * @param alpha_arr Array of powerlaw slopes.
+     * @param n_alpha Number of slopes.
+     * @param output Array of size n_alpha * n_s for storing results, with s varying fastest.
+     * @param acc Accuracy of integrator.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getMultiScatteringPLGrid(double *s_arr, int n_s, double *alpha_arr, int n_alpha, double *output, double acc, int n_threads);
     
     /**
      * Single-pointing signal assuming thermal SZ effect.
@@ -86,6 +138,32 @@ extern "C"
      * @param acc Accuracy of integrator.
      */
     MOCKSZ_DLL void MockSZ_getSignal_tSZ(double *nu, int n_nu, double Te, double tau_e, double *output, double acc);
+
+    /**
+     * Tabulate the convolution weights of a multi-electron scattering kernel, for reuse over several calls of MockSZ_getSignal_conv or MockSZ_getSignal_tkSZ_pre.
+     *
+     * @param param Electron temperature in keV for KERNEL_MJ, or powerlaw slope for KERNEL_PL.
+     * @param kernel Scattering kernel, KERNEL_MJ or KERNEL_PL.
+     * @param acc Accuracy of integrator.
+     * @param wk Array of size MNODES for storing combined weights.
+     * @param es Array of size MNODES for storing e^{-s} at the nodes.
+     *
+     * @returns Number of nodes written to wk and es.
+     */
+    MOCKSZ_DLL int MockSZ_getKernelWeights(double param, int kernel, double acc, double *wk, double *es);
+
+    /**
+     * Single-pointing tSZ or ntSZ signal, from convolution weights tabulated by MockSZ_getKernelWeights.
+     *
+     * @param nu Array with frequencies at which to calculate signal, in Hz.
+     * @param n_nu Number of frequencies in nu.
+     * @param tau_e Optical depth along sightline.
+     * @param wk Array with combined weights.
+     * @param es Array with e^{-s} at the nodes.
+     * @param n_nodes Number of nodes.
+     * @param output Array for storing output.
+     */
+    MOCKSZ_DLL void MockSZ_getSignal_conv(double *nu, int n_nu, double tau_e, double *wk, double *es, int n_nodes, double *output);
     
     /**
      * Single-pointing signal assuming non-thermal SZ effect.
@@ -111,6 +189,66 @@ extern "C"
      */
     MOCKSZ_DLL void MockSZ_getSignal_kSZ(double *nu, int n_nu, double beta_pec_z, double tau_e, double *output, double acc);
     
+    /**
+     * Kinematic SZ signal for a batch of clusters, each with its own velocity and optical depth.
+     *
+     * The integral over mu is evaluated with a fixed-order Gauss-Legendre rule and all frequency-dependent factors are computed once.
+     * Clusters are distributed over threads.
+     *
+     * @param nu Array with frequencies at which to calculate kSZ signal, in Hz.
+     * @param n_nu Number of frequencies in nu.
+     * @param beta_pec_z Array with dimensionless peculiar velocities of clusters along sightline.
+     * @param tau_e Array with optical depths along sightline of clusters.
+     * @param n_cl Number of clusters.
+     * @param output Array of size n_cl * n_nu for storing output, cluster-major.
+     * @param n_mu Number of Gauss-Legendre nodes over mu.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getSignal_kSZ_batch(double *nu, int n_nu, double *beta_pec_z, double *tau_e, int n_cl, double *output, int n_mu, int n_threads);
+    
+    /**
+     * Fused single-pointing signal, combining CMB, thermal SZ, kinematic SZ and correction terms in a single pass.
+     *
+     * The CMB intensity and dimensionless frequency are computed once per frequency and shared between all components.
+     * The scattering kernel for the tSZ effect is evaluated once, after which frequencies are distributed over threads.
+     * The kSZ integral over mu uses Gauss-Legendre rules of increasing order, see calcSignal_kSZ_GL_acc.
+     *
+     * @param nu Array with frequencies at which to calculate signal, in Hz.
+     * @param n_nu Number of frequencies in nu.
+     * @param Te Electron temperature in keV.
+     * @param tau_e Optical depth along sightline.
+     * @param beta_pec Dimensionless peculiar velocity of cluster.
+     * @param cosu Direction cosine between peculiar velocity and sightline.
+     * @param components Bitwise OR of SIG_CMB, SIG_TSZ, SIG_KSZ and SIG_CORR, selecting components to add.
+     * @param unit Output unit, one of UNIT_SI, UNIT_JYSR, UNIT_RJ or UNIT_DTCMB.
+     * @param output Array for storing output.
+     * @param acc Accuracy of tSZ integrator and relative accuracy of kSZ quadrature.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getSignal_tkSZ(double *nu, int n_nu, double Te, double tau_e, double beta_pec, double cosu, 
+            int components, int unit, double *output, double acc, int n_threads);
+
+    /**
+     * Fused single-pointing signal, as MockSZ_getSignal_tkSZ, but with the tSZ kernel weights tabulated by MockSZ_getKernelWeights.
+     *
+     * @param nu Array with frequencies at which to calculate signal, in Hz.
+     * @param n_nu Number of frequencies in nu.
+     * @param Te Electron temperature in keV.
+     * @param tau_e Optical depth along sightline.
+     * @param beta_pec Dimensionless peculiar velocity of cluster.
+     * @param cosu Direction cosine between peculiar velocity and sightline.
+     * @param components Bitwise OR of SIG_CMB, SIG_TSZ, SIG_KSZ and SIG_CORR, selecting components to add.
+     * @param unit Output unit, one of UNIT_SI, UNIT_JYSR, UNIT_RJ or UNIT_DTCMB.
+     * @param wk Array with combined weights of Maxwell-Juttner kernel. Only used if components contains SIG_TSZ.
+     * @param es Array with e^{-s} at the nodes. Only used if components contains SIG_TSZ.
+     * @param n_nodes Number of nodes.
+     * @param output Array for storing output.
+     * @param acc Relative accuracy of kSZ quadrature. The accuracy of the tSZ term is set when tabulating the kernel weights.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getSignal_tkSZ_pre(double *nu, int n_nu, double Te, double tau_e, double beta_pec, double cosu, 
+            int components, int unit, double *wk, double *es, int n_nodes, double *output, double acc, int n_threads);
+    
     /**
      * Correction (cross) terms up to second order in bulk velocity and electron temperature.
      *
@@ -120,8 +258,9 @@ extern "C"
      * @param beta_pec Dimensionless peculiar velocity of cluster.
      * @param output Array for storing output.
      * @param cosu Direction cosine between peculiar velocity and sightline.
+     * @param n_threads Number of threads to use.
      */
-    MOCKSZ_DLL void MockSZ_getSignal_corrections(double *nu, int n_nu, double Te, double beta_pec, double *output, double cosu);
+    MOCKSZ_DLL void MockSZ_getSignal_corrections(double *nu, int n_nu, double Te, double beta_pec, double *output, double cosu, int n_threads);
 
     /**
      * Generate an isothermal-beta model, from an azimuth and elevation array.
@@ -140,8 +279,66 @@ extern "C"
      * @param grid Whether or not to evaluate on Az-El grid, or along Az-El trace.
      *      Note: if grid=false, n_Az must equal n_El, and output must equal either one.
      *      If grid=true, n_Az does not need to equal n_El, output should have size n_Az*n_El.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getIsoBeta(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, double *output, 
+            bool grid, int n_threads);
+
+    /**
+     * Calculate an isothermal-beta cube: the optical depth screen times a spectrum, plus an optional offset spectrum.
+     *
+     * The cube is written in a single pass, split into tiles of NTILE_AZ azimuth rows which are distributed over threads.
+     * Every pixel evaluates its optical depth once and then writes its contiguous spectral axis, so the cost is about one write of the output.
+     *
+     * @param Az Array containing azimuth points in arcsec.
+     * @param El Array containing elevation points in arcsec.
+     * @param n_Az Number of azimuth points.
+     * @param n_El Number of elevation points.
+     * @param ibeta Beta parameter of isothermal model.
+     * @param ne0 Central electron number density, in electrons / cm**3.
+     * @param thetac Core radius of cluster in arcsec.
+     * @param Da Angular diameter distance in Megaparsec.
+     * @param spectrum Array of size n_nu, containing the signal per unit optical depth.
+     * @param offset Array of size n_nu added to every pixel, for example the CMB. Can be NULL, in which case nothing is added.
+     * @param n_nu Number of spectral channels.
+     * @param output Array for storing outputs.
+     * @param grid Whether or not to evaluate on Az-El grid, or along Az-El trace.
+     *      Note: if grid=false, n_Az must equal n_El, and output should have size n_Az*n_nu.
+     *      If grid=true, n_Az does not need to equal n_El, output should have size n_Az*n_El*n_nu.
+     * @param n_threads Number of threads to use.
+     */
+    MOCKSZ_DLL void MockSZ_getIsoBetaCube(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, 
+            double *spectrum, double *offset, int n_nu, double *output, bool grid, int n_threads);
+
+    /**
+     * Paint a catalogue of truncated isothermal-beta clusters into a single map or cube.
+     *
+     * The map is split into tiles of NTILE_AZ azimuth rows, which are distributed over threads.
+     * Clusters are binned into the tiles overlapped by their own truncation radius, so that every tile only visits the clusters that reach it
+     * and the work scales with the number of touched pixels, also for catalogues with very different truncation radii.
+     * Az and El must be sorted ascending.
+     *
+     * @param Az Array containing azimuth points of map in arcsec.
+     * @param El Array containing elevation points of map in arcsec.
+     * @param n_Az Number of azimuth points.
+     * @param n_El Number of elevation points.
+     * @param az_cl Array with azimuths of cluster centres in arcsec.
+     * @param el_cl Array with elevations of cluster centres in arcsec.
+     * @param ibeta Array with beta parameters of clusters.
+     * @param ne0 Array with central electron number densities, in electrons / cm**3.
+     * @param thetac Array with core radii of clusters in arcsec.
+     * @param Da Array with angular diameter distances in Megaparsec.
+     * @param r_trunc Array with truncation radii of clusters in arcsec.
+     * @param spec_idx Array with, for each cluster, the row in spectra to use.
+     * @param n_cl Number of clusters.
+     * @param spectra Array of size n_spec * n_nu, containing signals per unit optical depth.
+     * @param n_nu Number of spectral channels. For an optical depth map, pass a single spectrum equal to one.
+     * @param output Array of size n_Az * n_El * n_nu to which the clusters are added.
+     * @param n_threads Number of threads to use.
      */
-    MOCKSZ_DLL void MockSZ_getIsoBeta(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, double *output, bool grid);
+    MOCKSZ_DLL void MockSZ_paintIsoBeta(double *Az, double *El, int n_Az, int n_El, 
+            double *az_cl, double *el_cl, double *ibeta, double *ne0, double *thetac, double *Da, double *r_trunc, 
+            int *spec_idx, int n_cl, double *spectra, int n_nu, double *output, int n_threads);
 
     /**
      * Obtain value of CMB intensity at a range of frequencies.
@@ -149,10 +346,11 @@ extern "C"
      * @param nu Array of frequencies in Hz.
      * @param n_nu Number of frequencies in nu.
      * @param output Array for storing outputs.
+     * @param n_threads Number of threads to use.
      *
      * @returns CMB intensities.
      */
-    MOCKSZ_DLL void MockSZ_getCMB(double *nu, int n_nu, double *output);
+    MOCKSZ_DLL void MockSZ_getCMB(double *nu, int n_nu, double *output, int n_threads);
 }
 
 #endif
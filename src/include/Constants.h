@@ -23,5 +23,23 @@
 
 #define GQMODE GSL_INTEG_GAUSS31    /* Integrator type */
 #define MEVALS 1000                  /* Maximum evaluations for romberg integrator.*/
+#define MROWS 19                    /* Maximum rows in romberg table, such that 2**MROWS + 1 evaluations fit in MEVALS * MEVALS. */
+#define MNODES ((1 << MROWS) + 1)   /* Maximum number of nodes in convolution weights of a scattering kernel. */
+#define NTILE_AZ 16                 /* Number of azimuth rows per tile when painting cluster catalogues. */
+#define NGL_KSZ 8                   /* Initial number of Gauss-Legendre nodes for kSZ integral in fused signal. */
+#define NGL_KSZ_MAX 512             /* Maximum number of Gauss-Legendre nodes for kSZ integral in fused signal. */
+
+#define SIG_CMB 1                   /* Component flag: CMB. */
+#define SIG_TSZ 2                   /* Component flag: thermal SZ. */
+#define SIG_KSZ 4                   /* Component flag: kinematic SZ. */
+#define SIG_CORR 8                  /* Component flag: relativistic correction (cross) terms. */
+
+#define KERNEL_MJ 0                 /* Scattering kernel: Maxwell-Juttner distribution (tSZ). */
+#define KERNEL_PL 1                 /* Scattering kernel: powerlaw distribution (ntSZ). */
+
+#define UNIT_SI 0                   /* Output unit: specific intensity in SI units. */
+#define UNIT_JYSR 1                 /* Output unit: Jansky / steradian. */
+#define UNIT_RJ 2                   /* Output unit: Rayleigh-Jeans brightness temperature in Kelvin. */
+#define UNIT_DTCMB 3                /* Output unit: CMB temperature fluctuation in Kelvin. */
 
 #endif
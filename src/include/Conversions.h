@@ -73,6 +73,16 @@ double v_gamma(double velocity);
  */
 double nu_x(double nu);
 
+/**
+ * Get factor for converting specific intensity in SI units to another unit.
+ *
+ * @param nu Frequency in Hertz.
+ * @param unit Output unit, one of UNIT_SI, UNIT_JYSR, UNIT_RJ or UNIT_DTCMB.
+ *
+ * @returns Factor with which to multiply intensity in SI units.
+ */
+double SI_unit(double nu, int unit);
+
 inline double keV_Temp(double energy_keV) {
     return energy_keV * 1e3 / KB * EV;
 }
@@ -100,4 +110,20 @@ inline double v_gamma(double velocity) {
 inline double nu_x(double nu) {
     return CH * nu / KB / TCMB; 
 }
+
+inline double SI_unit(double nu, int unit) {
+    if(unit == UNIT_JYSR) {
+        return 1e26;
+    }
+    else if(unit == UNIT_RJ) {
+        return CL*CL / (2 * KB * nu*nu);
+    }
+    else if(unit == UNIT_DTCMB) {
+        // Inverse of derivative of blackbody w.r.t. temperature, at TCMB
+        double x = nu_x(nu);
+        double em1 = expm1(x);
+        return TCMB * em1*em1 / (2 * CH * nu*nu*nu / (CL*CL) * x * (em1 + 1));
+    }
+    return 1.;
+}
 #endif
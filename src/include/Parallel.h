@@ -0,0 +1,50 @@
+/*! \file Parallel.h
+    \brief Small utility for distributing loops over several threads.
+*/
+
+#include <thread>
+#include <vector>
+
+#ifndef __Parallel_h
+#define __Parallel_h
+
+/**
+ * Split the range [0, n) into contiguous blocks and run func on each block in a separate thread.
+ *
+ * The calling thread evaluates the last block itself, so n_threads=1 does not spawn any thread.
+ *
+ * @param n Total number of work items.
+ * @param n_threads Number of threads to use. Values smaller than 1 are treated as 1.
+ * @param func Callable with signature func(int start, int stop), evaluating items start up to (not including) stop.
+ */
+template <typename F>
+void parallel_for(int n, int n_threads, F func) {
+    if(n_threads < 1) {n_threads = 1;}
+    if(n_threads > n) {n_threads = n;}
+    if(n_threads <= 1) {
+        if(n > 0) {func(0, n);}
+        return;
+    }
+
+    std::vector<std::thread> threads;
+    int step = n / n_threads;
+    int rest = n % n_threads;
+    int start = 0;
+
+    for(int t=0; t<n_threads; t++) {
+        int stop = start + step + (t < rest ? 1 : 0);
+        if(t == n_threads - 1) {
+            func(start, stop);
+        }
+        else {
+            threads.push_back(std::thread(func, start, stop));
+        }
+        start = stop;
+    }
+
+    for(std::thread &t : threads) {
+        t.join();
+    }
+}
+
+#endif
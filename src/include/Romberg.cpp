@@ -48,34 +48,60 @@ int romberg_write(double (*f)(double (*g)(double, void*), double, double), doubl
     return max_steps; // return our best guess
 }
 
-double romberg_read(double (*f)(double, double*), double a, double b, double *args, double *read_arr, size_t n_eval) {
-    double R1[n_eval], R2[n_eval]; // buffers
-    double *Rp = &R1[0], *Rc = &R2[0]; // Rp is previous row, Rc is current row
-    double h = b-a; //step size
-
-    Rp[0] = (read_arr[0]*f(a, args) + read_arr[1]*f(b, args))*h*0.5; // first trapezoidal step
-  
-    int n = 2;
+int romberg_weights(double a, double b, size_t n_eval, double *nodes, double *weights) {
+    size_t n_row = n_eval + 1;
+    
+    // Coefficients of the trapezoidal estimates T(0) ... T(n_eval) in the final extrapolated value,
+    // obtained by running the Richardson table on unit vectors.
+    double *Rp = new double[n_row * n_row];
+    double *Rc = new double[n_row * n_row];
 
-    for (size_t i = 1; i <= n_eval; ++i) {
-        h /= 2.;
-        double c = 0;
-        size_t ep = 1 << (i-1); //2^(n-1)
-        for (size_t j = 1; j <= ep; ++j) {
-            c += read_arr[n] * f(a + (2*j-1) * h, args);
-
-            n++;
+    for (size_t i = 0; i < n_row; ++i) {
+        for (size_t k = 0; k < n_row; ++k) {
+            Rc[k] = (k == i) ? 1. : 0.; // R(i,0)
         }
-        Rc[0] = h*c + .5*Rp[0]; // R(i,0)
 
+        double n_k = 1.;
         for (size_t j = 1; j <= i; ++j) {
-            double n_k = pow(4, j);
-            Rc[j] = (n_k*Rc[j-1] - Rp[j-1]) / (n_k-1); // compute R(i,j)
+            n_k *= 4.;
+            for (size_t k = 0; k < n_row; ++k) {
+                Rc[j*n_row + k] = (n_k*Rc[(j-1)*n_row + k] - Rp[(j-1)*n_row + k]) / (n_k-1); // compute R(i,j)
+            }
         }
-        // swap Rn and Rc as we only need the last row
+
         double *rt = Rp;
         Rp = Rc;
         Rc = rt;
     }
-    return Rc[n_eval-1];
+    double *coef = &Rp[n_eval*n_row]; // R(n_eval, n_eval)
+
+    // suffix[l] contains sum over j >= l of coef[j] * h(j), the weight of an interior node first added in row l
+    double *suffix = new double[n_row + 1];
+    suffix[n_row] = 0.;
+    for (size_t j = n_row; j-- > 0;) {
+        suffix[j] = suffix[j+1] + coef[j] * (b-a) / (double)(1 << j);
+    }
+
+    nodes[0] = a;
+    nodes[1] = b;
+    weights[0] = 0.5 * suffix[0];
+    weights[1] = 0.5 * suffix[0];
+
+    int n = 2;
+    double h = b-a;
+    for (size_t i = 1; i <= n_eval; ++i) {
+        h /= 2.;
+        size_t ep = 1 << (i-1);
+        for (size_t j = 1; j <= ep; ++j) {
+            nodes[n] = a + (2*j-1) * h;
+            weights[n] = suffix[i];
+            n++;
+        }
+    }
+
+    delete[] Rp;
+    delete[] Rc;
+    delete[] suffix;
+
+    return n;
 }
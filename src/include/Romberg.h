@@ -28,21 +28,20 @@
 int romberg_write(double (*f)(double (*g)(double, void*), double, double), double (*g)(double, void*), double a, double b, double arg, double *write_arr, size_t max_steps, double acc);
 
 /**
- * Routine for calculating the integral of a function using Romberg integration.
+ * Calculate the quadrature nodes and weights equivalent to a full Romberg integration.
  *
- * This specific version performs the Richardson extrapolation on a given function, for a given set of function evaluations and returns the final SZ signals.
- * To be more efficient, the scattering kernel is passed as an array, from which the values are read.
- * In this way, we avoid unnecessary re-evaluations of the scattering kernel.
+ * Richardson extrapolation is linear in the function values, so the result of the Romberg table with n_eval rows equals a weighted sum of the function evaluations.
+ * The nodes are returned in the same order as the evaluations stored by romberg_write.
+ * The weights reproduce the fully extrapolated value R(n_eval, n_eval), the same value romberg_write tests for convergence.
  *
- * @param f Pointer to function, which is (currently) always conv_CMB_scatt.
  * @param a Lower limit on integral.
  * @param b Upper limit on integral.
- * @param args Extra arguments to pass to f, nu and tau_e.
- * @param read_arr Array for reading the scattering kernel evaluations.
- * @param n_eval Number of rows used for calculating scattering kernel.
+ * @param n_eval Number of rows in Richardson table, as returned by romberg_write.
+ * @param nodes Array of size 2**n_eval + 1 for storing the nodes.
+ * @param weights Array of size 2**n_eval + 1 for storing the weights.
  *
- * @returns The integrated SZ signal at frequency nu.
+ * @returns Number of nodes.
  */
-double romberg_read(double (*f)(double, double*), double a, double b, double *args, double *read_arr, size_t n_eval);
+int romberg_weights(double a, double b, size_t n_eval, double *nodes, double *weights);
 
 #endif
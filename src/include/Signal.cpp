@@ -23,6 +23,93 @@ double calcSignal_kSZ(double mu, void *args) {
     return tau_e * I_CMB * 3./8. * (1 + mu*mu) * ((exp(x1) - 1) / (exp(x2) - 1) - 1);
 }
 
+void get_nodes_GL(int n, double *x, double *w) {
+    int m = (n + 1) / 2;
+    double z, z1, p1, p2, p3, pp;
+
+    for(int i=0; i<m; i++) {
+        z = cos(PI * (i + 0.75) / (n + 0.5));
+        do {
+            p1 = 1.;
+            p2 = 0.;
+            for(int j=0; j<n; j++) {
+                p3 = p2;
+                p2 = p1;
+                p1 = ((2.*j + 1) * z * p2 - j * p3) / (j + 1);
+            }
+            pp = n * (z * p1 - p2) / (z*z - 1);
+            z1 = z;
+            z = z1 - p1 / pp;
+        } while(fabs(z - z1) > 1e-15);
+
+        x[i] = -z;
+        x[n-1-i] = z;
+        w[i] = 2. / ((1 - z*z) * pp*pp);
+        w[n-1-i] = w[i];
+    }
+}
+
+void calcSignal_kSZ_GL(double *x1, double *I_CMB, double *em1_x1, int n_nu, double beta_pec_z, 
+        double *mu, double *c_mu, int n_mu, double *output) {
+    // gamma**2 * (1 + beta) reduces to 1 / (1 - beta)
+    double *a = new double[n_mu];
+    for(int k=0; k<n_mu; k++) {
+        a[k] = (1 - beta_pec_z * mu[k]) / (1 - beta_pec_z);
+    }
+
+    double sum;
+    for(int i=0; i<n_nu; i++) {
+        sum = 0.;
+        for(int k=0; k<n_mu; k++) {
+            sum += c_mu[k] * (em1_x1[i] / expm1(x1[i] * a[k]) - 1);
+        }
+        output[i] = I_CMB[i] * sum;
+    }
+    delete[] a;
+}
+
+void calcSignal_kSZ_GL_acc(double *x1, double *I_CMB, double *em1_x1, int n_nu, double beta_pec_z, double acc, double *output) {
+    double *mu = new double[NGL_KSZ_MAX];
+    double *c_mu = new double[NGL_KSZ_MAX];
+    double *prev = new double[n_nu];
+    double *curr = new double[n_nu];
+    bool *done = new bool[n_nu];
+    int n_todo = n_nu;
+
+    for(int i=0; i<n_nu; i++) {
+        done[i] = false;
+    }
+
+    for(int n_mu=NGL_KSZ; n_mu<=NGL_KSZ_MAX && n_todo>0; n_mu*=2) {
+        get_nodes_GL(n_mu, mu, c_mu);
+        for(int k=0; k<n_mu; k++) {
+            c_mu[k] *= 3./8. * (1 + mu[k]*mu[k]);
+        }
+
+        calcSignal_kSZ_GL(x1, I_CMB, em1_x1, n_nu, beta_pec_z, mu, c_mu, n_mu, curr);
+
+        // Every frequency converges separately, so results do not depend on how frequencies are split over threads
+        for(int i=0; i<n_nu; i++) {
+            if(done[i]) {continue;}
+            output[i] = curr[i];
+            if(n_mu > NGL_KSZ && fabs(curr[i] - prev[i]) <= acc * fabs(curr[i])) {
+                done[i] = true;
+                n_todo--;
+            }
+        }
+
+        double *tmp = prev;
+        prev = curr;
+        curr = tmp;
+    }
+
+    delete[] mu;
+    delete[] c_mu;
+    delete[] prev;
+    delete[] curr;
+    delete[] done;
+}
+
 double calcSignal_corrections(double nu, double Te, double beta_pec, double cosu) {
     double X = nu_x(nu);
     double theta = Te_theta(keV_Temp(Te));
@@ -81,8 +168,20 @@ double get_n_eval(double (*func)(double, void*), double s, double arg) {
     return output;
 }
 
-double conv_CMB_scatt(double s, double *args) {
-    double nu = args[0];
-    double tau_e = args[1];
-    return tau_e * get_CMB(nu*exp(-s));
+void get_conv_weights(double *kernel, double *nodes, double *weights, int n_nodes, double *wk, double *es) {
+    for(int k=0; k<n_nodes; k++) {
+        es[k] = exp(-nodes[k]);
+        wk[k] = weights[k] * kernel[k] * es[k]*es[k]*es[k];
+    }
+}
+
+double calc_conv_CMB(double nu, double *wk, double *es, int n_nodes) {
+    double x = nu_x(nu);
+    double sum = 0.;
+
+    for(int k=0; k<n_nodes; k++) {
+        sum += wk[k] / expm1(x * es[k]);
+    }
+
+    return 2 * CH * nu*nu*nu / (CL*CL) * sum;
 }
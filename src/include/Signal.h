@@ -29,6 +29,49 @@ struct kSZ_params {
  */
 double calcSignal_kSZ(double mu, void *args);
 
+/**
+ * Calculate Gauss-Legendre nodes and weights on the interval [-1, 1].
+ *
+ * @param n Number of nodes.
+ * @param x Array of size n for storing nodes.
+ * @param w Array of size n for storing weights.
+ */
+void get_nodes_GL(int n, double *x, double *w);
+
+/**
+ * Single-pointing kSZ signal per unit optical depth, using a fixed-order quadrature over mu.
+ *
+ * All frequency-dependent factors are precomputed by the caller, so that only a single exponential is evaluated per node.
+ *
+ * @param x1 Array with dimensionless frequencies.
+ * @param I_CMB Array with CMB intensity at each frequency.
+ * @param em1_x1 Array with exp(x1) - 1 at each frequency.
+ * @param n_nu Number of frequencies.
+ * @param beta_pec_z Dimensionless bulk velocity of the gas along sightline.
+ * @param mu Quadrature nodes on [-1, 1].
+ * @param c_mu Quadrature weights, multiplied by the angular factor 3/8 (1 + mu**2).
+ * @param n_mu Number of quadrature nodes.
+ * @param output Array of size n_nu for storing kSZ signal.
+ */
+void calcSignal_kSZ_GL(double *x1, double *I_CMB, double *em1_x1, int n_nu, double beta_pec_z, 
+        double *mu, double *c_mu, int n_mu, double *output);
+
+/**
+ * Single-pointing kSZ signal per unit optical depth, using Gauss-Legendre quadrature over mu of increasing order.
+ *
+ * Starting from NGL_KSZ nodes, the number of nodes is doubled until two consecutive rules agree to a relative accuracy acc at every frequency,
+ * or NGL_KSZ_MAX nodes are reached. For each frequency, the result of the highest rule used for that frequency is returned.
+ *
+ * @param x1 Array with dimensionless frequencies.
+ * @param I_CMB Array with CMB intensity at each frequency.
+ * @param em1_x1 Array with exp(x1) - 1 at each frequency.
+ * @param n_nu Number of frequencies.
+ * @param beta_pec_z Dimensionless bulk velocity of the gas along sightline.
+ * @param acc Required relative accuracy.
+ * @param output Array of size n_nu for storing kSZ signal.
+ */
+void calcSignal_kSZ_GL_acc(double *x1, double *I_CMB, double *em1_x1, int n_nu, double beta_pec_z, double acc, double *output);
+
 /**
  * Correction (cross) terms up to second order in bulk velocity and electron temperature.
  *
@@ -62,13 +105,32 @@ double get_CMB(double nu);
 double get_n_eval(double (*func)(double, void*), double s, double arg);
 
 /**
- * Wrapper routine for romberg integration of CMB-scattering kernel convolution.
+ * Fold a tabulated scattering kernel into weights for its convolution with the CMB.
+ *
+ * The CMB at frequency nu e^{-s} equals 2 h nu^3 / c^2 * e^{-3s} / (exp(x e^{-s}) - 1).
+ * Kernel value, quadrature weight and e^{-3s} are therefore combined into a single weight per node, independent of frequency.
+ *
+ * @param kernel Array with scattering kernel evaluated at nodes.
+ * @param nodes Array with logarithmic frequency shifts s of nodes.
+ * @param weights Array with quadrature weights of nodes.
+ * @param n_nodes Number of nodes.
+ * @param wk Array of size n_nodes for storing combined weights.
+ * @param es Array of size n_nodes for storing e^{-s}.
+ */
+void get_conv_weights(double *kernel, double *nodes, double *weights, int n_nodes, double *wk, double *es);
+
+/**
+ * Convolution of a tabulated scattering kernel with the CMB at a single frequency.
+ *
+ * This is a dot product of the weights from get_conv_weights with 1 / (exp(x e^{-s}) - 1).
  *
- * @param s Logarithmic frequency shift (integration variable).
- * @param args Extra arguments, contains nu and tau_e.
+ * @param nu Frequency in Hz.
+ * @param wk Combined weights from get_conv_weights.
+ * @param es Array with e^{-s} of nodes.
+ * @param n_nodes Number of nodes.
  *
- * @param returns Integrated (n)tSZ signal at frequency nu.
+ * @returns Scattered CMB intensity at frequency nu, per unit optical depth.
  */
-double conv_CMB_scatt(double s, double *args);
+double calc_conv_CMB(double nu, double *wk, double *es, int n_nodes);
 
 #endif
@@ -15,37 +15,49 @@ void get_lims_mu(double s, double beta, double &mu1, double &mu2) {
     }
 }
 
+/**
+ * Thomson scattering probability, shared by getThomsonScatter and getThomsonScatter_pre.
+ */
+static inline double thomsonScatter(double mu, double beta, double exp_s, double prefac) {
+    double mu_prime = (exp_s * (1 - beta*mu) - 1) / beta;
+    
+    return (1 + beta*mu_prime) * (1 + mu*mu * mu_prime*mu_prime +
+            0.5 * (1 - mu*mu) * (1 - mu_prime*mu_prime)) / 
+            ((1 - beta * mu)*(1 - beta * mu)*(1 - beta * mu)) *
+            prefac;
+}
+
+double getThomsonPrefac(double beta) {
+    double gamma = beta_gamma(beta);
+    return 3 / (16 * gamma*gamma*gamma*gamma * beta); 
+}
+
 double getThomsonScatter(double mu, void *args) {
     struct thom_params *params = (struct thom_params *)args;
     double s = (params->s);
     double beta = (params->beta);
 
-    double mu_prime;
-
-    double output;
-
-    double gamma = beta_gamma(beta);
-    double prefac = 3 / (16 * gamma*gamma*gamma*gamma * beta); 
-
-    mu_prime = (exp(s) * (1 - beta*mu) - 1) / beta;
-    output = (1 + beta*mu_prime) * (1 + mu*mu * mu_prime*mu_prime +
-            0.5 * (1 - mu*mu) * (1 - mu_prime*mu_prime)) / 
-            ((1 - beta * mu)*(1 - beta * mu)*(1 - beta * mu)) *
-            prefac;
+    return thomsonScatter(mu, beta, exp(s), getThomsonPrefac(beta));
+}
 
-    return output;
+double getThomsonScatter_pre(double mu, void *args) {
+    struct thom_params_pre *params = (struct thom_params_pre *)args;
+    return thomsonScatter(mu, params->beta, params->exp_s, params->prefac);
 }
 
 double getMaxwellJuttner(double beta, double Te) {
     double theta = Te_theta(keV_Temp(Te));
-    double gamma;
-    double nominator, denominator;
+    return getMaxwellJuttner_pre(beta, theta, getMaxwellJuttnerNorm(theta));
+}
 
-    gamma = beta_gamma(beta);
-    nominator = gamma*gamma*gamma*gamma*gamma * beta*beta * exp(-gamma / theta);
-    denominator = theta * gsl_sf_bessel_Kn(2, 1/theta);
-    return nominator / denominator;
+double getMaxwellJuttnerNorm(double theta) {
+    return theta * gsl_sf_bessel_Kn(2, 1/theta);
+}
 
+double getMaxwellJuttner_pre(double beta, double theta, double norm) {
+    double gamma = beta_gamma(beta);
+    double nominator = gamma*gamma*gamma*gamma*gamma * beta*beta * exp(-gamma / theta);
+    return nominator / norm;
 }
 
 double getPowerlaw(double beta, double alpha, double A) {
@@ -108,11 +120,7 @@ double getMultiScatteringPL(double beta, void *args) {
 }
 
 void getIsoBeta(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, double *output, bool grid) {
-    double Da_si = pc_m(Da * 1e6); 
-    double theta_c_si = thetac / 3600 / 180 * PI;
-    double rc = theta_c_si * Da_si;
-
-    double te0 = ne0*1e6 * ST * rc * sqrt(PI) * gsl_sf_gamma(3/2*ibeta - 0.5) / gsl_sf_gamma(3/2*ibeta);
+    double te0 = getIsoBetaNorm(ibeta, ne0, thetac, Da);
     
     double theta2;
 
@@ -133,6 +141,105 @@ void getIsoBeta(double *Az, double *El, int n_Az, int n_El, double ibeta, double
     }
 }
 
+double getIsoBetaNorm(double ibeta, double ne0, double thetac, double Da) {
+    double Da_si = pc_m(Da * 1e6); 
+    double theta_c_si = thetac / 3600 / 180 * PI;
+    double rc = theta_c_si * Da_si;
+
+    return ne0*1e6 * ST * rc * sqrt(PI) * gsl_sf_gamma(3./2*ibeta - 0.5) / gsl_sf_gamma(3./2*ibeta);
+}
+
+void paintIsoBeta(double *Az, double *El, int i0, int i1, int n_El, double az_cl, double el_cl, 
+        double ibeta, double te0, double thetac, double r_trunc, double *spectrum, int n_nu, double *output) {
+    int ia = std::lower_bound(Az + i0, Az + i1, az_cl - r_trunc) - Az;
+    int ib = std::upper_bound(Az + i0, Az + i1, az_cl + r_trunc) - Az;
+    int ja = std::lower_bound(El, El + n_El, el_cl - r_trunc) - El;
+    int jb = std::upper_bound(El, El + n_El, el_cl + r_trunc) - El;
+
+    double r_trunc2 = r_trunc*r_trunc;
+    double thetac2 = thetac*thetac;
+    double expo = 0.5-1.5*ibeta;
+    double dAz2, dEl, theta2, tau;
+
+    for(int i=ia; i<ib; i++) {
+        dAz2 = (Az[i] - az_cl)*(Az[i] - az_cl);
+        for(int j=ja; j<jb; j++) {
+            dEl = El[j] - el_cl;
+            theta2 = dAz2 + dEl*dEl;
+            if(theta2 > r_trunc2) {continue;}
+
+            tau = te0*pow(1 + theta2/thetac2, expo);
+            // Offset in size_t: cubes on disk can exceed 2^31 elements
+            double *out_ij = &(output[((size_t)i*n_El + j) * (size_t)n_nu]);
+            for(int k=0; k<n_nu; k++) {
+                out_ij[k] += tau * spectrum[k];
+            }
+        }
+    }
+}
+
+void getIsoBetaCube(double *Az, double *El, int i0, int i1, int n_El, double ibeta, double te0, double thetac, 
+        double *spectrum, double *offset, int n_nu, double *output, bool grid) {
+    double thetac2 = thetac*thetac;
+    double expo = 0.5-1.5*ibeta;
+    double theta2, tau;
+
+    // Along a trace, every azimuth point has a single elevation point, with the same index
+    int n_j = grid ? n_El : 1;
+
+    for(int i=i0; i<i1; i++) {
+        for(int j=0; j<n_j; j++) {
+            int idx_El = grid ? j : i;
+            theta2 = Az[i]*Az[i] + El[idx_El]*El[idx_El];
+            tau = te0*pow(1 + theta2/thetac2, expo);
+
+            // Offset in size_t: cubes on disk can exceed 2^31 elements
+            double *out_ij = &(output[((size_t)i*n_j + j) * (size_t)n_nu]);
+            if(offset == NULL) {
+                for(int k=0; k<n_nu; k++) {
+                    out_ij[k] = tau * spectrum[k];
+                }
+            }
+            else {
+                for(int k=0; k<n_nu; k++) {
+                    out_ij[k] = tau * spectrum[k] + offset[k];
+                }
+            }
+        }
+    }
+}
+
+/**
+ * Integral over direction cosines of the Thomson scattering probability, with a caller-owned workspace.
+ */
+static double integrateThomson_pre(double s, double beta, gsl_integration_workspace *w) {
+    gsl_function F;
+    F.function = &getThomsonScatter_pre;
+
+    double mu1, mu2, pmu, err;
+    get_lims_mu(s, beta, mu1, mu2);
+
+    struct thom_params_pre th_params = { s, beta, exp(s), getThomsonPrefac(beta) };
+    F.params = &th_params;
+
+    gsl_integration_qag(&F, mu1, mu2, 0, 1e-6, NW_INT, GQMODE, w, &pmu, &err);
+    return pmu;
+}
+
+double getMultiScatteringMJ_pre(double beta, void *args) {
+    struct MS_params_pre *ms_params = (struct MS_params_pre *)args;
+    
+    double pmu = integrateThomson_pre(ms_params->s, beta, ms_params->w);
+    return pmu * getMaxwellJuttner_pre(beta, ms_params->param, ms_params->norm);
+}
+
+double getMultiScatteringPL_pre(double beta, void *args) {
+    struct MS_params_pre *ms_params = (struct MS_params_pre *)args;
+    
+    double pmu = integrateThomson_pre(ms_params->s, beta, ms_params->w);
+    return pmu * getPowerlaw(beta, ms_params->param, ms_params->norm);
+}
+
 void getNormPL(double &gamma1, double &gamma2, double &alpha, double &A) {
     if(alpha < 0) {
         A = log10(gamma2/gamma1);
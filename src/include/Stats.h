@@ -11,6 +11,7 @@
 #include <gsl/gsl_math.h>
 
 #include <cstdio>
+#include <algorithm>
 
 #ifndef __Stats_h
 #define __Stats_h
@@ -18,6 +19,20 @@
 struct thom_params { double s; double beta; };
 struct MS_params { double s; double param; };
 
+/**
+ * Parameters for Thomson scattering with invariants hoisted out of the integrand.
+ * Filled with get_thom_params_pre.
+ */
+struct thom_params_pre { double s; double beta; double exp_s; double prefac; };
+
+/**
+ * Parameters for multi-electron scattering kernels with invariants hoisted out of the integrand.
+ * For a Maxwell-Juttner distribution, param is the dimensionless temperature theta and norm equals theta*K2(1/theta).
+ * For a powerlaw, param is alpha and norm equals A, both as returned by getNormPL.
+ * The workspace is used for the inner integral over direction cosines and should not be shared between threads.
+ */
+struct MS_params_pre { double s; double param; double norm; gsl_integration_workspace *w; };
+
 /**
  * Calculate integration limits for integral over Thomson scattering cross section.
  *
@@ -41,6 +56,27 @@ void get_lims_mu(double s, double beta, double &mu1, double &mu2);
  */
 double getThomsonScatter(double mu, void *args);
 
+/**
+ * Calculate the beta-dependent prefactor of the Thomson scattering probability.
+ *
+ * @param beta Dimensionless electron velocity.
+ *
+ * @returns Prefactor 3 / (16 gamma^4 beta).
+ */
+double getThomsonPrefac(double beta);
+
+/**
+ * Calculate probability for a scattering to give frequency shift s, given beta, with precomputed invariants.
+ *
+ * Equal to getThomsonScatter, but exp(s) and the prefactor are read from the parameters instead of being recalculated.
+ *
+ * @param mu Direction cosine (integration variable).
+ * @param args Pointer to thom_params_pre struct.
+ *
+ * @returns Probability for a scattering to give a frequency shift s, for a given beta.
+ */
+double getThomsonScatter_pre(double mu, void *args);
+
 /**
  * Generate a Maxwell-Juttner (relativistic thermal) distribution.
  *
@@ -51,6 +87,26 @@ double getThomsonScatter(double mu, void *args);
  */
 double getMaxwellJuttner(double beta, double Te);
 
+/**
+ * Calculate normalisation of a Maxwell-Juttner distribution.
+ *
+ * @param theta Dimensionless electron temperature.
+ *
+ * @returns Normalisation theta * K2(1/theta).
+ */
+double getMaxwellJuttnerNorm(double theta);
+
+/**
+ * Generate a Maxwell-Juttner distribution with precomputed normalisation.
+ *
+ * @param beta Beta value at which to calculate distribution.
+ * @param theta Dimensionless electron temperature.
+ * @param norm Normalisation, as returned by getMaxwellJuttnerNorm.
+ *
+ * @returns Probability for an electron to have velocity beta, given temperature.
+ */
+double getMaxwellJuttner_pre(double beta, double theta, double norm);
+
 /**
  * Generate a powerlaw (relativistic nonthermal) distribution.
  *
@@ -82,6 +138,26 @@ double getMultiScatteringMJ(double beta, void *args);
  */
 double getMultiScatteringPL(double beta, void *args);
 
+/**
+ * Generate a multi-electron scattering kernel using a Maxwell-Juttner distribution, with precomputed invariants.
+ *
+ * @param beta Dimensionless electron velocity (integration variable).
+ * @param args Pointer to MS_params_pre struct containing s, theta, normalisation and workspace.
+ *
+ * @returns Probability for frequency shift s, given an electron temperature.
+ */
+double getMultiScatteringMJ_pre(double beta, void *args);
+
+/**
+ * Generate a multi-electron scattering kernel using a relativistic powerlaw distribution, with precomputed invariants.
+ *
+ * @param beta Dimensionless electron velocity (integration variable).
+ * @param args Pointer to MS_params_pre struct containing s, alpha, normalisation and workspace.
+ *
+ * @returns Probability for frequency shift s, given an alpha.
+ */
+double getMultiScatteringPL_pre(double beta, void *args);
+
 /**
  * Generate an isothermal-beta model, from an azimuth and elevation array.
  *
@@ -102,6 +178,64 @@ double getMultiScatteringPL(double beta, void *args);
  */
 void getIsoBeta(double *Az, double *El, int n_Az, int n_El, double ibeta, double ne0, double thetac, double Da, double *output, bool grid);
 
+/**
+ * Calculate central optical depth of an isothermal-beta model.
+ *
+ * @param ibeta Beta parameter of isothermal model.
+ * @param ne0 Central electron number density, in electrons / cm**3.
+ * @param thetac Core radius of cluster in arcsec.
+ * @param Da Angular diameter distance in Megaparsec.
+ *
+ * @returns Optical depth through the cluster centre.
+ */
+double getIsoBetaNorm(double ibeta, double ne0, double thetac, double Da);
+
+/**
+ * Add a truncated isothermal-beta cluster, multiplied by a spectrum, to part of a map or cube.
+ *
+ * Only pixels inside the truncation radius around the cluster centre are visited.
+ * Both Az and El should be sorted in ascending order.
+ *
+ * @param Az Array containing azimuth points of map in arcsec.
+ * @param El Array containing elevation points of map in arcsec.
+ * @param i0 First azimuth index of the part of the map to paint.
+ * @param i1 Last azimuth index (exclusive) of the part of the map to paint.
+ * @param n_El Number of elevation points.
+ * @param az_cl Azimuth of cluster centre in arcsec.
+ * @param el_cl Elevation of cluster centre in arcsec.
+ * @param ibeta Beta parameter of isothermal model.
+ * @param te0 Central optical depth of cluster.
+ * @param thetac Core radius of cluster in arcsec.
+ * @param r_trunc Truncation radius of cluster in arcsec.
+ * @param spectrum Array of size n_nu, containing the signal per unit optical depth.
+ * @param n_nu Number of spectral channels.
+ * @param output Array of size n_Az * n_El * n_nu to which the cluster is added.
+ */
+void paintIsoBeta(double *Az, double *El, int i0, int i1, int n_El, double az_cl, double el_cl, 
+        double ibeta, double te0, double thetac, double r_trunc, double *spectrum, int n_nu, double *output);
+
+/**
+ * Write part of an isothermal-beta cube, given by an optical depth screen times a spectrum, plus an optional offset spectrum.
+ *
+ * The optical depth is calculated once per pixel, after which the spectral axis of that pixel is written in one contiguous pass.
+ *
+ * @param Az Array containing azimuth points in arcsec.
+ * @param El Array containing elevation points in arcsec.
+ * @param i0 First azimuth index of the part of the cube to write.
+ * @param i1 Last azimuth index (exclusive) of the part of the cube to write.
+ * @param n_El Number of elevation points.
+ * @param ibeta Beta parameter of isothermal model.
+ * @param te0 Central optical depth of cluster.
+ * @param thetac Core radius of cluster in arcsec.
+ * @param spectrum Array of size n_nu, containing the signal per unit optical depth.
+ * @param offset Array of size n_nu added to every pixel, for example the CMB. Can be NULL, in which case nothing is added.
+ * @param n_nu Number of spectral channels.
+ * @param output Array of size n_Az * n_El * n_nu (grid) or n_Az * n_nu (trace) for storing the cube.
+ * @param grid Whether or not to evaluate on Az-El grid, or along Az-El trace.
+ */
+void getIsoBetaCube(double *Az, double *El, int i0, int i1, int n_El, double ibeta, double te0, double thetac, 
+        double *spectrum, double *offset, int n_nu, double *output, bool grid);
+
 /**
  * Calculate normalisation constant for powerlaw distribution.
  *
@@ -0,0 +1,60 @@
+import numpy as np
+import unittest
+from nose2.tools import params
+
+import MockSZ.Adaptive as test_ad
+import MockSZ.Models as test_md
+
+class TestAdaptive(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.nu_arr = np.linspace(10e9, 1000e9, 5000)
+        cls.tau_e = 0.01
+
+    @params(1e-4, 1e-6)
+    def test_sampleAdaptive(self, rtol):
+        x_arr = np.linspace(0, 10, 10001)
+        func = lambda x: np.sin(x) * np.exp(-x / 5)
+
+        res, err, n_eval = test_ad.sampleAdaptive(func, x_arr, rtol)
+
+        self.assertEqual(res.shape, x_arr.shape)
+        self.assertLess(n_eval, x_arr.size // 5)
+        self.assertLessEqual(err, rtol)
+        self.assertLess(np.max(np.absolute(res - func(x_arr))), 10 * rtol)
+
+    def test_sampleAdaptive_small(self):
+        x_arr = np.array([3., 1., 2., 1.])
+
+        res, err, n_eval = test_ad.sampleAdaptive(np.square, x_arr)
+
+        self.assertTrue(np.all(res == np.square(x_arr)))
+        self.assertEqual(err, 0.)
+        self.assertEqual(n_eval, 3)
+
+    @params("SI", "dTCMB")
+    def test_SinglePointing_adaptive(self, unit):
+        spObj = test_md.SinglePointing(15.33, v_pec=300, phi_cl=30, tau_e=self.tau_e)
+
+        res_direct = spObj.getSingleSignal_tkSZ(self.nu_arr, unit=unit)
+        res_adapt = spObj.getSingleSignal_tkSZ(self.nu_arr, unit=unit, adaptive=True, rtol=1e-6)
+
+        spObj_SZ = test_md.SinglePointing(15.33, v_pec=300, phi_cl=30, tau_e=self.tau_e, no_CMB=True)
+        ref = spObj_SZ.getSingleSignal_tkSZ(self.nu_arr, unit=unit)
+        diff = np.max(np.absolute(res_adapt - res_direct)) / np.max(np.absolute(ref))
+
+        self.assertLessEqual(spObj.adaptive_err, 1e-6)
+        self.assertLess(diff, 1e-5)
+
+    def test_SinglePointing_adaptive_ntSZ(self):
+        spObj = test_md.SinglePointing(2.5, tau_e=self.tau_e)
+        
+        res_direct = spObj.getSingleSignal_ntkSZ(self.nu_arr)
+        res_adapt = spObj.getSingleSignal_ntkSZ(self.nu_arr, adaptive=True, rtol=1e-6)
+
+        ref = res_direct - spObj.getCMB(self.nu_arr)
+        self.assertLess(np.max(np.absolute(res_adapt - res_direct)) / np.max(np.absolute(ref)), 1e-5)
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
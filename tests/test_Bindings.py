@@ -0,0 +1,99 @@
+import numpy as np
+import unittest
+from nose2.tools import params
+from scipy.integrate import quad
+
+import MockSZ.Bindings as test_bd
+
+class TestBindings(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.clib = test_bd.loadMockSZlib()
+        cls.nu_arr = np.linspace(100e9, 500e9, 101)
+        cls.s_arr = np.linspace(-1, 1, 50)
+
+    @params("MockSZ_getSignal_tSZ", "MockSZ_getSignal_ntSZ", "MockSZ_getSignal_kSZ")
+    def test_getDistributionTwoParam_chunked(self, name):
+        func = getattr(self.clib, name)
+        param = {"MockSZ_getSignal_tSZ" : 15.33, "MockSZ_getSignal_ntSZ" : 2.5, "MockSZ_getSignal_kSZ" : 0.01}[name]
+
+        res = test_bd.getDistributionTwoParam(self.nu_arr, param, 0.01, 1e-6, func)
+        res_chunked = test_bd.getDistributionTwoParam(self.nu_arr, param, 0.01, 1e-6, func, chunksize=7)
+
+        self.assertTrue(np.all(res_chunked == res))
+
+    @params("SI", "dTCMB")
+    def test_getSignal_tkSZ_chunked(self, unit):
+        components = test_bd.SIG_CMB | test_bd.SIG_TSZ | test_bd.SIG_KSZ | test_bd.SIG_CORR
+        progress = []
+
+        def callback(output, n_done, n_total):
+            progress.append((n_done, n_total, np.sum(np.isnan(output))))
+
+        res = test_bd.getSignal_tkSZ(self.nu_arr, 15.33, 0.01, 1e-3, 0.5, components, unit, 1e-6)
+        res_chunked = test_bd.getSignal_tkSZ(self.nu_arr, 15.33, 0.01, 1e-3, 0.5, components, unit, 1e-6, callback=callback)
+
+        self.assertTrue(np.all(res_chunked == res))
+        self.assertLessEqual(len(progress), test_bd.NCHUNKS)
+        self.assertEqual(progress[-1][0], self.nu_arr.size)
+        
+        for n_done, n_total, n_nan in progress:
+            self.assertEqual(n_total, self.nu_arr.size)
+            self.assertEqual(n_nan, n_total - n_done)
+
+    def test_getDistributionGrid_chunked(self):
+        Te_arr = np.array([5., 10., 15.33])
+        progress = []
+
+        res = test_bd.getDistributionGrid(self.s_arr, Te_arr, 1e-6, self.clib.MockSZ_getMultiScatteringMJGrid)
+        res_chunked = test_bd.getDistributionGrid(self.s_arr, Te_arr, 1e-6, self.clib.MockSZ_getMultiScatteringMJGrid,
+                                                  callback=lambda output, n_done, n_total: progress.append(n_done), chunksize=1)
+
+        self.assertTrue(np.all(res_chunked == res))
+        self.assertEqual(progress, [1, 2, 3])
+
+    def test_budget(self):
+        res = test_bd.getDistributionSingleParam(self.s_arr, 15.33, 1e-6, self.clib.MockSZ_getMultiScatteringMJ,
+                                                 budget=0, chunksize=10)
+        res_full = test_bd.getDistributionSingleParam(self.s_arr, 15.33, 1e-6, self.clib.MockSZ_getMultiScatteringMJ)
+
+        self.assertTrue(np.all(res[:10] == res_full[:10]))
+        self.assertTrue(np.all(np.isnan(res[10:])))
+
+    @params(("MJ", 15.33), ("PL", 2.5))
+    def test_getDistributionSingleParam_threaded(self, dist, param):
+        beta_arr = np.linspace(0.01, 0.99, 1000)
+        func = self.clib.MockSZ_getMaxwellJuttner if dist == "MJ" else self.clib.MockSZ_getPowerlaw
+        func_ref = test_bd.getMaxwellJuttner if dist == "MJ" else test_bd.getPowerlaw
+
+        res = test_bd.getDistributionSingleParam(beta_arr, param, 0., func, nThreads=3)
+        self.assertTrue(np.array_equal(res, func_ref(beta_arr, param, nThreads=1)))
+
+    def test_getKernelWeights(self):
+        wk, es = test_bd.getKernelWeights(15.33, "MJ", 1e-6)
+        
+        self.assertEqual(wk.shape, es.shape)
+        self.assertEqual((wk.size - 1) & (wk.size - 2), 0)
+
+        with self.assertRaises(ValueError):
+            test_bd.getKernelWeights(15.33, "foo", 1e-6)
+
+    @params(1e-2, 1e-8)
+    def test_getSignal_tkSZ_kSZ_acc(self, acc):
+        # Fast cluster, for which the lowest Gauss-Legendre rule is not accurate
+        beta = 0.9
+        nu_arr = self.nu_arr[::20]
+        
+        I_CMB = test_bd.getCMB(nu_arr)
+        res = test_bd.getSignal_tkSZ(nu_arr, 0., 1., beta, 1., test_bd.SIG_KSZ, "SI", acc)
+
+        for i, nu in enumerate(nu_arr):
+            x = 6.62607015E-34 * nu / 1.380649E-23 / 2.726
+            integrand = lambda mu: 3/8 * (1 + mu*mu) * (np.expm1(x) / np.expm1(x * (1 - beta*mu) / (1 - beta)) - 1)
+            ref = I_CMB[i] * quad(integrand, -1, 1, epsabs=0, epsrel=1e-13, limit=500)[0]
+
+            self.assertLess(abs(res[i] - ref), max(acc, 1e-12) * abs(ref))
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import numpy as np
+import unittest
+
+import MockSZ.Cache as test_ch
+import MockSZ.Models as test_md
+
+class TestCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.n_test = 1000
+        cls.test_arr = np.linspace(0, 1, cls.n_test)
+
+        cls.Te = 15.33
+        cls.beta_arr = np.linspace(0, 0.9, cls.n_test)
+        cls.nu_arr = np.linspace(100, 500, 20) * 1e9
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = test_ch.ResultCache(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_getKey(self):
+        key = self.cache.getKey("f", self.test_arr, 1)
+        
+        self.assertEqual(key, self.cache.getKey("f", self.test_arr.copy(), 1))
+        self.assertNotEqual(key, self.cache.getKey("f", self.test_arr, 1.))
+        self.assertNotEqual(key, self.cache.getKey("f", self.test_arr[::-1], 1))
+        self.assertNotEqual(key, self.cache.getKey("g", self.test_arr, 1))
+
+        with self.assertRaises(TypeError):
+            self.cache.getKey(object())
+
+    def test_storeLoad(self):
+        key = self.cache.getKey("f", self.test_arr)
+        self.assertIsNone(self.cache.load(key))
+        
+        self.cache.store(key, self.test_arr)
+        res = self.cache.load(key)
+        
+        self.assertTrue(isinstance(res, np.memmap))
+        self.assertTrue(np.array_equal(res, self.test_arr))
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpdir.name, key + ".json")))
+
+        self.cache.clear()
+        self.assertIsNone(self.cache.load(key))
+
+    def test_evict(self):
+        size_one = self.test_arr.nbytes + 128
+        cache = test_ch.ResultCache(self.tmpdir.name, max_size=int(3.5 * size_one))
+        
+        keys = [cache.getKey(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.store(key, self.test_arr)
+            os.utime(os.path.join(self.tmpdir.name, key + ".npy"), (i, i))
+
+        # Touch first result, so that second is least recently used
+        cache.load(keys[0])
+        cache.store(cache.getKey(3), self.test_arr)
+
+        self.assertIsNotNone(cache.load(keys[0]))
+        self.assertIsNone(cache.load(keys[1]))
+        self.assertLessEqual(cache.getSize(), cache.max_size)
+
+    def test_cachedModels(self):
+        skObj = test_md.ScatteringKernels(cache=self.cache)
+        mj = skObj.getMaxwellJuttner(self.beta_arr, self.Te)
+        mj_cached = skObj.getMaxwellJuttner(self.beta_arr, self.Te)
+        
+        self.assertTrue(isinstance(mj_cached, np.memmap))
+        self.assertTrue(np.array_equal(mj, mj_cached))
+        
+        spObj = test_md.SinglePointing(self.Te, cache=self.cache)
+        tSZ = spObj.getSingleSignal_tkSZ(self.nu_arr)
+        tSZ_cached, time = spObj.getSingleSignal_tkSZ(self.nu_arr, timer=True)
+        
+        self.assertTrue(isinstance(tSZ_cached, np.memmap))
+        self.assertTrue(np.array_equal(tSZ, tSZ_cached))
+        
+        spObj_other = test_md.SinglePointing(self.Te, tau_e=0.5, cache=self.cache)
+        self.assertFalse(isinstance(spObj_other.getSingleSignal_tkSZ(self.nu_arr), np.memmap))
+
+    def test_cachedState(self):
+        spObj = test_md.SinglePointing(self.Te, v_pec=300, cache=self.cache)
+        res_adapt = spObj.getSingleSignal_tkSZ(self.nu_arr, adaptive=True)
+        err = spObj.adaptive_err
+        
+        # Redshift is not read by getSingleSignal_tkSZ, so it should not cause a miss
+        spObj.z = 1.
+        spObj.getSingleSignal_tkSZ(self.nu_arr)
+        self.assertIsNone(spObj.adaptive_err)
+        
+        res_cached = spObj.getSingleSignal_tkSZ(self.nu_arr, adaptive=True)
+        self.assertTrue(isinstance(res_cached, np.memmap))
+        self.assertTrue(np.array_equal(res_adapt, res_cached))
+        self.assertEqual(spObj.adaptive_err, err)
+
+        spObj.v_pec = 500
+        self.assertFalse(isinstance(spObj.getSingleSignal_tkSZ(self.nu_arr), np.memmap))
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
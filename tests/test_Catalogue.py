@@ -0,0 +1,123 @@
+import os
+import time
+import tempfile
+import numpy as np
+import unittest
+
+import MockSZ.Catalogue as test_ct
+import MockSZ.Models as test_md
+
+class TestCatalogue(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.nAz = 21
+        cls.Az = np.linspace(-60, 60, cls.nAz)
+        cls.nEl = 17
+        cls.El = np.linspace(-50, 50, cls.nEl)
+        cls.ibeta = 0.7
+        cls.ne0 = 1.2e-2
+        cls.thetac = 15
+        cls.Da = 1500
+
+        cls.Te = 7.
+        cls.v_pec = 300
+        cls.phi_cl = 30
+        
+        cls.n_test = 10
+        cls.nu_arr = np.linspace(100, 500, cls.n_test) * 1e9
+
+        cls.Az_cl = np.array([5., -30.])
+        cls.El_cl = np.array([3., 20.])
+
+    def test_paintMap(self):
+        catObj = test_ct.ClusterCatalogue(self.Az_cl, self.El_cl, self.ibeta, self.ne0, 
+                                          self.thetac, self.Da, r_trunc=100)
+        tau_map = catObj.paintMap(self.Az, self.El)
+        self.assertEqual(tau_map.shape, (self.nAz, self.nEl))
+
+        isobObj = test_md.IsoBetaModel(self.Te)
+        tau_ref = np.zeros((self.nAz, self.nEl))
+        for az, el in zip(self.Az_cl, self.El_cl):
+            tau_ref += isobObj.getIsoBeta(self.Az - az, self.El - el, self.ibeta, 
+                                          self.ne0, self.thetac, self.Da, grid=True)
+        
+        self.assertTrue(np.allclose(tau_map, tau_ref))
+        
+        tau_trunc = test_ct.ClusterCatalogue(self.Az_cl, self.El_cl, self.ibeta, self.ne0, 
+                                             self.thetac, self.Da, r_trunc=1).paintMap(self.Az, self.El)
+        self.assertTrue(np.all(tau_trunc <= tau_map))
+        self.assertEqual(tau_trunc[0,0], 0)
+
+        with self.assertRaises(ValueError):
+            catObj.paintMap(self.Az[::-1], self.El)
+
+    def test_paintCube(self):
+        catObj = test_ct.ClusterCatalogue(self.Az_cl, self.El_cl, self.ibeta, self.ne0, 
+                                          self.thetac, self.Da, Te=self.Te, v_pec=self.v_pec,
+                                          phi_cl=self.phi_cl, r_trunc=100)
+        
+        cube = catObj.paintCube(self.Az, self.El, self.nu_arr, Te_bin=0, v_bin=0)
+        self.assertEqual(cube.shape, (self.nAz, self.nEl, self.n_test))
+
+        isobObj = test_md.IsoBetaModel(self.Te, self.v_pec, phi_cl=self.phi_cl, no_CMB=True)
+        cube_ref = np.zeros(cube.shape)
+        for az, el in zip(self.Az_cl, self.El_cl):
+            isob = isobObj.getIsoBeta(self.Az - az, self.El - el, self.ibeta, 
+                                      self.ne0, self.thetac, self.Da, grid=True)
+            cube_ref += isobObj.getIsoBetaCube(isob, self.nu_arr)
+
+        scale = np.max(np.absolute(cube_ref))
+        self.assertTrue(np.allclose(cube / scale, cube_ref / scale, atol=1e-10))
+
+    def test_paintCube_large(self):
+        # Cube of 2^32 elements in a sparse file: offsets beyond 2^31 should not overflow
+        Az = np.arange(4096, dtype=np.float64)
+        El = np.arange(1024, dtype=np.float64)
+        nu_arr = np.linspace(100, 500, 1024) * 1e9
+
+        catObj = test_ct.ClusterCatalogue(Az[-1], El[-1], self.ibeta, self.ne0, self.thetac, self.Da, Te=self.Te, r_trunc=0.01)
+        spectra, _ = catObj.getSpectra(nu_arr)
+
+        with tempfile.TemporaryDirectory() as path:
+            try:
+                out = np.memmap(os.path.join(path, "cube.dat"), dtype=np.float64, mode="w+", shape=(Az.size, El.size, nu_arr.size))
+            except OSError:
+                self.skipTest("Cannot create large sparse file.")
+
+            catObj.paintCube(Az, El, nu_arr, out=out)
+            tau = catObj.paintMap(Az[-1:], El[-1:])[0,0]
+
+            self.assertTrue(np.allclose(out[-1,-1], tau * spectra[0]))
+            self.assertTrue(np.all(out[-1,-2] == 0))
+            del out
+
+    def test_paintMap_scaling(self):
+        # A single cluster with a large truncation radius should not make every tile visit all small clusters
+        Az = np.arange(8192, dtype=np.float64)
+        El = np.arange(8, dtype=np.float64)
+
+        rng = np.random.default_rng(1)
+        Az_cl = rng.uniform(Az[0], Az[-1], 20000)
+        El_cl = rng.uniform(El[0], El[-1], 20000)
+        r_trunc = np.full(Az_cl.size, 0.1)
+
+        def _time(catObj):
+            times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                catObj.paintMap(Az, El, nThreads=1)
+                times.append(time.perf_counter() - start)
+            return min(times)
+
+        small = test_ct.ClusterCatalogue(Az_cl, El_cl, self.ibeta, self.ne0, self.thetac, self.Da, r_trunc=r_trunc)
+        mixed = test_ct.ClusterCatalogue(np.append(Az_cl, 4096.), np.append(El_cl, 4.), self.ibeta, self.ne0, 
+                                         self.thetac, self.Da, r_trunc=np.append(r_trunc, 1000.))
+        large = test_ct.ClusterCatalogue(4096., 4., self.ibeta, self.ne0, self.thetac, self.Da, r_trunc=1000.)
+
+        tau_mixed = mixed.paintMap(Az, El)
+        self.assertTrue(np.allclose(tau_mixed, small.paintMap(Az, El) + large.paintMap(Az, El)))
+        self.assertLess(_time(mixed), 5 * (_time(small) + _time(large)))
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
@@ -24,6 +24,20 @@ class TestConversions(unittest.TestCase):
         
         out_arr = test_cv.SI_Temp(self.test_arr, self.test_arr)
         self.assertEqual(out_arr.size, self.n_test)
+    
+    def test_SI_dTCMB(self):
+        self.assertTrue(type(test_cv.SI_dTCMB(self.test_scal, self.test_scal)), float)
+        
+        out_arr = test_cv.SI_dTCMB(self.test_arr, self.test_arr * 1e10)
+        self.assertEqual(out_arr.size, self.n_test)
+    
+    @params("SI", "JySr", "RJ", "dTCMB")
+    def test_SI_unit(self, unit):
+        out_arr = test_cv.SI_unit(self.test_arr, self.test_arr * 1e10, unit)
+        self.assertEqual(out_arr.size, self.n_test)
+
+        with self.assertRaises(ValueError):
+            test_cv.SI_unit(self.test_arr, self.test_arr, "K")
 
 if __name__ == "__main__":
     import nose2
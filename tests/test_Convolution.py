@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import unittest
+from nose2.tools import params
+
+import scipy.constants as const
+
+import MockSZ.Convolution as test_fft
+import MockSZ.Models as test_md
+import MockSZ.Bindings as test_bd
+import MockSZ.Conversions as test_cv
+
+PATH_RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "etc", "validations", "resources")
+
+class TestConvolution(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.nu_arr = np.linspace(10e9, 1000e9, 2000)
+        cls.tau_e = 0.01
+        cls.clib = test_bd.loadMockSZlib()
+
+    @params((5., "MJ"), (15.33, "MJ"), (2.5, "PL"))
+    def test_getSignal_FFT(self, param, dist):
+        func = self.clib.MockSZ_getSignal_tSZ if dist == "MJ" else self.clib.MockSZ_getSignal_ntSZ
+        
+        res_direct = test_bd.getDistributionTwoParam(self.nu_arr, param, self.tau_e, 1e-8, func=func)
+        res_fft = test_fft.getSignal_FFT(self.nu_arr, param, self.tau_e, dist)
+
+        self.assertEqual(res_fft.shape, self.nu_arr.shape)
+        self.assertLess(np.max(np.absolute(res_fft - res_direct)) / np.max(np.absolute(res_direct)), 1e-4)
+
+    @params(0., -100e9)
+    def test_getSignal_FFT_nu(self, nu):
+        with self.assertRaises(ValueError):
+            test_fft.getSignal_FFT(np.append(self.nu_arr, nu), 15.33, self.tau_e)
+
+    def test_getKernelGrid(self):
+        s_arr, kernel = test_fft.getKernelGrid(15.33, "MJ", ds=1e-2)
+
+        self.assertEqual(s_arr.size % 2, 1)
+        self.assertAlmostEqual(s_arr[0], -3.)
+        self.assertAlmostEqual(s_arr[-1], 3.)
+        self.assertEqual(kernel.shape, s_arr.shape)
+
+        with self.assertRaises(ValueError):
+            test_fft.getKernelGrid(15.33, "foo")
+
+    @params("SI", "dTCMB")
+    def test_SinglePointing_mode(self, unit):
+        spObj = test_md.SinglePointing(15.33, v_pec=300, phi_cl=30, tau_e=self.tau_e)
+
+        res_direct = spObj.getSingleSignal_tkSZ(self.nu_arr, unit=unit)
+        res_fft = spObj.getSingleSignal_tkSZ(self.nu_arr, unit=unit, mode="fft")
+
+        diff = res_fft - res_direct
+        ref = res_direct - test_cv.SI_unit(test_bd.getCMB(self.nu_arr), self.nu_arr, unit)
+        self.assertLess(np.max(np.absolute(diff)) / np.max(np.absolute(ref)), 1e-4)
+
+        with self.assertRaises(ValueError):
+            spObj.getSingleSignal_tkSZ(self.nu_arr, mode="foo")
+
+    def test_SinglePointing_mode_ntSZ(self):
+        spObj = test_md.SinglePointing(2.5, tau_e=self.tau_e, no_CMB=True)
+
+        res_direct = spObj.getSingleSignal_ntkSZ(self.nu_arr)
+        res_fft = spObj.getSingleSignal_ntkSZ(self.nu_arr, mode="fft")
+
+        self.assertLess(np.max(np.absolute(res_fft - res_direct)) / np.max(np.absolute(res_direct)), 1e-4)
+
+    def test_SZpack(self):
+        x, _, DI = np.loadtxt(os.path.join(PATH_RESOURCES, "SZ_Integral.5D.dat"), unpack=True)
+        nu_arr = x * const.k * 2.726 / const.h
+
+        spObj = test_md.SinglePointing(15.33, v_pec=-0.01*const.c*1e-3, tau_e=self.tau_e, no_CMB=True)
+        
+        res_direct = test_cv.SI_JySr(spObj.getSingleSignal_tkSZ(nu_arr)) * 1e-6
+        res_fft = test_cv.SI_JySr(spObj.getSingleSignal_tkSZ(nu_arr, mode="fft")) * 1e-6
+
+        err_direct = np.max(np.absolute(res_direct - DI)) / np.max(np.absolute(DI))
+        err_fft = np.max(np.absolute(res_fft - DI)) / np.max(np.absolute(DI))
+
+        # Both modes deviate by about 2% from SZpack, which includes higher-order terms, and agree with each other
+        self.assertLess(err_fft, 2.5e-2)
+        self.assertLess(np.max(np.absolute(res_fft - res_direct)) / np.max(np.absolute(DI)), 1e-6)
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
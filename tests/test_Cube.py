@@ -0,0 +1,87 @@
+import os
+import tempfile
+import numpy as np
+import unittest
+from nose2.tools import params
+
+import MockSZ.Cube as test_cb
+import MockSZ.Models as test_md
+import MockSZ.Cache as test_ch
+
+class TestCube(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(1)
+        cls.screen = rng.random((6, 5))
+        cls.spectrum = rng.random(7)
+        cls.offset = rng.random(7)
+
+        cls.cube = test_cb.SeparableCube(cls.screen, cls.spectrum, cls.offset)
+        cls.dense = cls.screen[..., None] * cls.spectrum + cls.offset
+
+    def test_attributes(self):
+        self.assertEqual(self.cube.shape, self.dense.shape)
+        self.assertEqual(self.cube.ndim, self.dense.ndim)
+        self.assertEqual(self.cube.size, self.dense.size)
+        self.assertEqual(self.cube.dtype, self.dense.dtype)
+        self.assertEqual(len(self.cube), len(self.dense))
+        
+        self.assertTrue(np.allclose(np.asarray(self.cube), self.dense))
+
+    @params((1,), (1, 2), (1, 2, 3), (slice(1, 3),), (..., 3), (..., slice(2, 5)), 
+            (slice(None), 2), (1, ...), (np.array([0, 2]), 1), (-1, -1, -1), (slice(None, None, 2), slice(1, 4), slice(0, 7, 3)))
+    def test_getitem(self, *key):
+        res = self.cube[key]
+        
+        self.assertEqual(np.shape(res), self.dense[key].shape)
+        self.assertTrue(np.allclose(np.asarray(res), self.dense[key]))
+
+    def test_getitem_mask(self):
+        mask = self.screen > 0.5
+        
+        self.assertIsInstance(self.cube[mask], test_cb.SeparableCube)
+        self.assertTrue(np.allclose(np.asarray(self.cube[mask]), self.dense[mask]))
+        self.assertTrue(np.allclose(self.cube[mask, 2], self.dense[mask, 2]))
+
+        with self.assertRaises(IndexError):
+            self.cube[np.array([0, 1]), 0, np.array([0, 1])]
+
+        with self.assertRaises(IndexError):
+            self.cube[0, 0, 0, 0]
+
+    def test_getChannelSpectrum(self):
+        self.assertTrue(np.allclose(self.cube.getChannel(3), self.dense[..., 3]))
+        self.assertTrue(np.allclose(self.cube.getSpectrum(1, 2), self.dense[1, 2]))
+
+    @params(None, 0, 1, 2, -1, ((0, 1),), ((0, 2),), ((1, 2),), ((0, 1, 2),))
+    def test_reductions(self, axis):
+        self.assertTrue(np.allclose(np.asarray(self.cube.sum(axis)), self.dense.sum(axis)))
+        self.assertTrue(np.allclose(np.asarray(self.cube.mean(axis)), self.dense.mean(axis)))
+
+    def test_toArray(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = np.lib.format.open_memmap(os.path.join(tmpdir, "cube.npy"), mode="w+", shape=self.cube.shape)
+            self.cube.toArray(out, chunksize=4)
+            
+            self.assertTrue(np.allclose(out, self.dense))
+            del out
+
+    @params(True, False)
+    def test_IsoBetaModel_lazy(self, CMB):
+        isobObj = test_md.IsoBetaModel(15.33, 100, no_CMB=CMB)
+        nu_arr = np.linspace(100, 500, 20) * 1e9
+        isob = isobObj.getIsoBeta(np.linspace(-10, 10, 10), np.linspace(-10, 10, 8), 0.7, 1.2e-2, 15, 1500, grid=True)
+
+        lazy = isobObj.getIsoBetaCube(isob, nu_arr, lazy=True)
+        dense = isobObj.getIsoBetaCube(isob, nu_arr)
+
+        self.assertIsInstance(lazy, test_cb.SeparableCube)
+        self.assertTrue(np.allclose(np.asarray(lazy), dense))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            isobObj.cache = test_ch.ResultCache(tmpdir)
+            self.assertIsInstance(isobObj.getIsoBetaCube(isob, nu_arr, lazy=True), test_cb.SeparableCube)
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
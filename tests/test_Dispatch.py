@@ -0,0 +1,62 @@
+import numpy as np
+import unittest
+from nose2.tools import params
+from scipy.integrate import quad
+
+import MockSZ.Dispatch as test_dp
+
+class TestDispatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.n_test = 1000
+        cls.nu_arr = np.linspace(10, 1000, cls.n_test) * 1e9
+
+        cls.thresholds = dict(test_dp.getThresholds())
+
+    def tearDown(self):
+        test_dp.getThresholds().update(self.thresholds)
+
+    def test_validate(self):
+        for name, dev in test_dp.validate(self.n_test).items():
+            self.assertLess(dev, 1e-10, msg=name)
+
+    @params(0, None)
+    def test_getCMB(self, threshold):
+        test_dp.setThreshold("getCMB", threshold)
+        self.assertEqual(test_dp.useNumpy("getCMB", self.n_test), threshold is None)
+        
+        CMB = test_dp.getCMB(self.nu_arr)
+        self.assertEqual(CMB.shape, self.nu_arr.shape)
+        self.assertTrue(np.allclose(CMB, test_dp.getCMB_np(self.nu_arr), rtol=1e-12, atol=0))
+
+    @params(0, None)
+    def test_getIsoBeta_norm(self, threshold):
+        # Central optical depth should equal the line-of-sight integral of the beta profile
+        ibeta, ne0, thetac, Da = 0.7, 1.2e-2, 15., 1500.
+        test_dp.setThreshold("getIsoBeta", threshold)
+
+        tau = test_dp.getIsoBeta(np.zeros(1), np.zeros(1), ibeta, ne0, thetac, Da, False)
+
+        rc = thetac / 3600 / 180 * test_dp.PI * Da * 1e6 * 3.0857e16
+        integral, _ = quad(lambda x: (1 + x**2)**(-1.5*ibeta), -np.inf, np.inf, epsabs=0, epsrel=1e-12)
+        tau_ref = ne0*1e6 * test_dp.ST * rc * integral
+
+        self.assertAlmostEqual(tau[0] / tau_ref, 1, places=8)
+
+    def test_nThreads(self):
+        for name, (func_np, func_be, args) in test_dp._getCases(self.n_test).items():
+            res_serial = func_be(*args, nThreads=1)
+            res_threaded = func_be(*args, nThreads=7)
+            self.assertTrue(np.array_equal(res_serial, res_threaded), msg=name)
+
+    def test_setThreshold(self):
+        test_dp.setThreshold("getIsoBeta", self.n_test)
+        self.assertTrue(test_dp.useNumpy("getIsoBeta", self.n_test - 1))
+        self.assertFalse(test_dp.useNumpy("getIsoBeta", self.n_test))
+
+        with self.assertRaises(KeyError):
+            test_dp.setThreshold("getSignal_tSZ", 0)
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
@@ -3,6 +3,8 @@ import unittest
 from nose2.tools import params
 
 import MockSZ.Models as test_md
+import MockSZ.Bindings as test_bd
+import MockSZ.Conversions as test_cv
 
 class TestModels(unittest.TestCase):
     @classmethod
@@ -59,6 +61,21 @@ class TestModels(unittest.TestCase):
         self.assertEqual(isob_cube_trace.shape[0], self.nAz)
         self.assertEqual(isob_cube_trace.shape[1], self.n_test)
     
+    @params((True, True), (True, False), (False, True), (False, False))
+    def test_IsoBetaModel_direct(self, CMB, grid):
+        isobObj = test_md.IsoBetaModel(self.Te, self.v_pec, no_CMB=CMB)
+        El = self.El if grid else self.Az
+        
+        isob = isobObj.getIsoBeta(self.Az, El, self.ibeta, self.ne0, self.thetac, self.Da, grid=grid)
+        isob_cube = isobObj.getIsoBetaCube(isob, self.nu_arr)
+
+        for nThreads in [1, 3]:
+            isob_direct = isobObj.getIsoBetaCubeDirect(self.Az, El, self.ibeta, self.ne0, self.thetac, self.Da, 
+                                                       self.nu_arr, grid=grid, nThreads=nThreads)
+            
+            self.assertEqual(isob_direct.shape, isob_cube.shape)
+            self.assertTrue(np.allclose(isob_direct, isob_cube, rtol=1e-12, atol=0))
+
     @params(True, False)
     def test_SinglePointing(self, CMB):
         v_pec = None
@@ -87,6 +104,156 @@ class TestModels(unittest.TestCase):
         self.assertEqual(ntkSZ.shape, self.nu_arr.shape)
         self.assertEqual(type(time), float)
         
+    @params("SI", "JySr", "RJ", "dTCMB")
+    def test_SinglePointing_units(self, unit):
+        nu_arr = self.nu_arr * 1e9
+        spObj = test_md.SinglePointing(self.Te, self.v_pec, phi_cl=30, tau_e=self.tau_e, no_CMB=True)
+
+        tkSZ_SI = spObj.getSingleSignal_tkSZ(nu_arr)
+        tkSZ_unit = spObj.getSingleSignal_tkSZ(nu_arr, unit=unit)
+        tkSZ_ref = test_cv.SI_unit(tkSZ_SI, nu_arr, unit)
+
+        self.assertTrue(np.allclose(tkSZ_unit, tkSZ_ref, rtol=1e-10, atol=0))
+        
+        clib = test_bd.loadMockSZlib()
+        tSZ = test_bd.getDistributionTwoParam(nu_arr, self.Te, self.tau_e, 1e-6, func=clib.MockSZ_getSignal_tSZ)
+        kSZ = test_bd.getDistributionTwoParam(nu_arr, spObj.beta_cl * spObj.beta_cl_z, self.tau_e, 1e-6, 
+                                              func=clib.MockSZ_getSignal_kSZ)
+        corr = self.tau_e * test_bd.getSignal_corrections(nu_arr, self.Te, spObj.beta_cl, spObj.beta_cl_z)
+
+        scale = np.max(np.absolute(tkSZ_SI))
+        self.assertTrue(np.allclose(tkSZ_SI / scale, (tSZ + kSZ + corr) / scale, atol=1e-8))
+    
+    @params("SI", "dTCMB")
+    def test_SinglePointing_memoise(self, unit):
+        nu_arr = self.nu_arr * 1e9
+        spObj_memo = test_md.SinglePointing(self.Te, self.v_pec, 30, self.tau_e, memoise=True)
+        spObj = test_md.SinglePointing(self.Te, self.v_pec, 30, self.tau_e)
+
+        changes = [{}, {"tau_e" : 0.02}, {"v_pec" : -500}, {"phi_cl" : 120}, {"Te" : 10.}, 
+                   {"v_pec" : None}, {"param" : None, "v_pec" : 200}]
+        n_memo = []
+
+        for change in changes:
+            for name, value in change.items():
+                setattr(spObj_memo, name, value)
+                setattr(spObj, name, value)
+
+            res_memo = spObj_memo.getSingleSignal_tkSZ(nu_arr, unit=unit)
+            res = spObj.getSingleSignal_tkSZ(nu_arr, unit=unit)
+            
+            self.assertTrue(np.allclose(res_memo, res, rtol=1e-12, atol=0))
+            n_memo.append(len(spObj_memo._memo))
+
+        # Changing tau_e does not add components, changing v_pec only adds kSZ and corrections
+        self.assertEqual(n_memo[1], n_memo[0])
+        self.assertEqual(n_memo[2], n_memo[1] + 2)
+
+        spObj_memo.clearMemo()
+        self.assertEqual(len(spObj_memo._memo), 0)
+
+    @params(0, 60, 150)
+    def test_SinglePointing_kSZ_ntkSZ(self, phi_cl):
+        nu_arr = self.nu_arr * 1e9
+        spObj = test_md.SinglePointing(v_pec=self.v_pec, phi_cl=phi_cl, tau_e=self.tau_e, no_CMB=True)
+
+        kSZ_tkSZ = spObj.getSingleSignal_tkSZ(nu_arr)
+        kSZ_ntkSZ = spObj.getSingleSignal_ntkSZ(nu_arr)
+
+        scale = np.max(np.absolute(kSZ_tkSZ))
+        self.assertTrue(np.allclose(kSZ_ntkSZ / scale, kSZ_tkSZ / scale, atol=1e-10))
+
+    def test_SinglePointing_memoise_adaptive(self):
+        nu_arr = np.linspace(100, 600, 501) * 1e9
+        spObj_memo = test_md.SinglePointing(self.Te, self.v_pec, 30, self.tau_e, memoise=True)
+        spObj = test_md.SinglePointing(self.Te, self.v_pec, 30, self.tau_e)
+
+        spObj_memo.getSingleSignal_tkSZ(nu_arr)
+        n_memo = len(spObj_memo._memo)
+
+        res_memo = spObj_memo.getSingleSignal_tkSZ(nu_arr, adaptive=True)
+        res = spObj.getSingleSignal_tkSZ(nu_arr, adaptive=True)
+
+        # Refinement rounds on frequency subsets leave the memo untouched
+        self.assertTrue(np.allclose(res_memo, res, rtol=1e-12, atol=0))
+        self.assertEqual(len(spObj_memo._memo), n_memo)
+
+    def test_SinglePointing_setters(self):
+        spObj = test_md.SinglePointing(self.Te, self.v_pec, 60)
+        
+        self.assertEqual(spObj.Te, self.Te)
+        self.assertAlmostEqual(spObj.beta_cl_z, 0.5)
+        
+        spObj.Te = 5.
+        spObj.v_pec = None
+        
+        self.assertEqual(spObj.param, 5.)
+        self.assertIsNone(spObj.beta_cl)
+        self.assertIsNone(spObj.beta_cl_z)
+
+    @params("SI", "dTCMB")
+    def test_SinglePointing_z(self, unit):
+        z_arr = np.array([0., 0.5, 2.])
+        x_arr = np.linspace(0.5, 10, 50)
+        spObj = test_md.SinglePointing(self.Te, self.v_pec, 30, self.tau_e, no_CMB=True)
+
+        res_0 = spObj.getSingleSignal_tkSZ(test_cv.x_freq(x_arr), unit=unit)
+        for z in z_arr:
+            nu_arr = test_cv.x_freq(x_arr, z)
+            res_z = spObj.getSingleSignal_z(nu_arr, [z], unit=unit)
+            
+            self.assertEqual(res_z.shape, (1, x_arr.size))
+            scale = (1 + z)**3 if unit == "SI" else 1 + z
+            self.assertTrue(np.allclose(res_z[0], scale * res_0, rtol=1e-12, atol=0))
+
+        res_obs = spObj.getSingleSignal_z(self.nu_arr * 1e9, z_arr, frame="observer", unit=unit)
+        self.assertEqual(res_obs.shape, (z_arr.size, self.n_test))
+        self.assertTrue(np.allclose(res_obs, spObj.getSingleSignal_tkSZ(self.nu_arr * 1e9, unit=unit), rtol=1e-12, atol=0))
+
+        with self.assertRaises(ValueError):
+            spObj.getSingleSignal_z(self.nu_arr, z_arr, frame="foo")
+
+        with self.assertRaises(ValueError):
+            spObj.getSingleSignal_z(self.nu_arr, z_arr, signal="foo")
+
+    def test_SinglePointing_z_CMB(self):
+        z_arr = np.array([0., 1., 3.])
+        nu_arr = self.nu_arr * 1e9
+        spObj = test_md.SinglePointing(z=1.)
+
+        res = spObj.getSingleSignal_z(nu_arr, z_arr)
+        
+        x = test_cv.freq_x(nu_arr[None,:], z_arr[:,None])
+        res_exact = 2 * test_cv.const.h * nu_arr**3 / test_cv.const.c**2 / np.expm1(x)
+        self.assertTrue(np.allclose(res, res_exact, rtol=1e-10, atol=0))
+
+        self.assertTrue(np.allclose(spObj.getSingleSignal_z(nu_arr)[0], res[1], rtol=1e-12, atol=0))
+
+    def test_tSZ_convergence(self):
+        nu_arr = self.nu_arr * 1e9
+        clib = test_bd.loadMockSZlib()
+
+        tSZ = test_bd.getDistributionTwoParam(nu_arr, self.Te, 1., 1e-6, func=clib.MockSZ_getSignal_tSZ)
+        tSZ_ref = test_bd.getDistributionTwoParam(nu_arr, self.Te, 1., 1e-8, func=clib.MockSZ_getSignal_tSZ)
+
+        scale = np.max(np.absolute(tSZ_ref))
+        self.assertLess(np.max(np.absolute(tSZ - tSZ_ref)) / scale, 1e-5)
+    
+    def test_KinematicBatch(self):
+        v_pec = np.linspace(-1000, 1000, 5)
+        tau_e = np.linspace(0.005, 0.02, 5)
+        kbObj = test_md.KinematicBatch(v_pec, tau_e=tau_e, no_CMB=True)
+
+        kSZ = kbObj.getBatchSignal_kSZ(self.nu_arr * 1e9)
+        self.assertEqual(kSZ.shape, (v_pec.size, self.n_test))
+
+        for i in range(v_pec.size):
+            spObj = test_md.SinglePointing(v_pec=v_pec[i], tau_e=tau_e[i], no_CMB=True)
+            kSZ_single = spObj.getSingleSignal_tkSZ(self.nu_arr * 1e9)
+            
+            scale = np.max(np.absolute(kSZ_single)) + 1e-300
+            self.assertTrue(np.allclose(kSZ[i] / scale, kSZ_single / scale, atol=1e-6))
+    
     def test_ScatteringKernels(self):
         skObj = test_md.ScatteringKernels()
 
@@ -105,6 +272,22 @@ class TestModels(unittest.TestCase):
         plscatter = skObj.getMultiScatteringPL(self.s_arr, self.alpha)
         self.assertEqual(plscatter.shape, self.s_arr.shape)
 
+    @params(1, 3)
+    def test_ScatteringKernels_grid(self, nThreads):
+        skObj = test_md.ScatteringKernels()
+        s_arr = self.s_arr[::10]
+
+        grids = [(skObj.getSingleScatteringGrid, skObj.getSingleScattering, np.array([0.1, 0.3, 0.6])),
+                 (skObj.getMultiScatteringMJGrid, skObj.getMultiScatteringMJ, np.array([5., self.Te])),
+                 (skObj.getMultiScatteringPLGrid, skObj.getMultiScatteringPL, np.array([-1., self.alpha]))]
+
+        for func_grid, func, param_arr in grids:
+            res_grid = func_grid(s_arr, param_arr, nThreads=nThreads)
+            self.assertEqual(res_grid.shape, (param_arr.size, s_arr.size))
+
+            for i, param in enumerate(param_arr):
+                self.assertTrue(np.allclose(res_grid[i], func(s_arr, param), rtol=1e-12, atol=0))
+
 if __name__ == "__main__":
     import nose2
     nose2.main()
@@ -0,0 +1,81 @@
+import numpy as np
+import unittest
+from nose2.tools import params
+
+import MockSZ.MonteCarlo as test_mc
+import MockSZ.Models as test_md
+import MockSZ.Bindings as test_bd
+
+class TestMonteCarlo(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.Te = 15.33
+        cls.alpha = 2.5
+        cls.n_photons = 1000000
+        cls.skObj = test_md.ScatteringKernels()
+
+    def binAverage(self, func, s_bins, n_sub=8):
+        s_fine = s_bins[:-1,None] + (np.arange(n_sub) + 0.5) / n_sub * np.diff(s_bins)[:,None]
+        return func(s_fine.ravel()).reshape(s_fine.shape).mean(axis=1)
+
+    def assertConsistent(self, res, err, ref, tol=1e-2):
+        self.assertTrue(np.all(np.absolute(res - ref) < 5 * err + tol * np.max(np.absolute(ref))))
+
+    def test_getSingleScattering(self):
+        beta = 0.3
+        s_max = np.log((1 + beta) / (1 - beta))
+        s_bins = np.linspace(-s_max, s_max, 41)
+
+        mcObj = test_mc.MonteCarlo(self.Te, seed=1)
+        res, err = mcObj.getSingleScattering(s_bins, beta, self.n_photons)
+
+        ref = self.binAverage(lambda s: self.skObj.getSingleScattering(s, beta), s_bins)
+        
+        self.assertEqual(res.shape, (s_bins.size - 1,))
+        self.assertConsistent(res, err, ref)
+        self.assertAlmostEqual(mcObj.diagnostics["outside"], 0.)
+
+    @params(("MJ", 15.33, -1.5, 2.5), ("PL", 2.5, -5., 10.))
+    def test_getMultiScattering(self, dist, param, s0, s1):
+        s_bins = np.linspace(s0, s1, 61)
+
+        mcObj = test_mc.MonteCarlo(param, dist, seed=2)
+        res, err = mcObj.getMultiScattering(s_bins, n_photons=self.n_photons)
+
+        func = self.skObj.getMultiScatteringMJ if dist == "MJ" else self.skObj.getMultiScatteringPL
+        ref = self.binAverage(lambda s: func(s, param), s_bins)
+
+        self.assertConsistent(res, err, ref)
+
+    def test_getSignal(self):
+        nu_arr = np.linspace(50e9, 800e9, 50)
+        tau_e = 1e-3
+        clib = test_bd.loadMockSZlib()
+
+        mcObj = test_mc.MonteCarlo(self.Te, seed=3)
+        res, err = mcObj.getSignal(nu_arr, tau_e, self.n_photons)
+
+        ref = test_bd.getDistributionTwoParam(nu_arr, self.Te, tau_e, 1e-6, func=clib.MockSZ_getSignal_tSZ)
+        self.assertConsistent(res, err, ref)
+
+        diag = mcObj.diagnostics
+        self.assertEqual(diag["n_photons"], self.n_photons)
+        self.assertEqual(diag["history"].size, diag["n_batch"] - 1)
+        self.assertLess(diag["rel_err"], 1e-2)
+
+    def test_seed(self):
+        s_bins = np.linspace(-1, 1, 21)
+
+        res_1, _ = test_mc.MonteCarlo(self.Te, seed=4).getMultiScattering(s_bins, 0.5, 10000, nThreads=1)
+        res_2, _ = test_mc.MonteCarlo(self.Te, seed=4).getMultiScattering(s_bins, 0.5, 10000, nThreads=2)
+        res_3, _ = test_mc.MonteCarlo(self.Te, seed=5).getMultiScattering(s_bins, 0.5, 10000, nThreads=2)
+
+        self.assertTrue(np.all(res_1 == res_2))
+        self.assertFalse(np.all(res_1 == res_3))
+
+        with self.assertRaises(ValueError):
+            test_mc.MonteCarlo(self.Te, "foo")
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()
@@ -0,0 +1,127 @@
+import os
+import json
+import tempfile
+import numpy as np
+import unittest
+from unittest import mock
+from nose2.tools import params
+
+import MockSZ.Runner as test_rn
+import MockSZ.Models as test_md
+
+class TestRunner(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.nu_arr = np.linspace(100, 500, 20) * 1e9
+        cls.ax = np.linspace(-60, 60, 11)
+
+        cls.config = {
+                "grids"     : {"nu" : {"linspace" : [100e9, 500e9, 20]}, "ax" : {"linspace" : [-60, 60, 11]}},
+                "defaults"  : {"signal" : {"tau_e" : 0.01, "no_CMB" : True}},
+                "jobs"      : [
+                    {"name" : "hot", "type" : "signal", "param" : 15.33, "v_pec" : 300, "nu" : "nu"},
+                    {"name" : "hot_copy", "type" : "signal", "param" : 15.33, "v_pec" : 300, "nu" : "nu"},
+                    {"name" : "screen", "type" : "screen", "Az" : "ax", "El" : "ax", 
+                     "ibeta" : 0.7, "ne0" : 1e-2, "thetac" : 15, "Da" : 1500},
+                    {"name" : "cube", "type" : "cube", "param" : 10., "Az" : "ax", "El" : "ax", 
+                     "ibeta" : 0.7, "ne0" : 1e-2, "thetac" : 15, "Da" : 1500, "nu" : "nu"},
+                    {"name" : "kernels", "type" : "kernel", "kernel" : "MultiScatteringMJ", 
+                     "x" : {"linspace" : [-1, 2, 50]}, "param" : [5., 10.]},
+                    {"name" : "bad", "type" : "kernel", "kernel" : "MaxwellJuttner", "x" : [0.1, 0.2], "param" : "foo"},
+                    ]
+                }
+
+    def test_parseGrid(self):
+        self.assertTrue(np.allclose(test_rn.parseGrid({"linspace" : [0, 1, 5]}), np.linspace(0, 1, 5)))
+        self.assertTrue(np.allclose(test_rn.parseGrid([1, 2]), np.array([1., 2.])))
+        self.assertTrue(np.allclose(test_rn.parseGrid("a", {"a" : np.ones(3)}), np.ones(3)))
+
+        with self.assertRaises(ValueError):
+            test_rn.parseGrid({"foo" : [0, 1]})
+
+        with self.assertRaises(ValueError):
+            test_rn.parseGrid("a")
+
+    def test_planJobs(self):
+        jobs = test_rn.planJobs(self.config)
+
+        self.assertEqual(len(jobs), len(self.config["jobs"]))
+        self.assertEqual(jobs[0]["key"], jobs[1]["key"])
+        self.assertEqual(jobs[0]["spec"]["tau_e"], 0.01)
+        self.assertEqual(len(set(job["key"] for job in jobs)), len(jobs) - 1)
+
+        with self.assertRaises(ValueError):
+            test_rn.planJobs({"jobs" : [{"type" : "signal", "nu" : [1e11], "foo" : 1}]})
+
+        with self.assertRaises(ValueError):
+            test_rn.planJobs({"jobs" : [{"type" : "signal"}]})
+
+        with self.assertRaises(ValueError):
+            test_rn.planJobs({"jobs" : [{"type" : "foo"}]})
+
+    @params(1, 2)
+    def test_runJobs(self, nWorkers):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = test_rn.runJobs(self.config, tmpdir, nWorkers=nWorkers, nThreads=1)
+            entries = {entry["name"] : entry for entry in manifest["jobs"]}
+
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, "manifest.json")))
+            self.assertEqual(entries["hot"]["status"], "done")
+            self.assertEqual(entries["hot_copy"]["status"], "duplicate")
+            self.assertEqual(entries["hot_copy"]["output"], entries["hot"]["output"])
+            self.assertEqual(entries["bad"]["status"], "failed")
+            self.assertIn("time", entries["cube"])
+
+            spObj = test_md.SinglePointing(15.33, 300, tau_e=0.01, no_CMB=True)
+            self.assertTrue(np.allclose(np.load(entries["hot"]["output"]), spObj.getSingleSignal_tkSZ(self.nu_arr)))
+
+            isobObj = test_md.IsoBetaModel(10.)
+            cube = isobObj.getIsoBetaCubeDirect(self.ax, self.ax, 0.7, 1e-2, 15, 1500, self.nu_arr, grid=True)
+            self.assertTrue(np.allclose(np.load(entries["cube"]["output"], mmap_mode="r"), cube))
+
+            self.assertEqual(list(np.load(entries["kernels"]["output"]).shape), [2, 50])
+            self.assertEqual(list(np.load(entries["screen"]["output"]).shape), [11, 11])
+
+            manifest = test_rn.runJobs(self.config, tmpdir, nWorkers=1)
+            self.assertEqual(manifest["jobs"][0]["status"], "reused")
+
+    def test_shareKernels(self):
+        config = {
+                "defaults"  : {"signal" : {"param" : 15.33, "tau_e" : 0.01, "no_CMB" : True}},
+                "jobs"      : [
+                    {"name" : "slow", "type" : "signal", "v_pec" : 300, "nu" : self.nu_arr.tolist()},
+                    {"name" : "fast", "type" : "signal", "v_pec" : 1000, "tau_e" : 0.02, "nu" : self.nu_arr[::2].tolist()},
+                    {"name" : "cold", "type" : "signal", "param" : 5., "nu" : self.nu_arr.tolist()},
+                    ]
+                }
+
+        with mock.patch.object(test_rn.MBind, "getKernelWeights", wraps=test_rn.MBind.getKernelWeights) as build, \
+             mock.patch.object(test_rn.MBind, "getSignal_tkSZ", wraps=test_rn.MBind.getSignal_tkSZ) as signal, \
+             tempfile.TemporaryDirectory() as tmpdir:
+            manifest = test_rn.runJobs(config, tmpdir, nWorkers=1, nThreads=1)
+            entries = {entry["name"] : entry for entry in manifest["jobs"]}
+
+            self.assertEqual(build.call_count, 1)
+            self.assertEqual(build.call_args.args[:2], (15.33, "MJ"))
+            
+            kernels = {call.args[1] : call.kwargs["kernel"] for call in signal.call_args_list}
+            self.assertIsNotNone(kernels[15.33])
+            self.assertIsNone(kernels[5.])
+
+            spObj = test_md.SinglePointing(15.33, 1000, tau_e=0.02, no_CMB=True)
+            self.assertTrue(np.allclose(np.load(entries["fast"]["output"]), spObj.getSingleSignal_tkSZ(self.nu_arr[::2]), 
+                                        rtol=1e-10, atol=0))
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path_job = os.path.join(tmpdir, "job.json")
+            config = {"jobs" : self.config["jobs"][:1], "grids" : self.config["grids"]}
+            with open(path_job, "w") as f:
+                json.dump(config, f)
+
+            self.assertEqual(test_rn.main([path_job, "-j", "1", "-o", os.path.join(tmpdir, "out")]), 0)
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, "out", "hot.npy")))
+
+if __name__ == "__main__":
+    import nose2
+    nose2.main()